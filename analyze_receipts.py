@@ -1,15 +1,146 @@
 #!/usr/bin/env python3
 """
 Entry point for the receipt analysis console application
+
+Usage:
+    python analyze_receipts.py                                  # interactive, one week
+    python analyze_receipts.py --weeks 2025CW_31 2025CW_32      # batch, selected weeks
+    python analyze_receipts.py --all --jobs 4 --incremental     # batch, all weeks
+    python analyze_receipts.py --since 2025CW_30                # batch, weeks from 2025CW_30 on
+    python analyze_receipts.py --all --incremental --dry-run    # only plan AI calls, no analysis
+    python analyze_receipts.py --resume                         # continue all interrupted runs
 """
+import argparse
 import sys
 import os
+import time
 
 # Add the src directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from server.core.config import DevelopmentConfig
-from server.services.receipt_analyzer import ReceiptAnalyzer
+from server.services.receipt_analyzer import get_analyzer
+from server.services.manifest import parse_calendar_week
+from server.api.tasks import select_calendar_weeks, analyze_weeks_in_parallel, batch_failed
+
+def parse_args(argv=None):
+    """Parse command line arguments of the batch mode"""
+    parser = argparse.ArgumentParser(description="AI analysis of receipt photos by calendar week")
+    parser.add_argument('--weeks', nargs='+', metavar='WEEK', help="calendar weeks to analyze, e.g. 2025CW_30")
+    parser.add_argument('--all', action='store_true', dest='all_weeks', help="analyze all available calendar weeks")
+    parser.add_argument('--since', metavar='WEEK', help="analyze all available calendar weeks from WEEK on")
+    parser.add_argument('--jobs', type=int, default=2, help="number of weeks analyzed in parallel (default: 2)")
+    parser.add_argument('--incremental', action='store_true',
+                        help="only analyze photos that are new or changed since the last analysis")
+    parser.add_argument('--deadline', type=float, metavar='SECONDS',
+                        help="time budget of the batch, unfinished photos are listed and resumed with --incremental")
+    parser.add_argument('--resume', nargs='*', metavar='RUN_ID',
+                        help="continue interrupted runs from their journal (all unfinished runs if no RUN_ID)")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="only report planned AI calls, cache hits and upload bytes, without contacting the AI")
+    args = parser.parse_args(argv)
+
+    for week in (args.weeks or []) + ([args.since] if args.since else []):
+        try:
+            parse_calendar_week(week)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.deadline is not None and args.deadline <= 0:
+        parser.error("--deadline must be a positive number of seconds")
+
+    return args
+
+def run_batch(args) -> int:
+    """Analyze the selected calendar weeks without user interaction, returns the exit code"""
+    analyzer = get_analyzer(DevelopmentConfig())
+    available_weeks = analyzer.get_available_weeks()
+
+    calendar_weeks = select_calendar_weeks(available_weeks, args.weeks, args.all_weeks, args.since)
+    if not calendar_weeks:
+        print("No calendar weeks selected.")
+        return 1
+
+    missing = [week for week in calendar_weeks if week not in available_weeks]
+    if missing:
+        print(f"No photo directory for: {', '.join(missing)}")
+
+    if args.dry_run:
+        return print_plan(analyzer, calendar_weeks, args)
+
+    print(f"🔍 Analyzing {len(calendar_weeks)} calendar weeks with {args.jobs} jobs"
+          f"{' (incremental)' if args.incremental else ''}...")
+    start = time.monotonic()
+    reports = analyze_weeks_in_parallel(calendar_weeks, jobs=args.jobs, incremental=args.incremental,
+                                        deadline_seconds=args.deadline)
+
+    analyzed = sum(list(report['files'].values()).count('analyzed') for report in reports)
+    print(f"\n📊 Batch finished in {time.monotonic() - start:.1f}s: {len(reports)} weeks, {analyzed} photos analyzed")
+
+    unfinished = [(report['calendar_week'], name) for report in reports for name in report['unfinished_files']]
+    if unfinished:
+        print(f"⏱️  Deadline reached, {len(unfinished)} photos unfinished (resume with --incremental):")
+        for calendar_week, name in unfinished:
+            print(f"   {calendar_week}/{name}")
+
+    rejected = [(report['calendar_week'], name, reason) for report in reports
+                for name, reason in report['rejected_files'].items()]
+    if rejected:
+        print(f"🚫 {len(rejected)} photos rejected without analysis:")
+        for calendar_week, name, reason in rejected:
+            print(f"   {calendar_week}/{name}: {reason}")
+
+    if batch_failed(reports):
+        print("❌ Batch had failures, see above.")
+        return 1
+
+    print("✅ All weeks analyzed successfully.")
+    return 0
+
+def run_resume(args) -> int:
+    """Continue journaled runs that didn't finish, returns the exit code"""
+    analyzer = get_analyzer(DevelopmentConfig())
+
+    run_ids = args.resume or [run['run_id'] for run in analyzer.journal.list_runs()
+                              if run['status'] in ('interrupted', 'partial', 'failed')]
+    if not run_ids:
+        print("No unfinished runs found.")
+        return 0
+
+    failed = False
+    for run_id in run_ids:
+        report = analyzer.resume_run(run_id, deadline_seconds=args.deadline)
+        outcomes = list(report['files'].values())
+        print(f"{run_id}: {report['status']}, {outcomes.count('analyzed')} analyzed, "
+              f"{len(report['unfinished_files'])} unfinished")
+        if report['error']:
+            print(f"    Error: {report['error']}")
+        failed = failed or report['status'] != 'completed'
+
+    return 1 if failed else 0
+
+def print_plan(analyzer, calendar_weeks, args) -> int:
+    """Print the dry-run plan of the selected calendar weeks, returns the exit code"""
+    plan = analyzer.plan_analysis(calendar_weeks, incremental=args.incremental, parallel_calls=args.jobs)
+
+    print(f"🔍 Dry run of {len(calendar_weeks)} calendar weeks{' (incremental)' if args.incremental else ''}, "
+          f"nothing is sent to the AI\n")
+    for week in plan['weeks']:
+        if week['error']:
+            print(f"   {week['calendar_week']}: {week['error']}")
+            continue
+        counts = ", ".join(f"{count} {name}" for name, count in week['counts'].items() if count)
+        print(f"   {week['calendar_week']}: {week['planned_calls']} AI calls, "
+              f"{week['upload_bytes'] / 1e6:.1f} MB ({counts or 'no photos'})")
+
+    counts = ", ".join(f"{count} {name}" for name, count in plan['counts'].items())
+    print(f"\n📊 Planned: {plan['planned_calls']} AI calls, {plan['upload_bytes'] / 1e6:.1f} MB to upload")
+    print(f"   Photos: {counts}")
+    print(f"   Estimated duration: {plan['estimated_seconds']:.0f}s "
+          f"({plan['call_seconds']:.1f}s per call, {plan['parallel_calls']} in parallel)")
+
+    return 1 if any(week['error'] for week in plan['weeks']) else 0
 
 def main():
     """Main function for receipt analysis"""
@@ -19,14 +150,14 @@ def main():
     try:
         # Initialize configuration and service
         config = DevelopmentConfig()
-        analyzer = ReceiptAnalyzer(config)
+        analyzer = get_analyzer(config)
         
         # Show available weeks
         available_weeks = analyzer.get_available_weeks()
         if available_weeks:
             print(f"Available calendar weeks: {', '.join(available_weeks)}")
         else:
-            print("No calendar weeks found. Make sure you have photos in src/server/api/photos/2025CW_XX/ directories")
+            print("No calendar weeks found. Make sure you have photos in src/server/api/photos/YYYYCW_XX/ directories")
         
         # Get calendar week from user
         calendar_week = input("\nEnter calendar week (e.g., 2025CW_30): ").strip()
@@ -38,7 +169,7 @@ def main():
         print(f"\n🔍 Analyzing receipts for {calendar_week}...")
         
         # Analyze the calendar week
-        df_total = analyzer.analyze_calendar_week(calendar_week)
+        df_total = analyzer.analyze_calendar_week(calendar_week, priority='interactive')
         
         if df_total is not None:
             print("\n✅ Analysis Complete!")
@@ -69,4 +200,9 @@ def main():
         print("3. Added .jpeg images to the directories")
 
 if __name__ == "__main__":
+    args = parse_args()
+    if args.resume is not None:
+        sys.exit(run_resume(args))
+    if args.weeks or args.all_weeks or args.since:
+        sys.exit(run_batch(args))
     main()
\ No newline at end of file
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Update the typed result history and export it for analytics
+
+Usage:
+    python export_history.py                              # receipt_history.parquet with all years
+    python export_history.py --year 2025 --format arrow   # receipt_history.arrow with 2025 only
+    python export_history.py --summary                    # only print the costs per year
+"""
+import argparse
+import sys
+import os
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from server.core.config import DevelopmentConfig
+from server.services.history import ResultHistory, EXPORT_FORMATS
+
+def parse_args(argv=None):
+    """Parse the command line of the history export"""
+    parser = argparse.ArgumentParser(description="Export all receipt results as one typed Parquet or Arrow file.")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="parquet", help="file format (default: parquet)")
+    parser.add_argument("--year", type=int, action="append", dest="years", help="only export this year (repeatable)")
+    parser.add_argument("--output", help="target file (default: receipt_history.<format>)")
+    parser.add_argument("--summary", action="store_true", help="only print the costs per year, don't export")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    """Compact changed weeks into the history, print the costs per year and export"""
+    args = parse_args(argv)
+
+    try:
+        history = ResultHistory(DevelopmentConfig())
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        return 1
+
+    changes = history.compact()
+    print(f"History updated: {len(changes['updated'])} weeks rewritten, {len(changes['removed'])} removed")
+
+    for year in history.yearly_summary(years=args.years):
+        print(f"   {year['year']}: {year['weeks']} weeks, {year['total_receipts']} receipts, "
+              f"food €{year['total_food']:.2f}, non-food €{year['total_nonfood']:.2f}, total €{year['grand_total']:.2f}")
+
+    if args.summary:
+        return 0
+
+    output = args.output or f"receipt_history.{args.format}"
+    history.export(output, args.format, years=args.years)
+    print(f"Exported to {output}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+"""
+HTTP load test of the API and web interface against a stub AI backend
+
+Boots the app from create_app on a local port with synthetic photos and results
+in a temporary data directory, drives a weighted mix of routes at a target
+request rate and reports throughput, p50/p95/p99 latency and errors per route.
+
+Usage:
+    python load_test.py                                       # 20 req/s for 30s, default mix
+    python load_test.py --rps 50 --duration 60 --concurrency 32
+    python load_test.py --mix weeks=2,week=4,summary=4,show=1,trigger=0
+    python load_test.py --save-baseline load_baseline.json    # store the numbers
+    python load_test.py --baseline load_baseline.json         # compare, exit 1 on regression
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# Routes of the load mix and their default weights
+ROUTE_WEIGHTS = {'weeks': 2, 'week': 4, 'summary': 4, 'show': 2, 'trigger': 1}
+
+def parse_mix(value: str) -> Dict[str, float]:
+    """Parse a route mix like 'weeks=2,week=4,trigger=0'"""
+    mix = dict(ROUTE_WEIGHTS)
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, weight = item.partition("=")
+        if name not in ROUTE_WEIGHTS:
+            raise argparse.ArgumentTypeError(f"unknown route {name!r}, expected one of {', '.join(ROUTE_WEIGHTS)}")
+        mix[name] = float(weight)
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError("at least one route needs a positive weight")
+    return mix
+
+def parse_args(argv=None):
+    """Parse the command line of the load test"""
+    parser = argparse.ArgumentParser(description="Load test the receipt analysis server against a stub AI backend.")
+    parser.add_argument('--rps', type=float, default=20.0, help="target requests per second (default: 20)")
+    parser.add_argument('--duration', type=float, default=30.0, help="seconds of load (default: 30)")
+    parser.add_argument('--concurrency', type=int, default=16, help="parallel client connections (default: 16)")
+    parser.add_argument('--mix', type=parse_mix, default=dict(ROUTE_WEIGHTS),
+                        help="route weights, e.g. weeks=2,week=4,summary=4,show=2,trigger=1")
+    parser.add_argument('--weeks', type=int, default=26, help="synthetic calendar weeks with results (default: 26)")
+    parser.add_argument('--receipts', type=int, default=40, help="synthetic receipts per week (default: 40)")
+    parser.add_argument('--photos', type=int, default=4, help="synthetic photos per week for triggers (default: 4)")
+    parser.add_argument('--ai-latency', type=float, default=0.5, help="seconds per stub AI call (default: 0.5)")
+    parser.add_argument('--seed', type=int, default=1, help="random seed of data and request mix")
+    parser.add_argument('--save-baseline', metavar='FILE', help="store the results as baseline")
+    parser.add_argument('--baseline', metavar='FILE', help="compare with a stored baseline")
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help="percent of p95 latency growth that fails the comparison (default: 20)")
+    args = parser.parse_args(argv)
+
+    if args.rps <= 0 or args.duration <= 0 or args.concurrency < 1:
+        parser.error("--rps and --duration must be positive and --concurrency at least 1")
+    return args
+
+class StubBackend:
+    """Stand-in for the Gemini backend that answers every photo with a plausible receipt"""
+
+    def __init__(self, latency: float, seed: int):
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.calls = 0
+
+    def extract(self, image_bytes: bytes, mime_type: str = "image/jpeg", priority: str = 'api',
+                deadline: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        with self.lock:
+            self.calls += 1
+            food, nonfood = self.random.uniform(1, 80), self.random.uniform(0, 30)
+        time.sleep(self.latency)
+        usage = {"Bild_Bytes": len(image_bytes), "Prompt_Tokens": 300, "Antwort_Tokens": 20,
+                 "Latenz_ms": self.latency * 1000, "Wartezeit_ms": 0.0, "Wiederholungen": 0, "Modell": "stub"}
+        return f"01.08.2025;12:00;{food:.2f};{nonfood:.2f}", usage
+
+def create_synthetic_data(analyzer, weeks: List[str], receipts: int, photos: int, seed: int):
+    """Write synthetic results and small photos for the load test weeks"""
+    from PIL import Image
+
+    rng = random.Random(seed)
+    for week_index, week in enumerate(weeks):
+        week_dir = analyzer.config.PHOTOS_DIR / week
+        week_dir.mkdir(parents=True, exist_ok=True)
+        for photo_index in range(photos):
+            # Random noise, so near-duplicate detection doesn't merge the photos
+            image = Image.frombytes("L", (64, 96), bytes(rng.getrandbits(8) for _ in range(64 * 96)))
+            image.save(week_dir / f"Bon_{photo_index + 1:02d}.jpeg", "JPEG")
+
+        analyzer.results.upsert(week, [{
+            "Datum": f"{rng.randint(1, 28):02d}.{week_index % 12 + 1:02d}.2025",
+            "Uhrzeit": f"{rng.randint(7, 21):02d}:{rng.randint(0, 59):02d}",
+            "Summe_Food": round(rng.uniform(0, 80), 2),
+            "Summe_NonFood": round(rng.uniform(0, 30), 2),
+            "Foto_Datei": f"Synthetisch_{receipt_index:04d}.jpeg",
+        } for receipt_index in range(receipts)])
+
+def start_server(app) -> Tuple[Any, int]:
+    """Serve the app on a free local port in a background thread"""
+    from werkzeug.serving import make_server
+
+    # One access log line per request would drown the report
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_port
+
+def build_request(route: str, weeks: List[str], rng: random.Random) -> Tuple[str, str, Optional[bytes]]:
+    """Get method, path and body of one request of a route"""
+    week = rng.choice(weeks)
+    if route == 'weeks':
+        return 'GET', '/api/v1/analyze/weeks', None
+    if route == 'week':
+        return 'GET', f'/api/v1/analyze/{week}', None
+    if route == 'summary':
+        return 'GET', f'/api/v1/analyze/{week}/summary', None
+    if route == 'show':
+        return 'GET', '/receipts/show', None
+    return 'POST', '/api/v1/analyze/', json.dumps({'calendar_week': week, 'force_reanalysis': True}).encode()
+
+def run_load(port: int, args, weeks: List[str]) -> Dict[str, List[Tuple[float, bool]]]:
+    """Send requests at the target rate, returns (latency, ok) per route"""
+    rng = random.Random(args.seed)
+    routes = [route for route, weight in args.mix.items() if weight > 0]
+    weights = [args.mix[route] for route in routes]
+    samples: Dict[str, List[Tuple[float, bool]]] = {route: [] for route in routes}
+    samples_lock = threading.Lock()
+    connections = threading.local()
+
+    def send(scheduled_at: float, route: str, method: str, path: str, body: Optional[bytes]):
+        connection = getattr(connections, 'connection', None)
+        if connection is None:
+            connection = connections.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=300)
+        try:
+            connection.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+            response = connection.getresponse()
+            response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connections.connection = None
+            ok = False
+        # Timed from the scheduled send time, so waiting for a free connection counts as latency
+        # (otherwise a stalled server hides its delay, coordinated omission)
+        with samples_lock:
+            samples[route].append((time.perf_counter() - scheduled_at, ok))
+
+    interval = 1.0 / args.rps
+    total = int(args.rps * args.duration)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        start = time.perf_counter()
+        for index in range(total):
+            # Open loop: requests are sent on schedule, slow responses don't slow down the load
+            scheduled_at = start + index * interval
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            route = rng.choices(routes, weights)[0]
+            executor.submit(send, scheduled_at, route, *build_request(route, weeks, rng))
+    return samples
+
+def summarize(samples: Dict[str, List[Tuple[float, bool]]], seconds: float) -> Dict[str, Dict[str, float]]:
+    """Get requests, throughput, latency percentiles in ms and error rate per route and in total"""
+    def stats(entries):
+        latencies = np.array([latency for latency, _ in entries]) * 1000
+        errors = sum(1 for _, ok in entries if not ok)
+        return {
+            'requests': len(entries),
+            'rps': round(len(entries) / seconds, 2),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1) if len(entries) else 0.0,
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1) if len(entries) else 0.0,
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1) if len(entries) else 0.0,
+            'error_rate': round(errors / len(entries), 4) if entries else 0.0
+        }
+
+    results = {route: stats(entries) for route, entries in samples.items()}
+    results['total'] = stats([entry for entries in samples.values() for entry in entries])
+    return results
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[Dict[str, Any]] = None):
+    """Print the results per route, with the p95 change against a baseline"""
+    print(f"\n{'route':<10}{'requests':>10}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>9}"
+          f"{'p95 vs base':>14}")
+    for route, stats in results.items():
+        change = ""
+        base = (baseline or {}).get('results', {}).get(route)
+        if base and base['p95_ms']:
+            change = f"{(stats['p95_ms'] / base['p95_ms'] - 1) * 100:+.0f}%"
+        print(f"{route:<10}{stats['requests']:>10}{stats['rps']:>9.1f}{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}"
+              f"{stats['p99_ms']:>10.1f}{stats['error_rate'] * 100:>8.1f}%{change:>14}")
+
+def regressions(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Get the routes whose p95 latency or error rate got worse than allowed"""
+    found = []
+    for route, stats in results.items():
+        base = baseline.get('results', {}).get(route)
+        if not base:
+            continue
+        if base['p95_ms'] and stats['p95_ms'] > base['p95_ms'] * (1 + max_regression / 100):
+            found.append(f"{route}: p95 {base['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+        if stats['error_rate'] > base['error_rate']:
+            found.append(f"{route}: error rate {base['error_rate']:.2%} -> {stats['error_rate']:.2%}")
+    return found
+
+def main(argv=None):
+    """Boot the app against the stub backend, run the load and report"""
+    args = parse_args(argv)
+
+    # Everything the server writes goes to a temporary data directory, removed at the end
+    data_dir = tempfile.mkdtemp(prefix="receipt_load_test_")
+    try:
+        return run_load_test(args, data_dir)
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+def run_load_test(args, data_dir: str) -> int:
+    """Steps of main with the temporary data directory, returns the exit code"""
+    os.environ['DATA_DIR'] = data_dir
+    os.environ.setdefault('GEMINI_API_KEY', 'load-test')
+    os.environ['PROFILING_ENABLED'] = 'False'
+    sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+    from server.api import create_app
+    from server.services.receipt_analyzer import get_analyzer
+
+    analyzer = get_analyzer()
+    stub = StubBackend(args.ai_latency, args.seed)
+    analyzer.backend = stub
+
+    weeks = [f"2025CW_{week:02d}" for week in range(1, args.weeks + 1)]
+    print(f"🧪 Synthetic data in {data_dir}: {len(weeks)} weeks, {args.receipts} receipts and "
+          f"{args.photos} photos per week")
+    create_synthetic_data(analyzer, weeks, args.receipts, args.photos, args.seed)
+
+    server, port = start_server(create_app())
+    mix = ", ".join(f"{route}={weight:g}" for route, weight in args.mix.items())
+    print(f"🚀 {args.rps:g} req/s for {args.duration:g}s with {args.concurrency} connections ({mix})")
+
+    start = time.perf_counter()
+    samples = run_load(port, args, weeks)
+    seconds = time.perf_counter() - start
+    server.shutdown()
+
+    results = summarize({route: entries for route, entries in samples.items() if entries}, seconds)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_results(results, baseline)
+    print(f"\nStub AI calls: {stub.calls} ({args.ai_latency:g}s each)")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump({'settings': {'rps': args.rps, 'duration': args.duration, 'concurrency': args.concurrency,
+                                    'mix': args.mix, 'weeks': args.weeks, 'receipts': args.receipts,
+                                    'photos': args.photos, 'ai_latency': args.ai_latency},
+                       'results': results}, f, indent=2)
+        print(f"💾 Baseline saved to {args.save_baseline}")
+
+    if baseline is not None:
+        found = regressions(results, baseline, args.max_regression)
+        if found:
+            print("❌ Regressions against the baseline:")
+            for regression in found:
+                print(f"   {regression}")
+            return 1
+        print("✅ No regressions against the baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
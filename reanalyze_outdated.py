@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Re-analyze only the receipts produced by another prompt version or model than configured
+
+Set PROMPT_VERSION (versions in src/server/core/prompts.py) or GEMINI_MODEL, then roll
+the change out over the history step by step:
+
+Usage:
+    python reanalyze_outdated.py --dry-run                 # count outdated rows per week
+    python reanalyze_outdated.py --fraction 0.1            # re-analyze 10% of them
+    python reanalyze_outdated.py --fraction 1 2025CW_31    # all outdated rows of one week
+"""
+import argparse
+import sys
+import os
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from server.core.config import DevelopmentConfig
+from server.services.receipt_analyzer import get_analyzer, in_rollout
+
+def parse_fraction(value: str) -> float:
+    """Parse a rollout fraction between 0 and 1"""
+    fraction = float(value)
+    if not 0 < fraction <= 1:
+        raise argparse.ArgumentTypeError("fraction must be greater than 0 and at most 1")
+    return fraction
+
+def main():
+    """Re-analyze the outdated rows of the selected weeks and report what is left"""
+    parser = argparse.ArgumentParser(description="Re-analyze receipts of outdated prompt versions or models.")
+    parser.add_argument('weeks', nargs='*', help="calendar weeks like 2025CW_31 (default: all weeks)")
+    parser.add_argument('--fraction', type=parse_fraction, default=1.0,
+                        help="share of the outdated rows to re-analyze, stable across runs (default: 1)")
+    parser.add_argument('--deadline', type=float, help="time budget per week in seconds")
+    parser.add_argument('--dry-run', action='store_true', help="only count the outdated rows")
+    args = parser.parse_args()
+
+    config = DevelopmentConfig()
+    analyzer = get_analyzer(config)
+    target = f"{config.PROMPT_VERSION}/{config.GEMINI_MODEL}"
+    calendar_weeks = args.weeks or analyzer.get_available_weeks()
+    print(f"🔁 Target version {target}, rollout fraction {args.fraction:g}")
+
+    remaining = 0
+    failed = False
+    for calendar_week in calendar_weeks:
+        if args.dry_run:
+            outdated = analyzer.find_outdated(calendar_week)
+            versions = {}
+            for row in outdated:
+                version = f"{row['prompt_version']}/{row['model']}"
+                versions[version] = versions.get(version, 0) + 1
+            selected = sum(1 for row in outdated
+                           if in_rollout(row['bild_hash'] or f"{calendar_week}/{row['foto_datei']}", target,
+                                         args.fraction))
+            if outdated:
+                print(f"{calendar_week}: {len(outdated)} outdated ({', '.join(f'{v}: {n}' for v, n in versions.items())}), "
+                      f"{selected} in the rollout")
+            remaining += len(outdated)
+            continue
+
+        report = analyzer.reanalyze_outdated(calendar_week, args.fraction, deadline_seconds=args.deadline)
+        if report['error']:
+            print(f"    Error: {report['error']}")
+            failed = True
+        failed = failed or any(outcome in ('failed', 'quarantined', 'rejected') for outcome in report['files'].values())
+        remaining += len(analyzer.find_outdated(calendar_week))
+
+    print(f"\nRows not from {target}: {remaining}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Re-run the AI analysis only for quarantined receipts
+
+Usage:
+    python rerun_quarantined.py              # all weeks with quarantined receipts
+    python rerun_quarantined.py 2025CW_31    # only the given calendar weeks
+"""
+import sys
+import os
+
+# Add the src directory to Python path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
+
+from server.core.config import DevelopmentConfig
+from server.services.receipt_analyzer import get_analyzer
+
+def main():
+    """Re-analyze quarantined receipts and report what is still left"""
+    config = DevelopmentConfig()
+    analyzer = get_analyzer(config)
+
+    calendar_weeks = sys.argv[1:] or analyzer.quarantine.get_weeks()
+    if not calendar_weeks:
+        print("No quarantined receipts found.")
+        return 0
+
+    remaining = 0
+    for calendar_week in calendar_weeks:
+        analyzer.reanalyze_quarantined(calendar_week, priority='backfill')
+
+        still_quarantined = analyzer.quarantine.load(calendar_week)
+        remaining += len(still_quarantined)
+        for file_name, entry in still_quarantined.items():
+            print(f"   {calendar_week}/{file_name} still quarantined: {entry['error']}")
+
+    print(f"\nReceipts still in quarantine: {remaining}")
+    return 1 if remaining else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,25 +1,53 @@
 #!/usr/bin/env python3
 """
 Simple startup script for the Receipt Analysis application
+
+Usage:
+    python run_app.py               # Flask development server with reloader
+    python run_app.py --production  # multi-worker WSGI server (Gunicorn/Waitress)
+    python run_app.py --asgi        # analysis endpoints on an event loop (Uvicorn)
 """
+import argparse
 import sys
 import os
 
 # Add the src directory to Python path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
-from src.server.api.app import app
+from src.server.core.config import config
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Start the Receipt Analysis Web Application")
+    parser.add_argument('--production', action='store_true',
+                        help="run under a multi-worker WSGI server configured from SERVER_* settings")
+    parser.add_argument('--asgi', action='store_true',
+                        help="run the async analysis endpoints on an event loop under Uvicorn (ASGI_* settings)")
+    args = parser.parse_args()
+
+    config_name = 'production' if args.production else os.getenv('FLASK_CONFIG', 'default')
+    app_config = config[config_name]
+    base_url = f"http://localhost:{app_config.PORT}"
+
     print("Starting Receipt Analysis Web Application...")
-    print("Application will be available at: http://localhost:8081")
+    print(f"Application will be available at: {base_url}")
     print("Available routes:")
-    print("  - http://localhost:8081/swagger")
-    print("  - http://localhost:8081/receipts/home")
-    print("  - http://localhost:8081/receipts/upload") 
-    print("  - http://localhost:8081/receipts/analyse")
-    print("  - http://localhost:8081/receipts/show")
-    print("  - http://localhost:8081/receipts/about")
+    print(f"  - {base_url}/swagger")
+    print(f"  - {base_url}/receipts/home")
+    print(f"  - {base_url}/receipts/upload")
+    print(f"  - {base_url}/receipts/analyse")
+    print(f"  - {base_url}/receipts/show")
+    print(f"  - {base_url}/receipts/about")
     print("\nPress Ctrl+C to stop the server")
-    
-    app.run(debug=True, host='0.0.0.0', port=8081)
\ No newline at end of file
+
+    if args.asgi:
+        from src.server.production import run_asgi_server
+        print(f"ASGI mode: {app_config.ASGI_WORKERS} event loop workers")
+        run_asgi_server(config_name)
+    elif args.production:
+        from src.server.production import run_production_server
+        print(f"Production mode: {app_config.SERVER_WORKERS} workers x {app_config.SERVER_THREADS} threads")
+        run_production_server(config_name)
+    else:
+        from src.server.api import create_app
+        app = create_app(config_name)
+        app.run(debug=app_config.DEBUG, host=app_config.HOST, port=app_config.PORT)
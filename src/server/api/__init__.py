@@ -5,6 +5,10 @@ from flask_cors import CORS
 
 from ..core.config import config
 from ..web.routes import register_routes
+from ..services.profiles import ProfileStore
+from ..services.tracing import default_tracer
+from .profiling import register_profiling
+from .tracing import register_tracing
 from .v1 import system_api, analysis_api
 
 
@@ -39,5 +43,13 @@ def create_app(config_name=None):
     # Register web routes (existing HTML interface)
     register_routes(app)
     
+    # Profile single requests on demand, no hooks at all unless enabled
+    if app.config['PROFILING_ENABLED'] and app.config['PROFILING_TOKEN']:
+        register_profiling(app, ProfileStore(config[config_name]))
+    
+    # Trace requests with the analysis steps they run, no hooks at all unless enabled
+    if app.config['TRACING_ENABLED']:
+        register_tracing(app, default_tracer(config[config_name]))
+    
     return app
 
@@ -3,4 +3,5 @@ from . import create_app
 app = create_app()
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Development server only, use `python run_app.py --production` for production
+    app.run(debug=app.config['DEBUG'], host=app.config['HOST'], port=app.config['PORT'])
\ No newline at end of file
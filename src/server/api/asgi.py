@@ -0,0 +1,176 @@
+"""
+Async (ASGI) application with the analysis endpoints on an event loop
+
+POST /api/v1/analyze/ and POST /api/v1/analyze/receipt are served by coroutines
+that await the AI calls, so hundreds of receipts in progress share one event
+loop instead of holding a thread each. Every other request, including GET
+requests to the same paths, is passed to the Flask app, which runs in a thread
+pool, so all existing routes keep working unchanged.
+"""
+
+import asyncio
+import io
+import json
+import os
+from typing import Optional, Dict, Any, Callable, Awaitable
+
+from flask_restx import marshal
+from werkzeug.exceptions import HTTPException
+
+from ..core.config import config
+from ..services.tracing import default_tracer
+from . import create_app
+from .v1 import analysis
+
+# Request bodies up to this size beyond MAX_FILE_SIZE are accepted (multipart framing, form fields)
+BODY_OVERHEAD_BYTES = 64 * 1024
+
+
+def create_asgi_app(config_name=None) -> "AsyncAnalysisApp":
+    """
+    Create the ASGI application around the Flask application
+
+    Raises:
+        RuntimeError: If a2wsgi, which runs the Flask app under ASGI, is not installed
+    """
+    try:
+        from a2wsgi import WSGIMiddleware
+    except ImportError:
+        raise RuntimeError("The ASGI server requires a2wsgi and uvicorn: pip install -r requirements.txt")
+
+    if config_name is None:
+        config_name = os.getenv('FLASK_CONFIG', 'default')
+    app_config = config[config_name]
+
+    flask_app = create_app(config_name)
+    wsgi_app = WSGIMiddleware(flask_app, workers=app_config.ASGI_WSGI_THREADS)
+    return AsyncAnalysisApp(flask_app, wsgi_app, app_config)
+
+
+class AsyncAnalysisApp:
+    """ASGI application routing the analysis endpoints to coroutines and everything else to Flask"""
+
+    def __init__(self, flask_app, wsgi_app, app_config):
+        """
+        Initialize the application
+
+        Args:
+            flask_app: The Flask application, for request parsing in its request context
+            wsgi_app: The Flask application wrapped as ASGI application
+            app_config: Configuration class
+        """
+        self.flask_app = flask_app
+        self.wsgi_app = wsgi_app
+        self.config = app_config
+        self.tracer = default_tracer(app_config) if app_config.TRACING_ENABLED else None
+        self.routes: Dict[tuple, Callable[[Dict[str, Any]], Awaitable[tuple]]] = {
+            ('POST', '/api/v1/analyze/'): self.trigger_analysis,
+            ('POST', '/api/v1/analyze/receipt'): self.analyze_receipt,
+        }
+
+    async def __call__(self, scope, receive, send):
+        """ASGI entry point"""
+        handler = self.routes.get((scope.get('method'), scope.get('path'))) if scope['type'] == 'http' else None
+        if handler is None:
+            await self.wsgi_app(scope, receive, send)
+            return
+
+        body = await self._read_body(receive, self.config.MAX_FILE_SIZE + BODY_OVERHEAD_BYTES)
+        if body is None:
+            await self._send_json(send, 413, {'message': 'Request body too large'})
+            return
+
+        span, token = (self.tracer.start_span('http_request', method=scope['method'], path=scope['path'],
+                                              route=scope['path'], mode='async')
+                       if self.tracer is not None else (None, None))
+        try:
+            status, payload = await self._handle(handler, scope, body)
+            if span is not None:
+                span.set(status_code=status)
+            await self._send_json(send, status, payload,
+                                  {'X-Trace-Id': span.trace_id} if span is not None else None)
+        except BaseException as e:
+            if span is not None:
+                span.fail(e)
+            raise
+        finally:
+            if span is not None:
+                self.tracer.end_span(span, token)
+
+    async def trigger_analysis(self, environ: Dict[str, Any]) -> tuple:
+        """POST /api/v1/analyze/ on the event loop, same request and response as AnalysisTrigger.post"""
+        options = await asyncio.to_thread(self._in_request_context, environ, analysis.parse_analysis_request)
+        calendar_week = options['calendar_week']
+
+        try:
+            if options['dry_run']:
+                return 200, await asyncio.to_thread(analysis.plan_response, calendar_week, options['use_cache'])
+
+            report = await analysis.analyzer.run_week_analysis_async(
+                calendar_week, priority=options['priority'], use_cache=options['use_cache'],
+                deadline_seconds=options['deadline_seconds'])
+            return 202, await asyncio.to_thread(analysis.week_analysis_response, calendar_week, report)
+        except Exception as e:
+            analysis.api.abort(500, f'Analysis failed: {str(e)}')
+
+    async def analyze_receipt(self, environ: Dict[str, Any]) -> tuple:
+        """POST /api/v1/analyze/receipt on the event loop, same request and response as ReceiptAnalysis.post"""
+        upload = await asyncio.to_thread(self._in_request_context, environ, analysis.read_receipt_upload)
+
+        try:
+            result = await analysis.analyzer.analyze_image_async(
+                upload['image_bytes'], upload['file_name'], upload['calendar_week'],
+                priority='interactive', use_cache=upload['use_cache'])
+        except Exception as e:
+            analysis.abort_receipt_error(e)
+
+        response, status = analysis.receipt_upload_response(result, upload['calendar_week'])
+        return status, marshal(response, analysis.api_receipt_upload_result)
+
+    async def _handle(self, handler, scope, body: bytes) -> tuple:
+        """Run a handler, returns the status code and JSON payload, also of aborted requests"""
+        from a2wsgi.wsgi import build_environ
+
+        try:
+            return await handler(build_environ(scope, io.BytesIO(body)))
+        except HTTPException as e:
+            # api.abort and the request parsers attach the flask-restx error body as data
+            return e.code, getattr(e, 'data', None) or {'message': e.description}
+        except Exception as e:
+            print(f"Error in async request {scope['path']}: {e}")
+            return 500, {'message': 'Internal Server Error'}
+
+    def _in_request_context(self, environ: Dict[str, Any], parse: Callable[[], Any]) -> Any:
+        """Run a request parser of the Flask endpoints in a request context built from the environ"""
+        with self.flask_app.request_context(environ):
+            return parse()
+
+    @staticmethod
+    async def _read_body(receive, max_bytes: int) -> Optional[bytes]:
+        """Read the request body, None if it is larger than max_bytes"""
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                break
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > max_bytes:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        return b''.join(chunks)
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        """Send a JSON response, with the CORS header the Flask app sets on /api/ routes"""
+        body = json.dumps(payload).encode('utf-8')
+        response_headers = [(b'content-type', b'application/json'),
+                            (b'content-length', str(len(body)).encode('ascii')),
+                            (b'access-control-allow-origin', b'*')]
+        for name, value in (headers or {}).items():
+            response_headers.append((name.lower().encode('latin1'), value.encode('latin1')))
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': body})
@@ -7,7 +7,12 @@ from flask_restx import fields
 # Analysis request model
 analysis_request_model = {
     'calendar_week': fields.String(required=True, description='Calendar week to analyze (e.g., 2025CW_30)', example='2025CW_30'),
-    'force_reanalysis': fields.Boolean(default=False, description='Force re-analysis even if results exist')
+    'force_reanalysis': fields.Boolean(default=False, description='Force re-analysis even if results exist'),
+    'priority': fields.String(enum=['api', 'backfill'], default='api',
+                              description='Priority class of the AI calls, use backfill for bulk re-analysis'),
+    'dry_run': fields.Boolean(default=False, description='Only plan the analysis: AI calls, cache hits and bytes, without contacting the AI'),
+    'deadline_seconds': fields.Float(description='Time budget of the analysis, photos not analyzed by then are '
+                                                 'returned as unfinished_files (default ANALYSIS_DEADLINE_SECONDS)')
 }
 
 # Individual receipt analysis result
@@ -16,7 +21,10 @@ receipt_analysis_model = {
     'uhrzeit': fields.String(description='Time from receipt'),
     'summe_food': fields.Float(description='Food costs in euros'),
     'summe_nonfood': fields.Float(description='Non-food costs in euros'),
-    'foto_datei': fields.String(description='Source image filename')
+    'foto_datei': fields.String(description='Source image filename'),
+    'duplicate_of': fields.String(description='Already analyzed photo (week/file) this receipt looks like'),
+    'prompt_version': fields.String(description='Prompt version that produced the receipt, null if not recorded'),
+    'model': fields.String(description='AI model that produced the receipt, null if not recorded')
 }
 
 # Analysis result model (receipts field will be set after receipt model is registered)
@@ -25,9 +33,16 @@ analysis_result_model = {
     'total_food': fields.Float(description='Total food costs in euros'),
     'total_nonfood': fields.Float(description='Total non-food costs in euros'),
     'total_receipts': fields.Integer(description='Number of receipts processed'),
+    'flagged_duplicates': fields.Integer(description='Receipts that look like an already analyzed photo'),
     'receipts': fields.List(fields.Raw, description='Individual receipt results'),
     'analysis_date': fields.DateTime(description='When the analysis was performed'),
-    'status': fields.String(enum=['pending', 'processing', 'completed', 'failed'], description='Analysis status')
+    'status': fields.String(enum=['pending', 'processing', 'completed', 'partial', 'failed'], description='Analysis status'),
+    'unfinished_files': fields.List(fields.String, description='Photos not analyzed before the deadline, to be resumed'),
+    'rejected_files': fields.Raw(description='Photos rejected before any AI call (empty, too large, mislabelled, '
+                                             'truncated or too small), file name -> reason'),
+    'run_id': fields.String(description='Journaled run of the analysis, to inspect or resume it'),
+    'total_matches': fields.Integer(description='Number of receipts matching the filters (all pages)'),
+    'next_cursor': fields.String(description='Cursor of the next page, empty on the last page')
 }
 
 # Analysis summary model
@@ -37,9 +52,120 @@ analysis_summary_model = {
     'total_nonfood': fields.Float(description='Total non-food costs in euros'),
     'total_receipts': fields.Integer(description='Number of receipts processed'),
     'grand_total': fields.Float(description='Total costs (food + non-food)'),
+    'flagged_duplicates': fields.Integer(description='Receipts that look like an already analyzed photo'),
     'analysis_date': fields.DateTime(description='When the analysis was performed')
 }
 
+# Quarantined receipt model (AI response that could not be parsed)
+quarantine_entry_model = {
+    'foto_datei': fields.String(description='Source image filename'),
+    'image_hash': fields.String(description='SHA-256 hash of the image file'),
+    'raw_response': fields.String(description='Raw AI response that could not be parsed'),
+    'error': fields.String(description='Reason why the response was rejected'),
+    'attempts': fields.Integer(description='Number of analyses that ended in quarantine'),
+    'quarantined_at': fields.DateTime(description='When the receipt was quarantined')
+}
+
+# Quarantine list model (entries field will be set after entry model is registered)
+quarantine_list_model = {
+    'calendar_week': fields.String(required=True, description='Calendar week'),
+    'entries': fields.List(fields.Raw, description='Quarantined receipts'),
+    'total': fields.Integer(description='Number of quarantined receipts')
+}
+
+# Single receipt analysis result (receipt field will be set after receipt model is registered)
+receipt_upload_result_model = {
+    'status': fields.String(enum=['analyzed', 'duplicate', 'quarantined'], description='Outcome of the analysis'),
+    'receipt': fields.Raw(description='Extracted receipt, empty if the AI response could not be parsed'),
+    'calendar_week': fields.String(description='Calendar week the photo was filed into, empty if not stored'),
+    'image_hash': fields.String(description='SHA-256 hash of the image file'),
+    'cached': fields.Boolean(description='Answered from the extraction cache without an AI call'),
+    'error': fields.String(description='Reason why the AI response was rejected')
+}
+
+# AI call accounting of a calendar week
+usage_summary_model = {
+    'calendar_week': fields.String(required=True, description='Calendar week'),
+    'calls': fields.Integer(description='Accounted AI calls (analyzed and quarantined receipts)'),
+    'quarantined_calls': fields.Integer(description='AI calls whose response ended in quarantine'),
+    'unaccounted_receipts': fields.Integer(description='Receipts without an AI call of their own (cached extractions, older results)'),
+    'image_bytes': fields.Integer(description='Image bytes sent to the AI'),
+    'prompt_tokens': fields.Integer(description='Prompt tokens (text and image)'),
+    'response_tokens': fields.Integer(description='Response tokens'),
+    'total_tokens': fields.Integer(description='Prompt and response tokens'),
+    'retries': fields.Integer(description='Retried AI calls (rate limits, timeouts)'),
+    'latency_ms_total': fields.Float(description='Time spent in AI calls in milliseconds'),
+    'latency_ms_avg': fields.Float(description='Average time per receipt in AI calls in milliseconds'),
+    'latency_ms_p95': fields.Float(description='95th percentile of the time per receipt in AI calls in milliseconds'),
+    'wait_ms_total': fields.Float(description='Time spent waiting for a free AI call slot in milliseconds'),
+    'models': fields.List(fields.String, description='AI models used')
+}
+
+# Dry-run classification of one photo
+plan_file_model = {
+    'foto_datei': fields.String(description='Photo file name'),
+    'classification': fields.String(enum=['new', 'changed', 'unchanged', 'cached', 'duplicate', 'rejected',
+                                          'unsupported'],
+                                    description='What the analysis would do with the photo'),
+    'size': fields.Integer(description='File size in bytes'),
+    'ai_call': fields.Boolean(description='Whether the photo would be sent to the AI')
+}
+
+# Dry-run plan of an analysis (files field will be set after plan file model is registered)
+analysis_plan_model = {
+    'calendar_week': fields.String(description='Calendar week identifier'),
+    'status': fields.String(enum=['planned'], description='Always planned, nothing was analyzed'),
+    'files': fields.List(fields.Raw, description='Classification of every photo'),
+    'counts': fields.Raw(description='Number of photos per classification'),
+    'planned_calls': fields.Integer(description='Number of AI calls the analysis would make'),
+    'upload_bytes': fields.Integer(description='Bytes of the photos sent to the AI'),
+    'call_seconds': fields.Float(description='Assumed duration of one AI call in seconds'),
+    'parallel_calls': fields.Integer(description='AI calls assumed to run at the same time'),
+    'estimated_seconds': fields.Float(description='Estimated duration of the AI calls in seconds')
+}
+
+# State of a journaled week analysis run
+run_state_model = {
+    'run_id': fields.String(description='Run identifier'),
+    'calendar_week': fields.String(description='Calendar week of the run'),
+    'status': fields.String(enum=['running', 'completed', 'partial', 'failed', 'interrupted'],
+                            description='Run status; interrupted runs stopped without finishing '
+                                        '(or run in another process)'),
+    'started_at': fields.DateTime(description='When the run started'),
+    'updated_at': fields.DateTime(description='Last journal entry'),
+    'total_files': fields.Integer(description='Number of photos of the run'),
+    'done': fields.Raw(description='Finished photos per outcome'),
+    'journaled_responses': fields.Integer(description='AI responses in the journal, replayed on resume'),
+    'remaining_files': fields.List(fields.String, description='Photos a resume would still analyze')
+}
+
+# List of journaled runs (runs field will be set after run state model is registered)
+run_list_model = {
+    'runs': fields.List(fields.Raw, description='Runs, newest first'),
+    'total': fields.Integer(description='Number of runs')
+}
+
+# Options of resuming a run
+run_resume_model = {
+    'priority': fields.String(enum=['api', 'backfill'], default='backfill', description='Priority class of the AI calls'),
+    'deadline_seconds': fields.Float(description='Time budget of the resumed run (default ANALYSIS_DEADLINE_SECONDS)')
+}
+
+# Costs of one year from the result history
+history_year_model = {
+    'year': fields.Integer(description='Year of the calendar weeks'),
+    'weeks': fields.Integer(description='Number of analyzed calendar weeks'),
+    'total_receipts': fields.Integer(description='Number of receipts'),
+    'total_food': fields.Float(description='Total food costs in euros'),
+    'total_nonfood': fields.Float(description='Total non-food costs in euros'),
+    'grand_total': fields.Float(description='Total costs (food + non-food)')
+}
+
+# Result history summary model (years field will be set after year model is registered)
+history_summary_model = {
+    'years': fields.List(fields.Raw, description='Costs per year'),
+    'total': fields.Integer(description='Number of years')
+}
 
 # Calendar week model
 calendar_week_model = {
@@ -64,5 +190,16 @@ analysis_models = {
     'AnalysisSummary': analysis_summary_model,
     'ReceiptAnalysis': receipt_analysis_model,
     'CalendarWeek': calendar_week_model,
-    'CalendarWeeksList': calendar_weeks_model
+    'CalendarWeeksList': calendar_weeks_model,
+    'QuarantineEntry': quarantine_entry_model,
+    'QuarantineList': quarantine_list_model,
+    'ReceiptUploadResult': receipt_upload_result_model,
+    'UsageSummary': usage_summary_model,
+    'PlanFile': plan_file_model,
+    'AnalysisPlan': analysis_plan_model,
+    'RunState': run_state_model,
+    'RunList': run_list_model,
+    'RunResume': run_resume_model,
+    'HistoryYear': history_year_model,
+    'HistorySummary': history_summary_model
 }
\ No newline at end of file
@@ -23,12 +23,63 @@ system_info_model = {
     'supported_image_formats': fields.List(fields.String, description='Supported image file formats'),
     'max_file_size': fields.Integer(description='Maximum file size in bytes'),
     'ai_model': fields.String(description='AI model being used'),
-    'available_weeks': fields.List(fields.String, description='Available calendar weeks')
+    'prompt_version': fields.String(description='Version of the analysis prompt being used'),
+    'available_weeks': fields.List(fields.String, description='Available calendar weeks'),
+    'ai_scheduler': fields.Raw(description='AI call slots in use (this and all processes), waiting and granted calls per priority class')
+}
+
+
+# Stored request profile model
+profile_model = {
+    'name': fields.String(description='Profile file name'),
+    'created': fields.DateTime(description='When the request was profiled'),
+    'method': fields.String(description='HTTP method of the request'),
+    'route': fields.String(description='Path of the request as in the file name (slashes replaced by _)'),
+    'duration_ms': fields.Integer(description='Duration of the request in milliseconds (with profiling overhead)'),
+    'size': fields.Integer(description='File size in bytes')
+}
+
+# Stored request profiles list model (profiles field will be set after profile model is registered)
+profile_list_model = {
+    'profiles': fields.List(fields.Raw, description='Stored profiles, newest first'),
+    'total': fields.Integer(description='Number of stored profiles')
+}
+
+# Tracing span model
+span_model = {
+    'trace_id': fields.String(description='Trace the span belongs to'),
+    'span_id': fields.String(description='Id of the span'),
+    'parent_id': fields.String(description='Id of the enclosing span, null for the root span'),
+    'name': fields.String(description='Step of the pipeline (http_request, analyze_week, process_photo, ai_call, ...)'),
+    'start': fields.DateTime(description='When the step started (UTC)'),
+    'duration_ms': fields.Float(description='Duration of the step in milliseconds'),
+    'status': fields.String(description='ok or error', enum=['ok', 'error']),
+    'attributes': fields.Raw(description='Attributes like week, file, bytes, cache_hit or run_id'),
+    'pid': fields.Integer(description='Process that ran the step (batch workers have their own)'),
+    'thread': fields.String(description='Thread that ran the step')
+}
+
+# Trace model (spans field will be set after span model is registered)
+trace_model = {
+    'trace_id': fields.String(description='Id of the trace'),
+    'spans': fields.List(fields.Raw, description='Spans of the trace in order of their start'),
+    'duration_ms': fields.Float(description='Duration of the root span in milliseconds')
+}
+
+# Trace ids list model
+trace_list_model = {
+    'trace_ids': fields.List(fields.String, description='Ids of the matching traces, newest first'),
+    'total': fields.Integer(description='Number of matching traces')
 }
 
 
 # Group all response models
 response_models = {
     'HealthResponse': health_response_model,
-    'SystemInfo': system_info_model
+    'SystemInfo': system_info_model,
+    'Profile': profile_model,
+    'ProfileList': profile_list_model,
+    'Span': span_model,
+    'Trace': trace_model,
+    'TraceList': trace_list_model
 }
\ No newline at end of file
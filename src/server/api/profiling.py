@@ -0,0 +1,70 @@
+"""
+Opt-in profiling of single requests for the API and web routes
+"""
+
+import cProfile
+import hmac
+import time
+from typing import Optional
+
+from flask import Flask, g, request
+
+from ..services.profiles import ProfileStore
+
+# Header (or query parameter) with the admin token that profiles a request
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_QUERY_PARAMETER = '_profile'
+
+
+def is_profiling_admin(app: Flask, token: Optional[str]) -> bool:
+    """Check if a request token is the configured profiling admin token"""
+    expected = app.config.get('PROFILING_TOKEN') or ''
+    return bool(expected and token) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def request_profiling_token() -> Optional[str]:
+    """Get the profiling token of the current request from its header or query string"""
+    return request.headers.get(PROFILE_HEADER) or request.args.get(PROFILE_QUERY_PARAMETER)
+
+
+def register_profiling(app: Flask, store: ProfileStore):
+    """
+    Profile requests that carry the profiling admin token
+
+    Only called when PROFILING_ENABLED is set, so without it no hook runs at
+    all. A profiled request runs under cProfile; its profile is stored in the
+    store and named in the X-Profile-Id response header.
+    """
+
+    @app.before_request
+    def start_profile():
+        if not is_profiling_admin(app, request_profiling_token()):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler is already active in this thread
+            return
+        g.profile = profile
+        g.profile_start = time.perf_counter()
+
+    @app.after_request
+    def save_profile(response):
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profile.disable()
+        duration_ms = (time.perf_counter() - g.pop('profile_start')) * 1000
+        try:
+            response.headers['X-Profile-Id'] = store.save(profile, request.method, request.path, duration_ms)
+        except OSError as e:
+            print(f"Could not store request profile: {e}")
+        return response
+
+    @app.teardown_request
+    def stop_profile(error=None):
+        # after_request is skipped when the request failed with an exception
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile.disable()
@@ -2,12 +2,10 @@
 AI Prompts for receipt analysis
 """
 
-# Main prompt for receipt analysis
-RECEIPT_ANALYSIS_PROMPT = (
-    "Es ist ein Kassenbon und Eurobeträge mit Komma. "
-    "Mache einen CSV Datensatz no header und ohne Erläuterung mit Semikolon als Trenner von "
-    "Datum mit Punkt, Uhrzeit mit Doppelpunkt, Summe_Food, Summe_NonFood"
-)
+from ..core.config import Config
+
+# Main prompt for receipt analysis, the configured version of the registry in core/prompts.py
+RECEIPT_ANALYSIS_PROMPT = Config.PROMPT_TEXT
 
 # Alternative prompts for future use
 DETAILED_RECEIPT_PROMPT = (
@@ -21,4 +19,4 @@ CATEGORIZATION_PROMPT = (
 )
 
 # Export the main prompt for backward compatibility
-PROMPT_TEXT = RECEIPT_ANALYSIS_PROMPT
\ No newline at end of file
+PROMPT_TEXT = RECEIPT_ANALYSIS_PROMPT
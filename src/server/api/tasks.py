@@ -1,5 +1,8 @@
 import sys
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Optional, List, Dict, Any
 
 # Handle direct execution
 if __name__ == "__main__":
@@ -7,43 +10,186 @@ if __name__ == "__main__":
     project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
     sys.path.insert(0, project_root)
     from src.server.core.config import DevelopmentConfig
-    from src.server.services.receipt_analyzer import ReceiptAnalyzer
+    from src.server.services.receipt_analyzer import ReceiptAnalyzer, get_analyzer
+    from src.server.services.manifest import parse_calendar_week
+    from src.server.services.tracing import default_tracer
 else:
     # Handle module import
     from ..core.config import DevelopmentConfig
-    from ..services.receipt_analyzer import ReceiptAnalyzer
+    from ..services.receipt_analyzer import ReceiptAnalyzer, get_analyzer
+    from ..services.manifest import parse_calendar_week
+    from ..services.tracing import default_tracer
 
-def load_photos_of_one_week_and_AI_analyse_each_and_store_to_csv():
+# Analyzer of a batch worker process, created once per process by _init_batch_worker
+_worker_analyzer = None
+
+def load_photos_of_one_week_and_AI_analyse_each_and_store_to_csv(analyzer: Optional[ReceiptAnalyzer] = None):
     """
     Load Photos of weekly receipts, analyse by AI, summarize their costs and store in one csv-file
-    :parameter: none
+    :parameter: analyzer: optional ReceiptAnalyzer to reuse
     :return: dftotal
     """
     # Initialize configuration and service
-    config = DevelopmentConfig()
-    analyzer = ReceiptAnalyzer(config)
-    
+    if analyzer is None:
+        analyzer = get_analyzer(DevelopmentConfig())
+
     # Get calendar week from user
     calendar_week_for_analysis = input("Enter in nine digits the subdirectory of the photos of weekly receipts like..e.g. 2025CW_30\n-->")
-    
+
     # Analyze the calendar week
-    df_total = analyzer.analyze_calendar_week(calendar_week_for_analysis)
-    
+    df_total = analyzer.analyze_calendar_week(calendar_week_for_analysis, priority='interactive')
+
     return df_total
 
+def select_calendar_weeks(available_weeks: List[str], weeks: Optional[List[str]] = None,
+                          all_weeks: bool = False, since: Optional[str] = None) -> List[str]:
+    """
+    Select the calendar weeks of a batch run
+
+    Args:
+        available_weeks: Calendar weeks that have a photo directory
+        weeks: Explicitly requested calendar weeks
+        all_weeks: Select every available calendar week
+        since: Select available calendar weeks from this week on (inclusive)
+
+    Returns:
+        Sorted list of selected calendar weeks without duplicates
+    """
+    selected = set(weeks or [])
+    if all_weeks:
+        selected.update(available_weeks)
+    if since:
+        since_key = parse_calendar_week(since)
+        selected.update(week for week in available_weeks if parse_calendar_week(week) >= since_key)
+
+    return sorted(selected, key=parse_calendar_week)
+
+def _init_batch_worker():
+    """Create the analyzer of a batch worker process, its AI calls share the limit of all processes"""
+    global _worker_analyzer
+    _worker_analyzer = ReceiptAnalyzer(DevelopmentConfig())
+
+def _analyze_week_in_worker(calendar_week: str, incremental: bool,
+                            deadline_at: Optional[float] = None,
+                            trace_context: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Analyze one calendar week in a batch worker process, until the wall clock time deadline_at"""
+    # The spans of the week continue the trace of the batch in the parent process
+    with _worker_analyzer.tracer.attach(trace_context):
+        with _worker_analyzer.tracer.span('batch_week', week=calendar_week) as span:
+            report = _run_week_in_worker(calendar_week, incremental, deadline_at)
+            span.set(status=report['status'], run_id=report['run_id'])
+            return report
+
+def _run_week_in_worker(calendar_week: str, incremental: bool, deadline_at: Optional[float]) -> Dict[str, Any]:
+    """Steps of _analyze_week_in_worker, returns its report"""
+    start = time.monotonic()
+    remaining = deadline_at - time.time() if deadline_at is not None else None
+    if remaining is not None and remaining <= 0:
+        # The batch ran out of time before this week got a worker
+        unfinished = [photo['name'] for photo in _worker_analyzer.manifest.get_photos(calendar_week)]
+        report = {'status': 'partial', 'error': None, 'files': dict.fromkeys(unfinished, 'unfinished'),
+                  'unfinished_files': unfinished, 'run_id': None}
+    else:
+        report = _worker_analyzer.run_week_analysis(calendar_week, incremental=incremental, priority='backfill',
+                                                    deadline_seconds=remaining)
+
+    # DataFrames stay in the worker, only the outcome goes back to the parent process
+    return {
+        'calendar_week': calendar_week,
+        'status': report['status'],
+        'error': report['error'],
+        'files': report['files'],
+        'unfinished_files': report['unfinished_files'],
+        'rejected_files': report.get('rejected_files', {}),
+        'run_id': report['run_id'],
+        'seconds': time.monotonic() - start
+    }
+
+def analyze_weeks_in_parallel(calendar_weeks: List[str], jobs: int = 2,
+                              incremental: bool = False,
+                              deadline_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+    """
+    Analyze several calendar weeks in parallel worker processes
+
+    The workers share the AI_MAX_CONCURRENCY parallel AI calls of all processes.
+    Progress and throughput are printed whenever a week is finished.
+
+    Args:
+        calendar_weeks: Calendar weeks to analyze
+        jobs: Number of worker processes
+        incremental: Skip photos whose unchanged content is already in the results
+        deadline_seconds: Time budget of the whole batch, photos not analyzed by then are unfinished
+
+    Returns:
+        List of week reports with 'status', 'error', 'files', 'unfinished_files', 'rejected_files',
+        'run_id' and 'seconds'
+    """
+    config = DevelopmentConfig()
+    tracer = default_tracer(config)
+    with tracer.span('batch', weeks=len(calendar_weeks), jobs=jobs, incremental=incremental,
+                     deadline_seconds=deadline_seconds) as span:
+        reports = _run_batch(calendar_weeks, jobs, incremental, deadline_seconds, tracer.context())
+        span.set(failed=batch_failed(reports))
+    return reports
+
+def _run_batch(calendar_weeks: List[str], jobs: int, incremental: bool, deadline_seconds: Optional[float],
+               trace_context: Optional[Dict[str, str]]) -> List[Dict[str, Any]]:
+    """Steps of analyze_weeks_in_parallel, returns its week reports"""
+    deadline_at = time.time() + deadline_seconds if deadline_seconds is not None else None
+    reports = []
+    processed_photos = 0
+    start = time.monotonic()
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_batch_worker) as executor:
+        futures = {executor.submit(_analyze_week_in_worker, week, incremental, deadline_at, trace_context): week
+                   for week in calendar_weeks}
+
+        for future in as_completed(futures):
+            calendar_week = futures[future]
+            try:
+                report = future.result()
+            except Exception as e:
+                report = {'calendar_week': calendar_week, 'status': 'failed', 'error': str(e),
+                          'files': {}, 'unfinished_files': [], 'rejected_files': {}, 'run_id': None,
+                          'seconds': 0.0}
+            reports.append(report)
+
+            outcomes = list(report['files'].values())
+            analyzed = outcomes.count('analyzed')
+            processed_photos += analyzed
+            elapsed = time.monotonic() - start
+
+            print(f"[{len(reports)}/{len(calendar_weeks)}] {calendar_week}: {report['status']}, "
+                  f"{analyzed} analyzed, {outcomes.count('unchanged')} unchanged, "
+                  f"{outcomes.count('duplicate')} duplicates, {outcomes.count('quarantined')} quarantined, "
+                  f"{outcomes.count('rejected')} rejected, {outcomes.count('failed')} failed, "
+                  f"{outcomes.count('unfinished')} unfinished "
+                  f"in {report['seconds']:.1f}s | total {processed_photos} photos, "
+                  f"{processed_photos / elapsed if elapsed else 0.0:.2f} photos/s")
+            if report['error']:
+                print(f"    Error: {report['error']}")
+
+    return sorted(reports, key=lambda r: parse_calendar_week(r['calendar_week']))
+
+def batch_failed(reports: List[Dict[str, Any]]) -> bool:
+    """Check if a batch run had failed weeks, failed, quarantined or rejected photos"""
+    for report in reports:
+        if report['status'] != 'completed':
+            return True
+        if any(outcome in ('failed', 'quarantined', 'rejected') for outcome in report['files'].values()):
+            return True
+    return False
+
 if __name__ == "__main__":
-    dummy_temp = load_photos_of_one_week_and_AI_analyse_each_and_store_to_csv()
+    analyzer = get_analyzer(DevelopmentConfig())
+    dummy_temp = load_photos_of_one_week_and_AI_analyse_each_and_store_to_csv(analyzer)
 
     if dummy_temp is not None:
         print("End of AI-Analysis!")
-        
-        # Initialize analyzer for summary
-        config = DevelopmentConfig()
-        analyzer = ReceiptAnalyzer(config)
-        
+
         # Get summary statistics
         summary = analyzer.get_week_summary(dummy_temp)
-        
+
         print("Weekly Analysis Summary:")
         print(f"Total Food Costs: €{summary['total_food']}")
         print(f"Total Non-Food Costs: €{summary['total_nonfood']}")
@@ -51,4 +197,4 @@ if __name__ == "__main__":
         print("\nDetailed Results:")
         print(dummy_temp)
     else:
-        print("Analysis failed or was cancelled.")
\ No newline at end of file
+        print("Analysis failed or was cancelled.")
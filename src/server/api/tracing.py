@@ -0,0 +1,38 @@
+"""
+Tracing spans of the API and web requests
+"""
+
+from flask import Flask, g, request
+
+from ..services.tracing import Tracer
+
+
+def register_tracing(app: Flask, tracer: Tracer):
+    """
+    Trace every request as the root span of the analysis steps it runs
+
+    Only called when TRACING_ENABLED is set. The trace id of a request is
+    returned in the X-Trace-Id response header.
+    """
+
+    @app.before_request
+    def start_span():
+        g.trace_span, g.trace_token = tracer.start_span('http_request', method=request.method, path=request.path)
+
+    @app.after_request
+    def add_trace_header(response):
+        span = g.get('trace_span')
+        if span is not None:
+            span.set(route=request.url_rule.rule if request.url_rule is not None else None,
+                     status_code=response.status_code)
+            response.headers['X-Trace-Id'] = span.trace_id
+        return response
+
+    @app.teardown_request
+    def end_span(error=None):
+        span = g.pop('trace_span', None)
+        if span is None:
+            return
+        if error is not None:
+            span.fail(error)
+        tracer.end_span(span, g.pop('trace_token'))
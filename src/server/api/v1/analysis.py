@@ -2,17 +2,30 @@
 AI Analysis API endpoints
 """
 
-from flask import request
-from flask_restx import Namespace, Resource, fields
+from flask import request, send_file
+from flask_restx import Namespace, Resource, fields, inputs, marshal
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
 from datetime import datetime
+import io
 import os
 import pandas as pd
 
 from ..models.analysis import (analysis_request_model, analysis_result_model, 
                               analysis_summary_model, calendar_weeks_model, 
-                              receipt_analysis_model, calendar_week_model)
+                              receipt_analysis_model, calendar_week_model,
+                              quarantine_entry_model, quarantine_list_model,
+                              history_year_model, history_summary_model,
+                              usage_summary_model, receipt_upload_result_model,
+                              plan_file_model, analysis_plan_model,
+                              run_state_model, run_list_model, run_resume_model)
 from ...core.config import DevelopmentConfig
-from ...services.receipt_analyzer import ReceiptAnalyzer
+from ...services.receipt_analyzer import get_analyzer
+from ...services.manifest import is_calendar_week
+from ...services.intake import IntakeError
+from ...services.receipt_index import (RECEIPT_FIELDS, CATEGORIES, parse_date_key,
+                                       decode_cursor)
+from ...services.history import ResultHistory, EXPORT_FORMATS
 
 # Create API namespace
 api = Namespace('analyze', description='AI analysis operations')
@@ -33,55 +46,427 @@ api_calendar_weeks = api.model('CalendarWeeksList', calendar_weeks_fixed)
 
 api_analysis_summary = api.model('AnalysisSummary', analysis_summary_model)
 
+api_quarantine_entry = api.model('QuarantineEntry', quarantine_entry_model)
+quarantine_list_fixed = quarantine_list_model.copy()
+quarantine_list_fixed['entries'] = fields.List(fields.Nested(api_quarantine_entry), description='Quarantined receipts')
+api_quarantine_list = api.model('QuarantineList', quarantine_list_fixed)
+
+api_usage_summary = api.model('UsageSummary', usage_summary_model)
+
+receipt_upload_result_fixed = receipt_upload_result_model.copy()
+receipt_upload_result_fixed['receipt'] = fields.Nested(api_receipt_analysis, allow_null=True,
+                                                       description='Extracted receipt, empty if the AI response could not be parsed')
+api_receipt_upload_result = api.model('ReceiptUploadResult', receipt_upload_result_fixed)
+
+api_plan_file = api.model('PlanFile', plan_file_model)
+analysis_plan_fixed = analysis_plan_model.copy()
+analysis_plan_fixed['files'] = fields.List(fields.Nested(api_plan_file), description='Classification of every photo')
+api_analysis_plan = api.model('AnalysisPlan', analysis_plan_fixed)
+
+api_run_state = api.model('RunState', run_state_model)
+run_list_fixed = run_list_model.copy()
+run_list_fixed['runs'] = fields.List(fields.Nested(api_run_state), description='Runs, newest first')
+api_run_list = api.model('RunList', run_list_fixed)
+api_run_resume = api.model('RunResume', run_resume_model)
+
+api_history_year = api.model('HistoryYear', history_year_model)
+history_summary_fixed = history_summary_model.copy()
+history_summary_fixed['years'] = fields.List(fields.Nested(api_history_year), description='Costs per year')
+api_history_summary = api.model('HistorySummary', history_summary_fixed)
+
+# Query parameters of the receipt result listing
+result_query = api.parser()
+result_query.add_argument('date_from', type=str, location='args', help='First receipt date (DD.MM.YYYY or YYYY-MM-DD)')
+result_query.add_argument('date_to', type=str, location='args', help='Last receipt date (DD.MM.YYYY or YYYY-MM-DD)')
+result_query.add_argument('category', type=str, choices=CATEGORIES, location='args',
+                          help='Only receipts with food or non-food costs; amount filters then apply to that category')
+result_query.add_argument('min_amount', type=float, location='args', help='Minimum amount in euros')
+result_query.add_argument('max_amount', type=float, location='args', help='Maximum amount in euros')
+result_query.add_argument('limit', type=inputs.int_range(1, 1000), location='args', help='Page size (all receipts if omitted)')
+result_query.add_argument('offset', type=inputs.natural, default=0, location='args', help='Number of receipts to skip')
+result_query.add_argument('cursor', type=str, location='args', help='next_cursor of the previous page')
+# Form of the single receipt upload
+receipt_upload = api.parser()
+receipt_upload.add_argument('photo', type=FileStorage, location='files', required=True, help='Receipt photo (JPEG)')
+receipt_upload.add_argument('calendar_week', type=str, location='form',
+                            help='Store the photo and its result in this calendar week (e.g. 2025CW_30)')
+receipt_upload.add_argument('force_reanalysis', type=inputs.boolean, default=False, location='form',
+                            help='Call the AI even if the photo was analyzed before')
+
+# Query parameters of the run listing
+run_query = api.parser()
+run_query.add_argument('calendar_week', type=str, location='args', help='Only runs of this calendar week')
+
+# Query parameters of the result history
+history_query = api.parser()
+history_query.add_argument('year', type=int, action='append', location='args', help='Only these years (repeatable)')
+
+history_export_query = history_query.copy()
+history_export_query.add_argument('format', type=str, choices=EXPORT_FORMATS, default='parquet', location='args',
+                                  help='File format of the export')
+
+result_query.add_argument('fields', type=str, location='args',
+                          help=f'Comma separated receipt fields to return ({", ".join(RECEIPT_FIELDS)})')
+
 # Initialize analyzer
 config = DevelopmentConfig()
-analyzer = ReceiptAnalyzer(config)
+analyzer = get_analyzer(config)
+
+# Result history is optional (needs pyarrow)
+try:
+    history = ResultHistory(config, analyzer.results)
+except RuntimeError as e:
+    print(f"Result history disabled: {e}")
+    history = None
+
+def convert_record_to_receipt(row):
+    """Convert one result row (dict or DataFrame row) to a receipt dictionary for API response"""
+    return {
+        'datum': str(row.get('Datum', '')),
+        'uhrzeit': str(row.get('Uhrzeit', '')),
+        'summe_food': float(row.get('Summe_Food', 0.0)),
+        'summe_nonfood': float(row.get('Summe_NonFood', 0.0)),
+        'foto_datei': str(row.get('Foto_Datei', '')),
+        'duplicate_of': row.get('Duplikat_Von') if pd.notna(row.get('Duplikat_Von')) else None,
+        'prompt_version': row.get('Prompt_Version') if pd.notna(row.get('Prompt_Version')) else None,
+        'model': row.get('Analyse_Modell') if pd.notna(row.get('Analyse_Modell')) else None
+    }
 
 def convert_dataframe_to_receipts(df_result):
     """Convert DataFrame to list of receipt dictionaries for API response"""
     receipts_data = []
     for _, row in df_result.iterrows():  
-        receipts_data.append({
-            'datum': str(row.get('Datum', '')),
-            'uhrzeit': str(row.get('Uhrzeit', '')),
-            'summe_food': float(row.get('Summe_Food', 0.0)),
-            'summe_nonfood': float(row.get('Summe_NonFood', 0.0)),
-            'foto_datei': str(row.get('Foto_Datei', ''))
-        })
+        receipts_data.append(convert_record_to_receipt(row))
     return receipts_data
 
+def parse_analysis_request():
+    """
+    Validate the JSON body of a week analysis request (in a request context)
+
+    Returns:
+        Dictionary with 'calendar_week', 'priority', 'deadline_seconds', 'use_cache' and 'dry_run'
+    """
+    data = request.json
+    calendar_week = data.get('calendar_week')
+    
+    if not calendar_week:
+        api.abort(400, 'calendar_week is required')
+    
+    # Validate calendar week format
+    if not is_calendar_week(calendar_week):
+        api.abort(400, 'calendar_week must be in format YYYYCW_XX, e.g. 2025CW_30')
+    
+    priority = data.get('priority') or 'api'
+    if priority not in ('api', 'backfill'):
+        api.abort(400, 'priority must be api or backfill')
+    
+    deadline_seconds = parse_deadline_seconds(data)
+    
+    # Check if photos directory exists
+    if calendar_week not in analyzer.manifest.get_weeks():
+        api.abort(404, f'No photos found for calendar week {calendar_week}')
+    
+    # Count available photos
+    if not analyzer.manifest.get_photos(calendar_week):
+        api.abort(404, f'No supported image files found in {calendar_week}')
+    
+    return {
+        'calendar_week': calendar_week,
+        'priority': priority,
+        'deadline_seconds': deadline_seconds,
+        'use_cache': not data.get('force_reanalysis', False),
+        'dry_run': bool(data.get('dry_run'))
+    }
+
+def parse_deadline_seconds(data):
+    """
+    Validate the deadline_seconds of a request body, ANALYSIS_DEADLINE_SECONDS if it is not given
+
+    Returns:
+        Time budget in seconds, None for no deadline
+    """
+    if 'deadline_seconds' not in data:
+        return config.ANALYSIS_DEADLINE_SECONDS or None
+    
+    deadline_seconds = data['deadline_seconds']
+    # bool is an int subclass, true must not pass as a one second budget
+    if isinstance(deadline_seconds, bool) or not isinstance(deadline_seconds, (int, float)) or deadline_seconds <= 0:
+        api.abort(400, 'deadline_seconds must be a positive number')
+    return deadline_seconds
+
+def plan_response(calendar_week, use_cache):
+    """Plan the analysis of a calendar week without running it, returns the marshalled plan"""
+    # The photos of a week are analyzed one after the other
+    plan = analyzer.plan_analysis([calendar_week], use_cache=use_cache, parallel_calls=1)
+    week_plan = plan['weeks'][0]
+    if week_plan['error']:
+        api.abort(500, f"Planning failed: {week_plan['error']}")
+    plan.update(calendar_week=calendar_week, status='planned', files=week_plan['files'])
+    return marshal(plan, api_analysis_plan)
+
+def week_analysis_response(calendar_week, report):
+    """Marshal the report of a week analysis run"""
+    df_result = report['results']
+    
+    if df_result is None:
+        return marshal({
+            'calendar_week': calendar_week,
+            'status': 'failed',
+            'total_food': 0.0,
+            'total_nonfood': 0.0,
+            'total_receipts': 0,
+            'receipts': [],
+            'unfinished_files': report['unfinished_files'],
+            'rejected_files': report['rejected_files'],
+            'run_id': report['run_id'],
+            'analysis_date': datetime.utcnow().isoformat()
+        }, api_analysis_result)
+    
+    # Get summary
+    summary = analyzer.get_week_summary(df_result)
+    
+    # Convert DataFrame to list of dictionaries for API response
+    receipts_data = convert_dataframe_to_receipts(df_result)
+    
+    return marshal({
+        'calendar_week': calendar_week,
+        'status': report['status'],
+        'total_food': summary['total_food'],
+        'total_nonfood': summary['total_nonfood'],
+        'total_receipts': summary['total_receipts'],
+        'flagged_duplicates': summary['flagged_duplicates'],
+        'receipts': receipts_data,
+        'unfinished_files': report['unfinished_files'],
+        'rejected_files': report['rejected_files'],
+        'run_id': report['run_id'],
+        'analysis_date': datetime.utcnow().isoformat()
+    }, api_analysis_result)
+
+def read_receipt_upload():
+    """
+    Validate the form of a single receipt upload and read the photo (in a request context)
+
+    Returns:
+        Dictionary with 'image_bytes', 'file_name', 'calendar_week' and 'use_cache'
+    """
+    args = receipt_upload.parse_args()
+    photo = args['photo']
+    calendar_week = args['calendar_week'] or None
+    
+    file_name = secure_filename(photo.filename or '')
+    if os.path.splitext(file_name)[1].lower() not in config.SUPPORTED_IMAGE_EXTENSIONS:
+        api.abort(400, f'photo must be one of {", ".join(config.SUPPORTED_IMAGE_EXTENSIONS)}')
+    
+    if calendar_week is not None and not is_calendar_week(calendar_week):
+        api.abort(400, 'calendar_week must be in format YYYYCW_XX, e.g. 2025CW_30')
+    
+    return {
+        # One byte more than allowed is enough to tell it is too large
+        'image_bytes': photo.read(config.MAX_FILE_SIZE + 1),
+        'file_name': file_name,
+        'calendar_week': calendar_week,
+        'use_cache': not args['force_reanalysis']
+    }
+
+def abort_receipt_error(error):
+    """Abort a receipt upload with the status matching the error of its analysis"""
+    if isinstance(error, IntakeError):
+        api.abort(413 if error.reason == 'oversized' else 400, f'photo rejected ({error.reason}): {str(error)}')
+    if isinstance(error, FileExistsError):
+        api.abort(409, str(error))
+    if isinstance(error, (OSError, ValueError)):
+        api.abort(400, f'photo could not be read as an image: {str(error)}')
+    api.abort(500, f'Analysis failed: {str(error)}')
+
+def receipt_upload_response(result, calendar_week):
+    """Build the response of a receipt upload, returns the response and its status code"""
+    record = result['record']
+    response = {
+        'status': result['outcome'],
+        'receipt': convert_record_to_receipt(record) if record else None,
+        'calendar_week': calendar_week,
+        'image_hash': result['image_hash'],
+        'cached': result['cached'],
+        'error': result['error']
+    }
+    return response, 422 if result['outcome'] == 'quarantined' else 200
+
 @api.route('/')
 class AnalysisTrigger(Resource):
     @api.doc('trigger_analysis')
     @api.expect(api_analysis_request)
-    @api.marshal_with(api_analysis_result, code=202)
+    @api.response(202, 'Analysis finished', api_analysis_result)
+    @api.response(200, 'Dry run plan', api_analysis_plan)
     def post(self):
-        """Trigger AI analysis for a calendar week"""
-        data = request.json
-        calendar_week = data.get('calendar_week')
+        """Trigger AI analysis for a calendar week, or only plan it with dry_run"""
+        options = parse_analysis_request()
+        calendar_week = options['calendar_week']
         
-        if not calendar_week:
-            api.abort(400, 'calendar_week is required')
+        try:
+            if options['dry_run']:
+                return plan_response(calendar_week, options['use_cache']), 200
+            
+            # Perform analysis, photos not done by the deadline are listed for a later run
+            report = analyzer.run_week_analysis(calendar_week, priority=options['priority'],
+                                                use_cache=options['use_cache'],
+                                                deadline_seconds=options['deadline_seconds'])
+            return week_analysis_response(calendar_week, report), 202
+            
+        except Exception as e:
+            api.abort(500, f'Analysis failed: {str(e)}')
+
+@api.route('/receipt')
+class ReceiptAnalysis(Resource):
+    @api.doc('analyze_receipt')
+    @api.expect(receipt_upload)
+    @api.response(422, 'AI response could not be parsed', api_receipt_upload_result)
+    @api.marshal_with(api_receipt_upload_result)
+    def post(self):
+        """Analyze one uploaded receipt photo and return its result immediately"""
+        upload = read_receipt_upload()
         
-        # Validate calendar week format
-        if not calendar_week.startswith('2025CW_'):
-            api.abort(400, 'calendar_week must be in format 2025CW_XX')
+        try:
+            result = analyzer.analyze_image(upload['image_bytes'], upload['file_name'], upload['calendar_week'],
+                                            priority='interactive', use_cache=upload['use_cache'])
+        except Exception as e:
+            abort_receipt_error(e)
+        
+        return receipt_upload_response(result, upload['calendar_week'])
+
+@api.route('/<string:calendar_week>')
+@api.param('calendar_week', 'Calendar week identifier (e.g., 2025CW_30)')  
+class AnalysisResult(Resource):
+    @api.doc('get_analysis_result')
+    @api.expect(result_query)
+    @api.response(200, 'Success', api_analysis_result)
+    def get(self, calendar_week):
+        """Get analysis results for a calendar week, optionally filtered and paginated"""
+        args = result_query.parse_args()
         
         try:
-            # Check if photos directory exists
-            photos_dir = config.PHOTOS_DIR / calendar_week
-            if not photos_dir.exists():
-                api.abort(404, f'No photos found for calendar week {calendar_week}')
-            
-            # Count available photos
-            photo_files = [f for f in photos_dir.iterdir() 
-                          if f.is_file() and f.suffix.lower() in config.SUPPORTED_IMAGE_EXTENSIONS]
+            date_from = parse_date_key(args['date_from']) if args['date_from'] else None
+            date_to = parse_date_key(args['date_to']) if args['date_to'] else None
+        except ValueError as e:
+            api.abort(400, str(e))
+        
+        receipt_fields = [field.strip() for field in (args['fields'] or '').split(',') if field.strip()]
+        unknown_fields = set(receipt_fields) - set(RECEIPT_FIELDS)
+        if unknown_fields:
+            api.abort(400, f'Unknown receipt fields: {", ".join(sorted(unknown_fields))}')
+        
+        # Read the columnar index of the results, rebuilt only when the result file changed
+        try:
+            index = analyzer.receipt_index.get(calendar_week)
+        except Exception as e:
+            api.abort(500, f'Failed to retrieve analysis results: {str(e)}')
+        
+        if index is None:
+            api.abort(404, f'No analysis results found for {calendar_week}. Run analysis first.')
+        
+        after = None
+        if args['cursor']:
+            try:
+                version, after = decode_cursor(args['cursor'])
+            except ValueError as e:
+                api.abort(400, str(e))
+            if version != index.version:
+                api.abort(409, 'Results changed since the cursor was issued, restart from the first page')
+        
+        positions = index.query(date_from=date_from, date_to=date_to, category=args['category'],
+                                min_amount=args['min_amount'], max_amount=args['max_amount'])
+        receipts_data, next_cursor = index.page(positions, limit=args['limit'], offset=args['offset'], after=after)
+        
+        result = {
+            'calendar_week': calendar_week,
+            'status': 'completed',
+            'total_food': index.total_food,
+            'total_nonfood': index.total_nonfood,
+            'total_receipts': len(index),
+            'flagged_duplicates': index.flagged_duplicates,
+            'receipts': receipts_data,
+            'analysis_date': datetime.fromtimestamp(index.mtime).isoformat(),
+            'total_matches': len(positions),
+            'next_cursor': next_cursor
+        }
+        
+        # Field projection, e.g. fields=datum,summe_food
+        mask = None
+        if receipt_fields:
+            mask = ','.join(key for key in api_analysis_result if key != 'receipts')
+            mask += f',receipts{{{",".join(receipt_fields)}}}'
+        return marshal(result, api_analysis_result, mask=mask)
+
+@api.route('/<string:calendar_week>/summary')
+@api.param('calendar_week', 'Calendar week identifier (e.g., 2025CW_30)')
+class AnalysisSummary(Resource):
+    @api.doc('get_analysis_summary')
+    @api.marshal_with(api_analysis_summary)
+    def get(self, calendar_week):
+        """Get analysis summary for a calendar week"""
+        try:
+            # Totals come precomputed with the receipt index of the current result file
+            index = analyzer.receipt_index.get(calendar_week)
+        except Exception as e:
+            api.abort(500, f'Failed to get analysis summary: {str(e)}')
+        
+        if index is None:
+            api.abort(404, f'No analysis results found for {calendar_week}. Run analysis first.')
+        
+        return {
+            'calendar_week': calendar_week,
+            'total_food': index.total_food,
+            'total_nonfood': index.total_nonfood,
+            'total_receipts': len(index),
+            'flagged_duplicates': index.flagged_duplicates,
+            'grand_total': round(index.total_food + index.total_nonfood, 2),
+            'analysis_date': datetime.fromtimestamp(index.mtime).isoformat()
+        }
+
+@api.route('/<string:calendar_week>/usage')
+@api.param('calendar_week', 'Calendar week identifier (e.g., 2025CW_30)')
+class AnalysisUsage(Resource):
+    @api.doc('get_analysis_usage')
+    @api.marshal_with(api_usage_summary)
+    def get(self, calendar_week):
+        """Get image bytes, tokens, latency and retries of the AI calls of a calendar week"""
+        try:
+            usage = analyzer.get_week_usage(calendar_week)
+        except Exception as e:
+            api.abort(500, f'Failed to get AI usage: {str(e)}')
+        
+        if usage is None:
+            api.abort(404, f'No analysis results found for {calendar_week}. Run analysis first.')
+        
+        return usage
+
+@api.route('/<string:calendar_week>/quarantine')
+@api.param('calendar_week', 'Calendar week identifier (e.g., 2025CW_30)')
+class AnalysisQuarantine(Resource):
+    @api.doc('get_quarantined_receipts')
+    @api.marshal_with(api_quarantine_list)
+    def get(self, calendar_week):
+        """Get receipts whose AI response could not be parsed"""
+        try:
+            entries = list(analyzer.quarantine.load(calendar_week).values())
             
-            if not photo_files:
-                api.abort(404, f'No supported image files found in {calendar_week}')
+            return {
+                'calendar_week': calendar_week,
+                'entries': entries,
+                'total': len(entries)
+            }
             
-            # Perform analysis
-            df_result = analyzer.analyze_calendar_week(calendar_week)
+        except Exception as e:
+            api.abort(500, f'Failed to get quarantined receipts: {str(e)}')
+    
+    @api.doc('reanalyze_quarantined_receipts')
+    @api.marshal_with(api_analysis_result, code=202)
+    def post(self, calendar_week):
+        """Re-run the AI analysis only for the quarantined receipts of a calendar week"""
+        if not analyzer.quarantine.load(calendar_week):
+            api.abort(404, f'No quarantined receipts for {calendar_week}')
+        
+        try:
+            df_result = analyzer.reanalyze_quarantined(calendar_week)
             
             if df_result is None:
                 return {
@@ -94,100 +479,154 @@ class AnalysisTrigger(Resource):
                     'analysis_date': datetime.utcnow().isoformat()
                 }, 202
             
-            # Get summary
             summary = analyzer.get_week_summary(df_result)
             
-            # Convert DataFrame to list of dictionaries for API response
-            receipts_data = convert_dataframe_to_receipts(df_result)
-            
             return {
                 'calendar_week': calendar_week,
                 'status': 'completed',
                 'total_food': summary['total_food'],
                 'total_nonfood': summary['total_nonfood'],
                 'total_receipts': summary['total_receipts'],
-                'receipts': receipts_data,
+                'flagged_duplicates': summary['flagged_duplicates'],
+                'receipts': convert_dataframe_to_receipts(df_result),
                 'analysis_date': datetime.utcnow().isoformat()
             }, 202
             
         except Exception as e:
-            api.abort(500, f'Analysis failed: {str(e)}')
+            api.abort(500, f'Re-analysis failed: {str(e)}')
 
-@api.route('/<string:calendar_week>')
-@api.param('calendar_week', 'Calendar week identifier (e.g., 2025CW_30)')  
-class AnalysisResult(Resource):
-    @api.doc('get_analysis_result')
-    @api.marshal_with(api_analysis_result)
-    def get(self, calendar_week):
-        """Get analysis results for a calendar week"""
+@api.route('/runs')
+class AnalysisRuns(Resource):
+    @api.doc('list_analysis_runs')
+    @api.expect(run_query)
+    @api.marshal_with(api_run_list)
+    def get(self):
+        """List journaled week analysis runs with their state"""
+        args = run_query.parse_args()
+        if args['calendar_week'] and not is_calendar_week(args['calendar_week']):
+            api.abort(400, 'calendar_week must be in format YYYYCW_XX, e.g. 2025CW_30')
+        
+        runs = analyzer.journal.list_runs(args['calendar_week'])
+        return {
+            'runs': runs,
+            'total': len(runs)
+        }
+
+@api.route('/runs/<string:run_id>')
+@api.param('run_id', 'Run identifier (e.g., 2025CW_31-20250801T101500-1a2b3c)')
+class AnalysisRun(Resource):
+    @api.doc('get_analysis_run')
+    @api.marshal_with(api_run_state)
+    def get(self, run_id):
+        """Get the state of a journaled week analysis run"""
+        run = analyzer.journal.get_run(run_id)
+        if run is None:
+            api.abort(404, f'Run {run_id} not found')
+        return run
+
+@api.route('/runs/<string:run_id>/resume')
+@api.param('run_id', 'Run identifier (e.g., 2025CW_31-20250801T101500-1a2b3c)')
+class AnalysisRunResume(Resource):
+    @api.doc('resume_analysis_run')
+    @api.expect(api_run_resume)
+    @api.marshal_with(api_analysis_result, code=202)
+    def post(self, run_id):
+        """Continue an interrupted or partial run, replaying its journaled AI responses"""
+        data = request.get_json(silent=True) or {}
+        
+        run = analyzer.journal.get_run(run_id)
+        if run is None:
+            api.abort(404, f'Run {run_id} not found')
+        if run['status'] in ('running', 'completed'):
+            api.abort(409, f'Run {run_id} is {run["status"]}')
+        
+        priority = data.get('priority') or 'backfill'
+        if priority not in ('api', 'backfill'):
+            api.abort(400, 'priority must be api or backfill')
+        
+        deadline_seconds = parse_deadline_seconds(data)
+        
         try:
-            # Check if CSV file exists
-            csv_file = config.COST_FILES_DIR / f"{calendar_week}_costs.csv"
+            report = analyzer.resume_run(run_id, priority=priority, deadline_seconds=deadline_seconds)
+            df_result = report['results']
             
-            if not csv_file.exists():
-                api.abort(404, f'No analysis results found for {calendar_week}. Run analysis first.')
-            
-            # Read existing results
-            df_result = pd.read_csv(csv_file, sep=";")
-            df_result = analyzer._process_results(df_result)
+            if df_result is None:
+                return {
+                    'calendar_week': run['calendar_week'],
+                    'status': 'failed',
+                    'total_food': 0.0,
+                    'total_nonfood': 0.0,
+                    'total_receipts': 0,
+                    'receipts': [],
+                    'unfinished_files': report['unfinished_files'],
+                    'rejected_files': report['rejected_files'],
+                    'run_id': run_id,
+                    'analysis_date': datetime.utcnow().isoformat()
+                }, 202
             
-            # Get summary
             summary = analyzer.get_week_summary(df_result)
             
-            # Convert to API format
-            receipts_data = convert_dataframe_to_receipts(df_result)
-            
-            # Get file modification time as analysis date
-            analysis_date = datetime.fromtimestamp(csv_file.stat().st_mtime).isoformat()
-            
             return {
-                'calendar_week': calendar_week,
-                'status': 'completed',
+                'calendar_week': run['calendar_week'],
+                'status': report['status'],
                 'total_food': summary['total_food'],
                 'total_nonfood': summary['total_nonfood'],
                 'total_receipts': summary['total_receipts'],
-                'receipts': receipts_data,
-                'analysis_date': analysis_date
-            }
+                'flagged_duplicates': summary['flagged_duplicates'],
+                'receipts': convert_dataframe_to_receipts(df_result),
+                'unfinished_files': report['unfinished_files'],
+                'rejected_files': report['rejected_files'],
+                'run_id': run_id,
+                'analysis_date': datetime.utcnow().isoformat()
+            }, 202
             
         except Exception as e:
-            api.abort(500, f'Failed to retrieve analysis results: {str(e)}')
+            api.abort(500, f'Resuming the run failed: {str(e)}')
 
-@api.route('/<string:calendar_week>/summary')
-@api.param('calendar_week', 'Calendar week identifier (e.g., 2025CW_30)')
-class AnalysisSummary(Resource):
-    @api.doc('get_analysis_summary')
-    @api.marshal_with(api_analysis_summary)
-    def get(self, calendar_week):
-        """Get analysis summary for a calendar week"""
+@api.route('/history')
+class AnalysisHistory(Resource):
+    @api.doc('get_history_summary')
+    @api.expect(history_query)
+    @api.marshal_with(api_history_summary)
+    def get(self):
+        """Get the costs per year from the typed result history"""
+        if history is None:
+            api.abort(501, 'Result history requires pyarrow')
+        
+        args = history_query.parse_args()
         try:
-            # Check if CSV file exists
-            csv_file = config.COST_FILES_DIR / f"{calendar_week}_costs.csv"
-            
-            if not csv_file.exists():
-                api.abort(404, f'No analysis results found for {calendar_week}. Run analysis first.')
-            
-            # Read existing results
-            df_result = pd.read_csv(csv_file, sep=";")
-            df_result = analyzer._process_results(df_result)
-            
-            # Get summary
-            summary = analyzer.get_week_summary(df_result)
-            
-            # Get file modification time as analysis date
-            analysis_date = datetime.fromtimestamp(csv_file.stat().st_mtime).isoformat()
+            years = history.yearly_summary(years=args['year'])
             
             return {
-                'calendar_week': calendar_week,
-                'total_food': summary['total_food'],
-                'total_nonfood': summary['total_nonfood'],
-                'total_receipts': summary['total_receipts'],
-                'grand_total': summary['total_food'] + summary['total_nonfood'],
-                'analysis_date': analysis_date
+                'years': years,
+                'total': len(years)
             }
             
         except Exception as e:
-            api.abort(500, f'Failed to get analysis summary: {str(e)}')
+            api.abort(500, f'Failed to get result history: {str(e)}')
+
+@api.route('/history/export')
+class AnalysisHistoryExport(Resource):
+    @api.doc('export_history')
+    @api.expect(history_export_query)
+    @api.produces(['application/vnd.apache.parquet', 'application/vnd.apache.arrow.file'])
+    def get(self):
+        """Download all results as one typed Parquet or Arrow file"""
+        if history is None:
+            api.abort(501, 'Result history requires pyarrow')
+        
+        args = history_export_query.parse_args()
+        try:
+            data = history.export_bytes(args['format'], years=args['year'])
+        except Exception as e:
+            api.abort(500, f'Failed to export result history: {str(e)}')
+        
+        extension, mimetype = {
+            'parquet': ('parquet', 'application/vnd.apache.parquet'),
+            'arrow': ('arrow', 'application/vnd.apache.arrow.file')
+        }[args['format']]
+        return send_file(io.BytesIO(data), mimetype=mimetype, as_attachment=True,
+                         download_name=f'receipt_history.{extension}')
 
 @api.route('/weeks')
 class AnalysisWeeks(Resource):
@@ -196,35 +635,12 @@ class AnalysisWeeks(Resource):
     def get(self):
         """Get list of available calendar weeks for analysis"""
         try:
-            available_weeks = analyzer.get_available_weeks()
-            
             weeks_data = []
-            for week in available_weeks:
-                # Check if analysis exists
-                csv_file = config.COST_FILES_DIR / f"{week}_costs.csv"
-                analysis_status = 'analyzed' if csv_file.exists() else 'not_analyzed'
-                last_analysis = None
-                
-                if csv_file.exists():
-                    last_analysis = datetime.fromtimestamp(csv_file.stat().st_mtime).isoformat()
-                
-                # Count files
-                photos_dir = config.PHOTOS_DIR / week
-                file_count = len([f for f in photos_dir.iterdir() 
-                                if f.is_file() and f.suffix.lower() in config.SUPPORTED_IMAGE_EXTENSIONS])
-                
-                # Parse week info
-                year = int(week.split('CW_')[0])
-                week_number = int(week.split('CW_')[1])
-                
-                weeks_data.append({
-                    'week': week,
-                    'year': year,
-                    'week_number': week_number,
-                    'file_count': file_count,
-                    'analysis_status': analysis_status,
-                    'last_analysis': last_analysis
-                })
+            for week in analyzer.manifest.get_weeks():
+                week_info = analyzer.manifest.get_week_info(week)
+                if week_info['last_analysis'] is not None:
+                    week_info['last_analysis'] = datetime.fromtimestamp(week_info['last_analysis']).isoformat()
+                weeks_data.append(week_info)
             
             # Sort by year and week number
             weeks_data.sort(key=lambda x: (x['year'], x['week_number']))
@@ -2,14 +2,20 @@
 System information and health check API endpoints
 """
 
-from flask import Flask
+from flask import current_app, send_file, Response
 from flask_restx import Namespace, Resource, fields
 from datetime import datetime
+from importlib.metadata import version
 import sys
 import os
 
-from ..models.responses import health_response_model, system_info_model
+from ..models.responses import (health_response_model, system_info_model, profile_model, profile_list_model,
+                                span_model, trace_model, trace_list_model)
+from ..profiling import is_profiling_admin, request_profiling_token
 from ...core.config import DevelopmentConfig
+from ...services.scheduler import default_scheduler
+from ...services.profiles import ProfileStore
+from ...services.tracing import default_tracer
 
 # Create API namespace
 api = Namespace('system', description='System information, health checks and tests')
@@ -17,6 +23,26 @@ api = Namespace('system', description='System information, health checks and tes
 # Register centralized models with the namespace
 api_health_response = api.model('HealthResponse', health_response_model)
 api_system_info = api.model('SystemInfo', system_info_model)
+api_profile = api.model('Profile', profile_model)
+profile_list_fixed = profile_list_model.copy()
+profile_list_fixed['profiles'] = fields.List(fields.Nested(api_profile), description='Stored profiles, newest first')
+api_profile_list = api.model('ProfileList', profile_list_fixed)
+api_span = api.model('Span', span_model)
+trace_fixed = trace_model.copy()
+trace_fixed['spans'] = fields.List(fields.Nested(api_span), description='Spans of the trace in order of their start')
+api_trace = api.model('Trace', trace_fixed)
+api_trace_list = api.model('TraceList', trace_list_model)
+
+# Query parameters of the profile download
+profile_query = api.parser()
+profile_query.add_argument('format', type=str, choices=('pstats', 'text'), default='pstats', location='args',
+                           help='pstats file or text summary of the slowest functions')
+
+# Query parameters of the trace search
+trace_query = api.parser()
+trace_query.add_argument('run_id', type=str, location='args', help='Traces of this analysis run')
+trace_query.add_argument('calendar_week', type=str, location='args', help='Traces analyzing this calendar week')
+
 api_test_response = api.model('TestResponse', {
     'message': fields.String(required=True, description='Test message'),
     'status': fields.String(description='Status')
@@ -24,6 +50,15 @@ api_test_response = api.model('TestResponse', {
 
 # Initialize config
 config = DevelopmentConfig()
+profiles = ProfileStore(config)
+tracer = default_tracer(config)
+
+def require_profiling_admin():
+    """Abort unless profiling is enabled and the request carries the profiling admin token"""
+    if not current_app.config.get('PROFILING_ENABLED'):
+        api.abort(404, 'Profiling is disabled')
+    if not is_profiling_admin(current_app, request_profiling_token()):
+        api.abort(403, 'Profiling admin token required (X-Profile-Token header)')
 
 @api.route('/health')
 class HealthCheck(Resource):
@@ -63,20 +98,21 @@ class SystemInfo(Resource):
         """Get system information"""
         
         try:
-            from ...services.receipt_analyzer import ReceiptAnalyzer
-            analyzer = ReceiptAnalyzer(config)
-            available_weeks = analyzer.get_available_weeks()
+            from ...services.receipt_analyzer import get_analyzer
+            available_weeks = get_analyzer(config).get_available_weeks()
         except:
             available_weeks = []
         
         return {
             'api_version': '1.0.0',
             'python_version': f"{sys.version_info.major}.{sys.version_info.minor}.{sys.version_info.micro}",
-            'flask_version': Flask.__version__,
+            'flask_version': version('flask'),
             'supported_image_formats': config.SUPPORTED_IMAGE_EXTENSIONS,
             'max_file_size': config.MAX_FILE_SIZE,
             'ai_model': config.GEMINI_MODEL,
-            'available_weeks': available_weeks
+            'prompt_version': config.PROMPT_VERSION,
+            'available_weeks': available_weeks,
+            'ai_scheduler': default_scheduler(config).snapshot()
         }
 
 @api.route('/config')
@@ -87,6 +123,7 @@ class SystemConfig(Resource):
         
         return {
             'ai_model': config.GEMINI_MODEL,
+            'prompt_version': config.PROMPT_VERSION,
             'supported_formats': config.SUPPORTED_IMAGE_EXTENSIONS,
             'max_file_size_mb': config.MAX_FILE_SIZE // (1024 * 1024),
             'photos_directory': str(config.PHOTOS_DIR.name),
@@ -103,4 +140,84 @@ class SimpleTest(Resource):
         return {
             'message': 'Hello World from REST API!',
             'status': 'success'
-        }
\ No newline at end of file
+        }
+
+@api.route('/profiles')
+class ProfileList(Resource):
+    @api.doc('list_profiles')
+    @api.marshal_with(api_profile_list)
+    def get(self):
+        """List stored request profiles (profiling admins only)"""
+        require_profiling_admin()
+        stored = profiles.list_profiles()
+        return {
+            'profiles': stored,
+            'total': len(stored)
+        }
+
+@api.route('/profiles/<string:name>')
+@api.param('name', 'Profile file name')
+class ProfileDownload(Resource):
+    @api.doc('download_profile')
+    @api.expect(profile_query)
+    @api.produces(['application/octet-stream', 'text/plain'])
+    def get(self, name):
+        """Download a request profile as pstats file or text summary (profiling admins only)"""
+        require_profiling_admin()
+        args = profile_query.parse_args()
+        
+        profile_file = profiles.profile_file(name)
+        if profile_file is None:
+            api.abort(404, f'Profile {name} not found')
+        
+        if args['format'] == 'text':
+            return Response(profiles.summary(name), mimetype='text/plain')
+        return send_file(profile_file, mimetype='application/octet-stream', as_attachment=True, download_name=name)
+
+def require_tracing():
+    """Abort unless tracing is enabled"""
+    if not tracer.enabled:
+        api.abort(404, 'Tracing is disabled (TRACING_ENABLED)')
+
+@api.route('/traces')
+class TraceList(Resource):
+    @api.doc('find_traces')
+    @api.expect(trace_query)
+    @api.marshal_with(api_trace_list)
+    def get(self):
+        """Find traces of an analysis run or calendar week"""
+        require_tracing()
+        args = trace_query.parse_args()
+        
+        attributes = {}
+        if args['run_id']:
+            attributes['run_id'] = args['run_id']
+        if args['calendar_week']:
+            attributes['week'] = args['calendar_week']
+        if not attributes:
+            api.abort(400, 'run_id or calendar_week is required')
+        
+        trace_ids = tracer.find_traces(**attributes)
+        return {
+            'trace_ids': trace_ids,
+            'total': len(trace_ids)
+        }
+
+@api.route('/traces/<string:trace_id>')
+@api.param('trace_id', 'Trace id (X-Trace-Id response header)')
+class TraceDetail(Resource):
+    @api.doc('get_trace')
+    @api.marshal_with(api_trace)
+    def get(self, trace_id):
+        """Get all spans of a trace"""
+        require_tracing()
+        spans = tracer.read_trace(trace_id)
+        if not spans:
+            api.abort(404, f'Trace {trace_id} not found')
+        
+        roots = [span['duration_ms'] for span in spans if span['parent_id'] is None]
+        return {
+            'trace_id': trace_id,
+            'spans': spans,
+            'duration_ms': max(roots) if roots else None
+        }
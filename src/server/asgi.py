@@ -0,0 +1,11 @@
+"""
+ASGI entry point, analysis endpoints on an event loop and all other routes on Flask, e.g.:
+
+    uvicorn --workers 1 src.server.asgi:app
+"""
+
+import os
+
+from .api.asgi import create_asgi_app
+
+app = create_asgi_app(os.getenv('FLASK_CONFIG', 'production'))
@@ -1,7 +1,10 @@
 import os
+import multiprocessing
 from pathlib import Path
 from dotenv import load_dotenv
 
+from .prompts import RECEIPT_PROMPTS, DEFAULT_PROMPT_VERSION
+
 # Load environment variables
 load_dotenv()
 
@@ -12,26 +15,93 @@ class Config:
     SECRET_KEY = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
     
+    # Server Configuration (production mode, see src/server/production.py)
+    HOST = os.getenv('HOST', '0.0.0.0')
+    PORT = int(os.getenv('PORT', '8081'))
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+    SERVER_THREADS = int(os.getenv('SERVER_THREADS', '4'))
+    SERVER_TIMEOUT = int(os.getenv('SERVER_TIMEOUT', '300'))  # seconds, a week analysis calls the AI per photo
+    SERVER_GRACEFUL_TIMEOUT = int(os.getenv('SERVER_GRACEFUL_TIMEOUT', '30'))
+    SERVER_KEEPALIVE = int(os.getenv('SERVER_KEEPALIVE', '5'))
+    SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '1000'))
+    SERVER_MAX_REQUESTS_JITTER = int(os.getenv('SERVER_MAX_REQUESTS_JITTER', '100'))
+    
+    # Async (ASGI) server, analysis endpoints on an event loop (python run_app.py --asgi)
+    ASGI_WORKERS = int(os.getenv('ASGI_WORKERS', '1'))  # processes, each with one event loop
+    ASGI_WSGI_THREADS = int(os.getenv('ASGI_WSGI_THREADS', '8'))  # threads for all other (Flask) requests
+    ASYNC_MAX_IN_FLIGHT = int(os.getenv('ASYNC_MAX_IN_FLIGHT', '500'))  # receipts in progress per event loop
+    
     # AI Configuration
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-    GEMINI_MODEL = "gemini-2.5-flash"
+    GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')  # recorded in every result row (Analyse_Modell)
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '4'))  # parallel AI calls of all processes together
+    AI_MAX_RETRIES = int(os.getenv('AI_MAX_RETRIES', '2'))  # retries of rate-limited or unavailable AI calls
+    AI_RETRY_BACKOFF_SECONDS = float(os.getenv('AI_RETRY_BACKOFF_SECONDS', '2.0'))  # doubled per retry
+    AI_MAX_CALLS_PER_MINUTE = float(os.getenv('AI_MAX_CALLS_PER_MINUTE', '0'))  # rate budget, 0 = unlimited
+    AI_PRIORITY_WEIGHTS = os.getenv('AI_PRIORITY_WEIGHTS', 'interactive=8,api=4,backfill=1')  # share of AI calls
+    AI_PRIORITY_AGING_SECONDS = float(os.getenv('AI_PRIORITY_AGING_SECONDS', '60'))  # then served regardless of class
+    AI_SCHEDULER_POLL_SECONDS = float(os.getenv('AI_SCHEDULER_POLL_SECONDS', '0.1'))  # look for slots freed by other processes
+    AI_CALL_TIMEOUT_SECONDS = float(os.getenv('AI_CALL_TIMEOUT_SECONDS', '120'))  # a hung call fails and is retried
+    ANALYSIS_DEADLINE_SECONDS = float(os.getenv('ANALYSIS_DEADLINE_SECONDS', '240'))  # web and API, below SERVER_TIMEOUT; 0 = none
+    AI_ESTIMATED_CALL_SECONDS = float(os.getenv('AI_ESTIMATED_CALL_SECONDS', '8'))  # dry-run estimate without history
     
     # Application Paths
     BASE_DIR = Path(__file__).parent.parent.parent.parent
-    API_DIR = Path(__file__).parent.parent / 'api'
+    API_DIR = Path(os.getenv('DATA_DIR') or Path(__file__).parent.parent / 'api')  # root of all data directories
     PHOTOS_DIR = API_DIR / 'photos'
     COST_FILES_DIR = API_DIR / 'cost_files'
+    QUARANTINE_DIR = API_DIR / 'quarantine'
+    SCHEDULER_DIR = API_DIR / 'scheduler'  # AI call slots and budget shared by all processes
+    
+    # AI Prompt Configuration (versions registered in core/prompts.py, recorded in every result row)
+    PROMPT_VERSION = os.getenv('PROMPT_VERSION', DEFAULT_PROMPT_VERSION)
+    PROMPT_TEXT = RECEIPT_PROMPTS.get(PROMPT_VERSION)  # None for an unknown version, rejected by init_app
+    
+    # Near-duplicate detection (64 bit perceptual hash of the downscaled photo)
+    PHASH_INDEX_FILE = COST_FILES_DIR / 'phash_index.jsonl'
+    DUPLICATE_MAX_DISTANCE = int(os.getenv('DUPLICATE_MAX_DISTANCE', '6'))  # max differing bits
+    SKIP_NEAR_DUPLICATES = os.getenv('SKIP_NEAR_DUPLICATES', 'False').lower() == 'true'
+    
+    # Thumbnails for the web interface (content-addressed, size-bounded cache)
+    THUMBNAIL_DIR = API_DIR / 'thumbnails'
+    THUMBNAIL_SIZE = int(os.getenv('THUMBNAIL_SIZE', '320'))  # longest edge in pixels
+    THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_MB', '64')) * 1024 * 1024
+    THUMBNAILS_ON_INGEST = os.getenv('THUMBNAILS_ON_INGEST', 'True').lower() == 'true'
+    
+    # Parsed AI extractions keyed by image content, prompt and model
+    EXTRACTION_CACHE_DIR = API_DIR / 'extraction_cache'
+    EXTRACTION_CACHE = os.getenv('EXTRACTION_CACHE', 'True').lower() == 'true'
+    
+    # Rendered web UI pages, served until the week listing or a result file changes
+    PAGE_CACHE = os.getenv('PAGE_CACHE', 'True').lower() == 'true'
+    
+    # Write-ahead journals of week analysis runs, to resume interrupted runs
+    JOURNAL_DIR = API_DIR / 'journal'
+    JOURNAL_KEEP_RUNS = int(os.getenv('JOURNAL_KEEP_RUNS', '20'))  # completed runs kept for inspection
+    JOURNAL_KEEP_DAYS = int(os.getenv('JOURNAL_KEEP_DAYS', '30'))  # older journals of any status are removed
+    
+    # Typed, year-partitioned Arrow dataset of all results (requires pyarrow)
+    HISTORY_DIR = API_DIR / 'history'
+    
+    # Opt-in profiling of single requests carrying PROFILING_TOKEN (X-Profile-Token header or ?_profile=)
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')  # profiling stays off without a token
+    PROFILE_DIR = API_DIR / 'profiles'
+    PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))  # oldest profiles are removed
+    
+    # Tracing spans of requests and analysis runs, exported to TRACE_DIR/spans-<date>.jsonl
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'False').lower() == 'true'
+    TRACE_DIR = API_DIR / 'traces'
+    TRACE_KEEP_DAYS = int(os.getenv('TRACE_KEEP_DAYS', '7'))  # older span files are removed
     
-    # AI Prompt Configuration
-    PROMPT_TEXT = (
-        "Es ist ein Kassenbon und Eurobetraege mit Komma"
-        "Mache einen CSV Datensatz no header und ohne Erlaeuterung mit Semikolon als Trenner von "
-        "Datum mit Punkt, Uhrzeit mit Doppelpunkt, Summe_Food, Summe_NonFood"
-    )
+    # Let a fronting web server (nginx/Apache) send photo files via X-Sendfile
+    USE_X_SENDFILE = os.getenv('USE_X_SENDFILE', 'False').lower() == 'true'
     
     # File Configuration
     SUPPORTED_IMAGE_EXTENSIONS = ['.jpeg', '.jpg']
     MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB
+    MIN_IMAGE_EDGE = int(os.getenv('MIN_IMAGE_EDGE', '64'))  # pixels, smaller photos are rejected before analysis
+    MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', '50000000'))  # width x height, larger photos are rejected
     
     @classmethod
     def init_app(cls, app):
@@ -39,10 +109,13 @@ class Config:
         # Create necessary directories
         cls.PHOTOS_DIR.mkdir(parents=True, exist_ok=True)
         cls.COST_FILES_DIR.mkdir(parents=True, exist_ok=True)
+        cls.QUARANTINE_DIR.mkdir(parents=True, exist_ok=True)
         
         # Validate required configuration
         if not cls.GEMINI_API_KEY:
             raise ValueError("GEMINI_API_KEY environment variable is required")
+        if cls.PROMPT_TEXT is None:
+            raise ValueError(f"PROMPT_VERSION must be one of {', '.join(RECEIPT_PROMPTS)}")
 
 class DevelopmentConfig(Config):
     """Development configuration"""
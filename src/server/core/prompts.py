@@ -0,0 +1,42 @@
+"""
+Registry of the versioned AI prompts for receipt analysis
+
+Every result row records the version of the prompt and the model that produced
+it (Prompt_Version, Analyse_Modell), so switching PROMPT_VERSION or GEMINI_MODEL
+only needs the rows of other versions re-analyzed (reanalyze_outdated.py).
+Never change the text of a registered version, register a new one instead.
+"""
+
+RECEIPT_PROMPTS = {
+    # The prompt of all results analyzed before prompts were versioned
+    'v1': (
+        "Es ist ein Kassenbon und Eurobetraege mit Komma"
+        "Mache einen CSV Datensatz no header und ohne Erlaeuterung mit Semikolon als Trenner von "
+        "Datum mit Punkt, Uhrzeit mit Doppelpunkt, Summe_Food, Summe_NonFood"
+    ),
+    # Sentence break and umlauts fixed
+    'v2': (
+        "Es ist ein Kassenbon und Eurobeträge mit Komma. "
+        "Mache einen CSV Datensatz no header und ohne Erläuterung mit Semikolon als Trenner von "
+        "Datum mit Punkt, Uhrzeit mit Doppelpunkt, Summe_Food, Summe_NonFood"
+    ),
+}
+
+DEFAULT_PROMPT_VERSION = 'v1'
+
+# Version and model of result rows written before they were recorded
+LEGACY_PROMPT_VERSION = 'v1'
+LEGACY_MODEL = 'gemini-2.5-flash'
+
+
+def get_prompt(version: str) -> str:
+    """
+    Get the text of a registered prompt version
+
+    Raises:
+        ValueError: If the version is not registered
+    """
+    try:
+        return RECEIPT_PROMPTS[version]
+    except KeyError:
+        raise ValueError(f"Unknown prompt version {version!r}, expected one of {', '.join(RECEIPT_PROMPTS)}") from None
@@ -0,0 +1,98 @@
+"""
+Production launch of the application under a multi-worker WSGI server
+
+Gunicorn is used where available (Linux/macOS). It preloads the app in the
+master process so workers share its memory copy-on-write, runs every worker
+with a thread pool and recycles workers after a number of requests. On Windows,
+where Gunicorn does not run, Waitress serves the app with a thread pool.
+
+The async variant runs the ASGI application (src/server/api/asgi.py) under
+Uvicorn: the analysis endpoints on one event loop per worker, all other routes
+on the Flask app in a thread pool.
+"""
+
+import os
+from typing import Dict, Any
+
+from .core.config import config
+
+
+def gunicorn_options(config_name: str = 'production') -> Dict[str, Any]:
+    """Build Gunicorn settings from the configuration class"""
+    app_config = config[config_name]
+
+    return {
+        'bind': f"{app_config.HOST}:{app_config.PORT}",
+        'workers': app_config.SERVER_WORKERS,
+        'threads': app_config.SERVER_THREADS,
+        'worker_class': 'gthread',
+        'preload_app': True,
+        'timeout': app_config.SERVER_TIMEOUT,
+        'graceful_timeout': app_config.SERVER_GRACEFUL_TIMEOUT,
+        'keepalive': app_config.SERVER_KEEPALIVE,
+        'max_requests': app_config.SERVER_MAX_REQUESTS,
+        'max_requests_jitter': app_config.SERVER_MAX_REQUESTS_JITTER,
+        'accesslog': '-',
+    }
+
+
+def run_production_server(config_name: str = 'production'):
+    """Run the application with Gunicorn, or with Waitress where Gunicorn is unavailable"""
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        _run_waitress(config_name)
+        return
+
+    class ReceiptAnalysisApplication(BaseApplication):
+        """Gunicorn application that builds the Flask app via the app factory"""
+
+        def __init__(self, options: Dict[str, Any]):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            from .api import create_app
+            return create_app(config_name)
+
+    ReceiptAnalysisApplication(gunicorn_options(config_name)).run()
+
+
+def _run_waitress(config_name: str):
+    """Serve the application with Waitress (single process, thread pool)"""
+    try:
+        from waitress import serve
+    except ImportError:
+        raise RuntimeError("Production mode requires gunicorn (Linux/macOS) or waitress (Windows): "
+                           "pip install -r requirements.txt")
+
+    from .api import create_app
+
+    app_config = config[config_name]
+    serve(create_app(config_name),
+          host=app_config.HOST,
+          port=app_config.PORT,
+          threads=app_config.SERVER_WORKERS * app_config.SERVER_THREADS,
+          channel_timeout=app_config.SERVER_TIMEOUT)
+
+
+def run_asgi_server(config_name: str = 'production'):
+    """Run the ASGI application with Uvicorn, ASGI_WORKERS processes with one event loop each"""
+    try:
+        import uvicorn
+    except ImportError:
+        raise RuntimeError("The ASGI server requires a2wsgi and uvicorn: pip install -r requirements.txt")
+
+    app_config = config[config_name]
+    # Worker processes import the app themselves and read the configuration from the environment
+    os.environ['FLASK_CONFIG'] = config_name
+    uvicorn.run('src.server.asgi:app',
+                host=app_config.HOST,
+                port=app_config.PORT,
+                workers=app_config.ASGI_WORKERS,
+                timeout_keep_alive=app_config.SERVER_KEEPALIVE,
+                timeout_graceful_shutdown=app_config.SERVER_GRACEFUL_TIMEOUT)
@@ -1,3 +1,28 @@
-from .receipt_analyzer import ReceiptAnalyzer
+from .receipt_analyzer import ReceiptAnalyzer, get_analyzer
+from .ai_backend import GeminiBackend
+from .scheduler import PriorityScheduler, PRIORITY_CLASSES
+from .quarantine import QuarantineStore
+from .response_parser import parse_receipt_response, ResponseParseError
+from .storage import ResultStore, atomic_write, file_lock, hold_lock, is_locked
+from .manifest import WeekManifest, parse_calendar_week, is_calendar_week
+from .hashing import FileHashCache, sha256_file
+from .thumbnails import ThumbnailCache
+from .extraction_cache import ExtractionCache
+from .receipt_index import ReceiptIndex, ReceiptIndexCache
+from .page_cache import PageCache
+from .history import ResultHistory
+from .single_flight import SingleFlight, AsyncSingleFlight
+from .run_journal import RunJournal, JournalRun
+from .profiles import ProfileStore
+from .tracing import Tracer, default_tracer
+from .intake import inspect_image, inspect_image_bytes, IntakeError
+from .image_hash import PerceptualHashIndex, BKTree, compute_dhash, hamming_distance
 
-__all__ = ['ReceiptAnalyzer']
\ No newline at end of file
+__all__ = ['ReceiptAnalyzer', 'get_analyzer', 'GeminiBackend', 'PriorityScheduler', 'PRIORITY_CLASSES', 'QuarantineStore', 'parse_receipt_response', 'ResponseParseError',
+           'ResultStore', 'atomic_write', 'file_lock', 'hold_lock', 'is_locked',
+           'PerceptualHashIndex', 'BKTree', 'compute_dhash', 'hamming_distance',
+           'WeekManifest', 'parse_calendar_week', 'is_calendar_week',
+           'FileHashCache', 'sha256_file', 'ThumbnailCache', 'ExtractionCache',
+           'ReceiptIndex', 'ReceiptIndexCache', 'PageCache', 'ResultHistory', 'SingleFlight', 'AsyncSingleFlight',
+           'RunJournal', 'JournalRun', 'ProfileStore', 'Tracer', 'default_tracer',
+           'inspect_image', 'inspect_image_bytes', 'IntakeError']
\ No newline at end of file
@@ -0,0 +1,226 @@
+import asyncio
+import threading
+import time
+from typing import Optional, Dict, Any, Tuple
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from ..core.config import Config
+from ..core.prompts import get_prompt
+from .scheduler import PriorityScheduler, default_scheduler
+
+# Result columns with the accounting of the AI call that produced a row
+USAGE_COLUMNS = ["Bild_Bytes", "Prompt_Tokens", "Antwort_Tokens", "Latenz_ms", "Wartezeit_ms",
+                 "Wiederholungen", "Modell"]
+
+# Errors worth another attempt: rate limits, overload and timeouts on the AI side
+TRANSIENT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.InternalServerError,
+)
+
+# The API connection of this process; genai.configure drops the pooled client, so it runs once per key
+_configured_api_key: Optional[str] = None
+_models: Dict[str, genai.GenerativeModel] = {}
+_client_guard = threading.Lock()
+
+
+def shared_model(config: Config) -> genai.GenerativeModel:
+    """
+    Get the model client shared by all backends of this process
+
+    The client connection is created on the first call and kept alive for every
+    later call, instead of configuring a new client per analyzer.
+    """
+    global _configured_api_key
+    with _client_guard:
+        if _configured_api_key != config.GEMINI_API_KEY:
+            genai.configure(api_key=config.GEMINI_API_KEY)
+            _configured_api_key = config.GEMINI_API_KEY
+            _models.clear()
+        model = _models.get(config.GEMINI_MODEL)
+        if model is None:
+            model = _models[config.GEMINI_MODEL] = genai.GenerativeModel(config.GEMINI_MODEL)
+        return model
+
+
+class GeminiBackend:
+    """
+    Sends receipt photos to Gemini and measures every call
+
+    Each extraction returns the response text together with its usage: image
+    bytes sent, prompt and response tokens from the response usage metadata,
+    time spent in AI calls, time spent waiting for a free call slot, retries
+    and model.
+    """
+
+    def __init__(self, config: Config, scheduler: Optional[PriorityScheduler] = None):
+        """
+        Initialize the backend with configuration
+
+        Args:
+            config: Application configuration
+            scheduler: Scheduler of the AI call slots (defaults to the one of this process)
+
+        Raises:
+            ValueError: If no GEMINI_API_KEY is configured or PROMPT_VERSION is unknown
+        """
+        if not config.GEMINI_API_KEY:
+            raise ValueError("GEMINI_API_KEY is required for receipt analysis")
+        # Fails for an unknown PROMPT_VERSION
+        get_prompt(config.PROMPT_VERSION)
+
+        self.config = config
+        self.scheduler = scheduler or default_scheduler(config)
+        self.model_name = config.GEMINI_MODEL
+        self.model = shared_model(config)
+
+    def extract(self, image_bytes: bytes, mime_type: str = "image/jpeg",
+                priority: str = 'api', deadline: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Send a receipt photo with the prompt to the AI
+
+        Rate-limited, overloaded or timed out calls are retried up to AI_MAX_RETRIES
+        times with exponential backoff; the call slot is released while backing off.
+        Every call times out after AI_CALL_TIMEOUT_SECONDS or at the deadline.
+
+        Args:
+            image_bytes: Content of the photo
+            mime_type: MIME type of the photo
+            priority: Priority class of the call (interactive, api or backfill)
+            deadline: time.monotonic() by which the extraction must be done (no deadline if None)
+
+        Returns:
+            Response text and usage dictionary keyed by USAGE_COLUMNS
+
+        Raises:
+            TimeoutError: If the deadline passed before the extraction succeeded
+            Exception: The error of the last attempt if all attempts failed
+        """
+        usage = self._new_usage(image_bytes)
+        contents = [self.config.PROMPT_TEXT, {"mime_type": mime_type, "data": image_bytes}]
+
+        while True:
+            wait_start = time.perf_counter()
+            with self.scheduler.slot(priority, self._remaining(deadline)):
+                call_start = time.perf_counter()
+                usage["Wartezeit_ms"] += (call_start - wait_start) * 1000
+                try:
+                    response = self.model.generate_content(contents, request_options={
+                        "timeout": self._call_timeout(deadline)})
+                    error = None
+                except TRANSIENT_ERRORS as e:
+                    error = e
+                finally:
+                    usage["Latenz_ms"] += (time.perf_counter() - call_start) * 1000
+
+            if error is None:
+                break
+            time.sleep(self._retry_backoff(error, usage, deadline))
+
+        return response.text, self._finish_usage(usage, response)
+
+    async def extract_async(self, image_bytes: bytes, mime_type: str = "image/jpeg",
+                            priority: str = 'api', deadline: Optional[float] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Send a receipt photo with the prompt to the AI without blocking the event loop
+
+        Same retries, timeouts and usage as extract, but the call slot is awaited and
+        the async client of the model is used, so a waiting or running call holds no thread.
+
+        Raises:
+            TimeoutError: If the deadline passed before the extraction succeeded
+            Exception: The error of the last attempt if all attempts failed
+        """
+        usage = self._new_usage(image_bytes)
+        contents = [self.config.PROMPT_TEXT, {"mime_type": mime_type, "data": image_bytes}]
+
+        while True:
+            wait_start = time.perf_counter()
+            async with self.scheduler.slot_async(priority, self._remaining(deadline)):
+                call_start = time.perf_counter()
+                usage["Wartezeit_ms"] += (call_start - wait_start) * 1000
+                timeout = self._call_timeout(deadline)
+                try:
+                    # Unlike a blocked thread a stalled coroutine can be cancelled, so the timeout always holds
+                    response = await asyncio.wait_for(self.model.generate_content_async(
+                        contents, request_options={"timeout": timeout}), timeout)
+                    error = None
+                except asyncio.TimeoutError:
+                    error = google_exceptions.DeadlineExceeded(f"no AI response within {timeout:.1f}s")
+                except TRANSIENT_ERRORS as e:
+                    error = e
+                finally:
+                    usage["Latenz_ms"] += (time.perf_counter() - call_start) * 1000
+
+            if error is None:
+                break
+            await asyncio.sleep(self._retry_backoff(error, usage, deadline))
+
+        return response.text, self._finish_usage(usage, response)
+
+    def _new_usage(self, image_bytes: bytes) -> Dict[str, Any]:
+        """Usage of an extraction before its first call"""
+        return {
+            "Bild_Bytes": len(image_bytes),
+            "Prompt_Tokens": None,
+            "Antwort_Tokens": None,
+            "Latenz_ms": 0.0,
+            "Wartezeit_ms": 0.0,
+            "Wiederholungen": 0,
+            "Modell": self.model_name
+        }
+
+    @staticmethod
+    def _finish_usage(usage: Dict[str, Any], response) -> Dict[str, Any]:
+        """Add the token counts of the successful response to the usage"""
+        metadata = getattr(response, "usage_metadata", None)
+        if metadata is not None:
+            usage["Prompt_Tokens"] = getattr(metadata, "prompt_token_count", None)
+            usage["Antwort_Tokens"] = getattr(metadata, "candidates_token_count", None)
+        usage["Latenz_ms"] = round(usage["Latenz_ms"], 1)
+        usage["Wartezeit_ms"] = round(usage["Wartezeit_ms"], 1)
+        return usage
+
+    def _call_timeout(self, deadline: Optional[float]) -> float:
+        """Timeout of one AI call, at the latest at the deadline"""
+        timeout = self.config.AI_CALL_TIMEOUT_SECONDS
+        if deadline is not None:
+            timeout = min(timeout, self._remaining(deadline))
+        return timeout
+
+    def _retry_backoff(self, error: Exception, usage: Dict[str, Any], deadline: Optional[float]) -> float:
+        """
+        Count a retry of a failed call and get the seconds to back off before it
+
+        Raises:
+            Exception: The error of the call if no retries are left
+            TimeoutError: If the deadline would pass while backing off
+        """
+        if usage["Wiederholungen"] >= self.config.AI_MAX_RETRIES:
+            raise error
+
+        backoff = self.config.AI_RETRY_BACKOFF_SECONDS * 2 ** usage["Wiederholungen"]
+        if deadline is not None and time.monotonic() + backoff >= deadline:
+            raise TimeoutError("deadline passed before the AI call succeeded") from error
+        usage["Wiederholungen"] += 1
+        print(f"AI call failed ({error.__class__.__name__}), retry {usage['Wiederholungen']} in {backoff:.1f}s")
+        return backoff
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        """
+        Get the seconds left until a deadline, None without deadline
+
+        Raises:
+            TimeoutError: If the deadline has passed
+        """
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError("deadline passed before the AI call")
+        return remaining
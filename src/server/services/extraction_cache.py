@@ -0,0 +1,84 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Dict, Any
+
+from ..core.config import Config
+from .storage import atomic_write
+
+
+class ExtractionCache:
+    """
+    Cache of parsed AI extractions keyed by image content, prompt and model
+
+    The same photo analyzed again (re-run, copied into another week, uploaded
+    twice) is answered from the cache instead of the AI. Entries are JSON files
+    EXTRACTION_CACHE_DIR/<key[:2]>/<key>.json with a small in-memory LRU in
+    front; changing the prompt or the model changes every key.
+    """
+
+    def __init__(self, config: Config, max_memory_entries: int = 4096):
+        """Initialize the cache with configuration"""
+        self.config = config
+        self.cache_dir = Path(config.EXTRACTION_CACHE_DIR)
+        self.enabled = config.EXTRACTION_CACHE
+        self.max_memory_entries = max_memory_entries
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def key(self, image_hash: str) -> str:
+        """Get the cache key of an image for the configured prompt and model"""
+        digest = hashlib.sha256()
+        for part in (self.config.GEMINI_MODEL, self.config.PROMPT_TEXT, image_hash):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def get(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the cached extraction of an image
+
+        Returns:
+            Dictionary with the parsed 'record' and the 'usage' of the original AI call, None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        key = self.key(image_hash)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry
+
+        try:
+            with open(self._cache_file(key), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        self._remember(key, entry)
+        return entry
+
+    def put(self, image_hash: str, record: Dict[str, Any], usage: Dict[str, Any]):
+        """Store the parsed extraction of an image"""
+        if not self.enabled:
+            return
+
+        key = self.key(image_hash)
+        entry = {"record": dict(record), "usage": dict(usage)}
+        with atomic_write(self._cache_file(key)) as f:
+            json.dump(entry, f)
+        self._remember(key, entry)
+
+    def _cache_file(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_memory_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Tuple
+
+# Read size for hashing files without loading them into memory
+CHUNK_SIZE = 1024 * 1024
+
+
+def sha256_file(path: Path) -> str:
+    """Compute the SHA-256 hash of a file in chunks"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class FileHashCache:
+    """
+    Memo of file content hashes keyed by path, size and modification time
+
+    A photo is only read again when it changed on disk, so content-addressed
+    lookups (thumbnails, ETags) cost a stat instead of a full read.
+    """
+
+    def __init__(self, max_entries: int = 50000):
+        """Initialize an empty memo holding at most max_entries hashes"""
+        self.max_entries = max_entries
+        self._hashes: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> str:
+        """Get the SHA-256 hash of a file, reading it only if it is not memoized"""
+        key = self._key(path)
+        with self._lock:
+            image_hash = self._hashes.get(key)
+            if image_hash is not None:
+                self._hashes.move_to_end(key)
+                return image_hash
+
+        image_hash = sha256_file(path)
+        self._store(key, image_hash)
+        return image_hash
+
+    def remember(self, path: Path, image_hash: str):
+        """Record the hash of a file whose content was already hashed elsewhere"""
+        self._store(self._key(path), image_hash)
+
+    def _store(self, key: Tuple[str, int, int], image_hash: str):
+        with self._lock:
+            self._hashes[key] = image_hash
+            self._hashes.move_to_end(key)
+            while len(self._hashes) > self.max_entries:
+                self._hashes.popitem(last=False)
+
+    @staticmethod
+    def _key(path: Path) -> Tuple[str, int, int]:
+        stat = path.stat()
+        return str(path), stat.st_size, stat.st_mtime_ns
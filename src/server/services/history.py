@@ -0,0 +1,277 @@
+import io
+import json
+import os
+from pathlib import Path
+from typing import Optional, List, Dict, Any
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    from pyarrow import fs as pafs
+except ImportError:
+    pa = None
+
+from ..core.config import Config
+from .manifest import parse_calendar_week, is_calendar_week
+from .storage import ResultStore, atomic_write, file_lock
+
+EXPORT_FORMATS = ("parquet", "arrow")
+
+# Bump when history_schema() changes, existing fragments are then rebuilt
+SCHEMA_VERSION = 3
+
+
+def history_schema():
+    """Schema of one week fragment of the history dataset, the year is the partition key"""
+    return pa.schema([
+        ("Kalenderwoche", pa.string()),
+        ("Datum", pa.date32()),
+        ("Uhrzeit", pa.time32("s")),
+        ("Summe_Food", pa.float64()),
+        ("Summe_NonFood", pa.float64()),
+        ("Foto_Datei", pa.string()),
+        ("Bild_Hash", pa.string()),
+        ("Duplikat_Von", pa.string()),
+        ("Prompt_Version", pa.string()),
+        ("Analyse_Modell", pa.string()),
+        ("Bild_Bytes", pa.int64()),
+        ("Prompt_Tokens", pa.int32()),
+        ("Antwort_Tokens", pa.int32()),
+        ("Latenz_ms", pa.float64()),
+        ("Wartezeit_ms", pa.float64()),
+        ("Wiederholungen", pa.int16()),
+        ("Modell", pa.string()),
+    ])
+
+
+class ResultHistory:
+    """
+    Typed, year-partitioned Arrow dataset of all analysis results
+
+    Every week's result CSV is converted once into an Arrow IPC fragment
+    HISTORY_DIR/year=YYYY/<week>.arrow. compact() only rewrites fragments of
+    weeks whose CSV changed since the last run, and readers memory-map the
+    fragments, so a year report is one columnar scan instead of N CSV parses.
+
+    Requires the optional pyarrow package.
+    """
+
+    def __init__(self, config: Config, results: Optional[ResultStore] = None):
+        """
+        Initialize the history with configuration
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+        """
+        if pa is None:
+            raise RuntimeError("pyarrow is required for the result history, install it with: pip install pyarrow")
+
+        self.config = config
+        self.results = results or ResultStore(config)
+        self.history_dir = Path(config.HISTORY_DIR)
+        self.manifest_file = self.history_dir / "_manifest.json"
+        self.lock_file = self.history_dir / ".compact.lock"
+
+    def fragment_file(self, calendar_week: str) -> Path:
+        """Get the dataset fragment of a calendar week"""
+        year, _ = parse_calendar_week(calendar_week)
+        return self.history_dir / f"year={year}" / f"{calendar_week}.arrow"
+
+    def compact(self) -> Dict[str, List[str]]:
+        """
+        Bring the dataset up to date with the result CSVs
+
+        Returns:
+            Dictionary with the 'updated' and 'removed' calendar weeks
+        """
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+
+        with file_lock(self.lock_file):
+            manifest = self._load_manifest()
+            if manifest is None:
+                # Fragments of an older schema can't be mixed with new ones
+                for fragment_file in self.history_dir.glob("year=*/*.arrow"):
+                    fragment_file.unlink()
+                manifest = {}
+            sources = self._scan_sources()
+
+            updated = []
+            for calendar_week, source in sorted(sources.items()):
+                if manifest.get(calendar_week) == source:
+                    continue
+                df = self.results.read(calendar_week)
+                if df is None:
+                    continue
+                table = self._to_table(calendar_week, df)
+                with atomic_write(self.fragment_file(calendar_week), "wb") as f:
+                    with pa.ipc.new_file(f, table.schema) as writer:
+                        writer.write_table(table)
+                manifest[calendar_week] = source
+                updated.append(calendar_week)
+
+            removed = []
+            for calendar_week in sorted(set(manifest) - set(sources)):
+                fragment_file = self.fragment_file(calendar_week)
+                try:
+                    os.unlink(fragment_file)
+                    # Drop the year partition with its last week
+                    fragment_file.parent.rmdir()
+                except OSError:
+                    pass
+                del manifest[calendar_week]
+                removed.append(calendar_week)
+
+            if updated or removed:
+                with atomic_write(self.manifest_file) as f:
+                    json.dump({"schema_version": SCHEMA_VERSION, "weeks": manifest}, f, indent=2, sort_keys=True)
+
+        return {'updated': updated, 'removed': removed}
+
+    def read(self, years: Optional[List[int]] = None, columns: Optional[List[str]] = None,
+             compact: bool = True):
+        """
+        Read the history as an Arrow table backed by memory-mapped fragments
+
+        Args:
+            years: Only read these years (partition pruning), all if None
+            columns: Only read these columns, all if None
+            compact: Update changed weeks first
+
+        Returns:
+            pyarrow.Table with the history columns and the partition column 'year'
+        """
+        if compact:
+            self.compact()
+        if not any(self.history_dir.glob("year=*/*.arrow")):
+            empty = history_schema().append(pa.field("year", pa.int32())).empty_table()
+            return empty.select(columns) if columns else empty
+
+        dataset = ds.dataset(str(self.history_dir), format="ipc", partitioning="hive",
+                             filesystem=pafs.LocalFileSystem(use_mmap=True))
+        row_filter = ds.field("year").isin(years) if years else None
+        return dataset.to_table(columns=columns, filter=row_filter)
+
+    def yearly_summary(self, years: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+        """
+        Get the costs per year in one columnar scan
+
+        Returns:
+            List of dictionaries with 'year', 'weeks', 'total_receipts', 'total_food',
+            'total_nonfood' and 'grand_total', sorted by year
+        """
+        table = self.read(years=years, columns=["year", "Kalenderwoche", "Summe_Food", "Summe_NonFood"])
+        grouped = table.group_by("year").aggregate([
+            ("Kalenderwoche", "count_distinct"),
+            ("Kalenderwoche", "count"),
+            ("Summe_Food", "sum"),
+            ("Summe_NonFood", "sum"),
+        ])
+
+        summary = []
+        for row in grouped.to_pylist():
+            total_food = round(row["Summe_Food_sum"] or 0.0, 2)
+            total_nonfood = round(row["Summe_NonFood_sum"] or 0.0, 2)
+            summary.append({
+                'year': row["year"],
+                'weeks': row["Kalenderwoche_count_distinct"],
+                'total_receipts': row["Kalenderwoche_count"],
+                'total_food': total_food,
+                'total_nonfood': total_nonfood,
+                'grand_total': round(total_food + total_nonfood, 2)
+            })
+        return sorted(summary, key=lambda entry: entry['year'])
+
+    def export(self, output, export_format: str = "parquet", years: Optional[List[int]] = None):
+        """
+        Export the history into one Parquet or Arrow IPC file
+
+        Args:
+            output: Target file path or binary file object
+            export_format: 'parquet' or 'arrow'
+            years: Only export these years, all if None
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"unsupported export format {export_format!r}, expected one of {', '.join(EXPORT_FORMATS)}")
+
+        table = self.read(years=years)
+        if export_format == "parquet":
+            pq.write_table(table, output, compression="zstd")
+        elif isinstance(output, (str, Path)):
+            with pa.OSFile(str(output), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        else:
+            with pa.ipc.new_file(output, table.schema) as writer:
+                writer.write_table(table)
+
+    def export_bytes(self, export_format: str = "parquet", years: Optional[List[int]] = None) -> bytes:
+        """Export the history into an in-memory Parquet or Arrow IPC file"""
+        buffer = io.BytesIO()
+        self.export(buffer, export_format, years)
+        return buffer.getvalue()
+
+    def _scan_sources(self) -> Dict[str, List[int]]:
+        """Get [mtime_ns, size] of every week's result CSV"""
+        sources = {}
+        with os.scandir(self.config.COST_FILES_DIR) as entries:
+            for entry in entries:
+                if not entry.name.endswith("_costs.csv") or not entry.is_file():
+                    continue
+                calendar_week = entry.name[:-len("_costs.csv")]
+                if is_calendar_week(calendar_week):
+                    stat = entry.stat()
+                    sources[calendar_week] = [stat.st_mtime_ns, stat.st_size]
+        return sources
+
+    def _load_manifest(self) -> Optional[Dict[str, List[int]]]:
+        """Get the source state of every compacted week, None if the fragments have an outdated schema"""
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            return None
+
+        if not isinstance(manifest, dict) or manifest.get("schema_version") != SCHEMA_VERSION:
+            return None
+        return manifest.get("weeks", {})
+
+    def _to_table(self, calendar_week: str, df: pd.DataFrame):
+        """Convert the result rows of a week into a typed Arrow table"""
+        def text_column(name):
+            if name not in df.columns:
+                return pa.nulls(len(df), pa.string())
+            values = df[name].astype(object).where(df[name].notna(), None)
+            return pa.array([None if value is None else str(value) for value in values], pa.string())
+
+        def number_column(name, arrow_type):
+            if name not in df.columns:
+                return pa.nulls(len(df), arrow_type)
+            return pa.array(pd.to_numeric(df[name], errors="coerce"), from_pandas=True).cast(arrow_type)
+
+        dates = pd.to_datetime(df.get("Datum"), format="%d.%m.%Y", errors="coerce")
+        times = pd.to_datetime(df.get("Uhrzeit"), format="%H:%M", errors="coerce")
+        seconds = times.dt.hour * 3600 + times.dt.minute * 60
+
+        return pa.table([
+            pa.array([calendar_week] * len(df), pa.string()),
+            pa.array(dates.dt.date.where(dates.notna(), None), pa.date32()),
+            pa.array(seconds.where(seconds.notna(), None).astype("Int32"), pa.int32()).cast(pa.time32("s")),
+            pa.array(pd.to_numeric(df["Summe_Food"], errors="coerce").fillna(0.0), pa.float64()),
+            pa.array(pd.to_numeric(df["Summe_NonFood"], errors="coerce").fillna(0.0), pa.float64()),
+            text_column("Foto_Datei"),
+            text_column("Bild_Hash"),
+            text_column("Duplikat_Von"),
+            text_column("Prompt_Version"),
+            text_column("Analyse_Modell"),
+            number_column("Bild_Bytes", pa.int64()),
+            number_column("Prompt_Tokens", pa.int32()),
+            number_column("Antwort_Tokens", pa.int32()),
+            number_column("Latenz_ms", pa.float64()),
+            number_column("Wartezeit_ms", pa.float64()),
+            number_column("Wiederholungen", pa.int16()),
+            text_column("Modell"),
+        ], schema=history_schema())
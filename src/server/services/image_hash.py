@@ -0,0 +1,203 @@
+import io
+import itertools
+import json
+import threading
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+from PIL import Image
+
+from ..core.config import Config
+from .storage import file_lock
+
+# Edge length of the gradient grid, gives a 64 bit hash
+HASH_SIZE = 8
+
+
+def compute_dhash(image_bytes: bytes, hash_size: int = HASH_SIZE) -> int:
+    """
+    Compute the difference hash (dHash) of an image
+
+    The image is decoded at reduced scale, converted to grayscale and shrunk to
+    (hash_size + 1) x hash_size pixels. Every bit tells whether a pixel is brighter
+    than its right neighbour, so small changes of framing, scale or compression
+    only flip a few bits.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        # Let the JPEG decoder skip full resolution, we only need a few pixels
+        image.draft("L", (hash_size * 8, hash_size * 8))
+        small = image.convert("L").resize((hash_size + 1, hash_size), Image.BOX)
+        pixels = np.asarray(small, dtype=np.int16)
+
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Count the differing bits of two perceptual hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree for sub-linear Hamming distance lookups of perceptual hashes"""
+
+    def __init__(self):
+        """Initialize an empty tree"""
+        # Node: [hash, items, {distance: child node}]
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, phash: int, item: Any):
+        """Add an item under its perceptual hash"""
+        self._size += 1
+        if self._root is None:
+            self._root = [phash, [item], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(phash, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [phash, [item], {}]
+                return
+            node = child
+
+    def search(self, phash: int, max_distance: int) -> List[Tuple[int, Any]]:
+        """
+        Find all items within a Hamming distance of a perceptual hash
+
+        Returns:
+            List of (distance, item) sorted by distance
+        """
+        matches = []
+        candidates = [self._root] if self._root is not None else []
+
+        while candidates:
+            node = candidates.pop()
+            distance = hamming_distance(phash, node[0])
+            if distance <= max_distance:
+                matches.extend((distance, item) for item in node[1])
+
+            # Triangle inequality: only children in [d - max, d + max] can match
+            for child_distance, child in node[2].items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    candidates.append(child)
+
+        return sorted(matches, key=lambda match: match[0])
+
+
+class PerceptualHashIndex:
+    """
+    Persistent index of the perceptual hashes of all analyzed receipt photos
+
+    The index is an append-only JSON lines file, so adding a photo costs one short
+    write and other processes only need to read the lines appended since their last
+    lookup. A later line for the same photo replaces the earlier one but keeps its
+    place in the order the photos were first indexed: a photo is only reported as
+    a duplicate of photos indexed before it, so re-analyzing the original never
+    flags it as a copy of its own duplicates.
+    """
+
+    def __init__(self, config: Config):
+        """Initialize the index with configuration"""
+        self.config = config
+        self.index_file = config.PHASH_INDEX_FILE
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        # photo key -> position in the order the photos were first indexed
+        self._first_seen: Dict[str, int] = {}
+        self._positions = itertools.count()
+        self._tree = BKTree()
+        self._read_offset = 0
+        self._lock = threading.Lock()
+
+    def find_near_duplicates(self, phash: int, calendar_week: str, file_name: str,
+                             max_distance: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Find analyzed photos that look like the given one
+
+        Args:
+            phash: Perceptual hash of the photo
+            calendar_week: Calendar week of the photo (the photo itself is not reported)
+            file_name: File name of the photo
+            max_distance: Hamming distance threshold (defaults to DUPLICATE_MAX_DISTANCE)
+
+        Returns:
+            Index entries of photos indexed before this one, with an added 'distance', closest first
+        """
+        if max_distance is None:
+            max_distance = self.config.DUPLICATE_MAX_DISTANCE
+
+        own_key = self._key(calendar_week, file_name)
+        matches = {}
+        with self._lock:
+            self._read_new_entries()
+            # A photo not indexed yet comes after all indexed ones
+            own_position = self._first_seen.get(own_key, float("inf"))
+            for _, key in self._tree.search(phash, max_distance):
+                entry = self._entries.get(key)
+                if entry is None or key == own_key or self._first_seen[key] >= own_position:
+                    continue
+                # The tree keeps outdated hashes of re-analyzed photos, check the current one
+                distance = hamming_distance(phash, int(entry["phash"], 16))
+                if distance > max_distance:
+                    continue
+                if not (self.config.PHOTOS_DIR / entry["calendar_week"] / entry["foto_datei"]).exists():
+                    # Deleted photos must not match new ones
+                    self._forget(key)
+                    continue
+                matches[key] = dict(entry, distance=distance)
+
+        return sorted(matches.values(), key=lambda match: match["distance"])
+
+    def add(self, phash: int, calendar_week: str, file_name: str, image_hash: str):
+        """Add or replace the perceptual hash of an analyzed photo"""
+        entry = {
+            "phash": f"{phash:016x}",
+            "calendar_week": calendar_week,
+            "foto_datei": file_name,
+            "image_hash": image_hash
+        }
+
+        self.index_file.parent.mkdir(parents=True, exist_ok=True)
+        with file_lock(self.index_file.with_name(self.index_file.name + ".lock")):
+            with open(self.index_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+
+    def _read_new_entries(self):
+        """Add the entries appended since the last read to the BK-tree"""
+        try:
+            with open(self.index_file, "rb") as f:
+                f.seek(self._read_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+
+        # Only consume complete lines, a writer may be in the middle of one
+        complete = data[:data.rfind(b"\n") + 1]
+        self._read_offset += len(complete)
+
+        for line in complete.decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = self._key(entry["calendar_week"], entry["foto_datei"])
+            self._entries[key] = entry
+            if key not in self._first_seen:
+                self._first_seen[key] = next(self._positions)
+            self._tree.add(int(entry["phash"], 16), key)
+
+    def _forget(self, key: str):
+        """Drop the entry of a deleted photo, the tree skips keys without entry"""
+        del self._entries[key]
+        del self._first_seen[key]
+
+    @staticmethod
+    def _key(calendar_week: str, file_name: str) -> str:
+        return f"{calendar_week}/{file_name}"
@@ -0,0 +1,170 @@
+import io
+import os
+import struct
+from pathlib import Path
+from typing import Optional, Dict, Any, BinaryIO, Tuple
+
+from ..core.config import Config
+
+# Leading bytes of image (and common non-image) formats, checked in order
+SIGNATURES = (
+    (b"\xff\xd8\xff", 'jpeg'),
+    (b"\x89PNG\r\n\x1a\n", 'png'),
+    (b"GIF87a", 'gif'),
+    (b"GIF89a", 'gif'),
+    (b"BM", 'bmp'),
+    (b"%PDF", 'pdf'),
+)
+
+# Formats the file extensions stand for
+EXTENSION_FORMATS = {'.jpg': 'jpeg', '.jpeg': 'jpeg', '.png': 'png', '.webp': 'webp', '.heic': 'heic',
+                     '.gif': 'gif', '.bmp': 'bmp'}
+
+MIME_TYPES = {'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp', 'heic': 'image/heic',
+              'gif': 'image/gif', 'bmp': 'image/bmp'}
+
+# JPEG start-of-frame markers, they carry the image dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# Cameras append maker data after the JPEG end marker, look for it in this many last bytes
+JPEG_TAIL_BYTES = 64 * 1024
+
+# Reasons of IntakeError
+INTAKE_REASONS = ('empty', 'oversized', 'unsupported', 'mislabelled', 'truncated', 'dimensions')
+
+
+class IntakeError(ValueError):
+    """Photo rejected before analysis, with the reason (one of INTAKE_REASONS)"""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason
+
+
+def inspect_image(path: Path, config: Config) -> Dict[str, Any]:
+    """
+    Check a photo file before it is read and sent to the AI
+
+    Only the size, the header and the tail of the file are read.
+
+    Returns:
+        Dictionary with 'format', 'mime_type', 'width', 'height' and 'size'
+
+    Raises:
+        IntakeError: If the photo is empty, larger than MAX_FILE_SIZE, no supported
+            image, not the format its extension says, truncated or has unusable dimensions
+    """
+    size = path.stat().st_size
+    _check_size(size, config)
+    with open(path, "rb") as f:
+        return _inspect(f, size, path.name, config)
+
+
+def inspect_image_bytes(image_bytes: bytes, file_name: str, config: Config) -> Dict[str, Any]:
+    """Check the content of an uploaded photo like inspect_image"""
+    _check_size(len(image_bytes), config)
+    return _inspect(io.BytesIO(image_bytes), len(image_bytes), file_name, config)
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Get the format of a file from its first bytes, None if unknown"""
+    for signature, image_format in SIGNATURES:
+        if header.startswith(signature):
+            return image_format
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return 'webp'
+    if header[4:8] == b"ftyp" and header[8:12] in (b"heic", b"heix", b"mif1", b"msf1"):
+        return 'heic'
+    return None
+
+
+def _check_size(size: int, config: Config):
+    if size == 0:
+        raise IntakeError('empty', "file is empty")
+    if size > config.MAX_FILE_SIZE:
+        raise IntakeError('oversized', f"file has {size} bytes, more than MAX_FILE_SIZE ({config.MAX_FILE_SIZE})")
+
+
+def _inspect(f: BinaryIO, size: int, file_name: str, config: Config) -> Dict[str, Any]:
+    extension = os.path.splitext(file_name)[1].lower()
+    if extension not in config.SUPPORTED_IMAGE_EXTENSIONS:
+        raise IntakeError('unsupported', f"{extension or 'no extension'} is not one of "
+                                         f"{', '.join(config.SUPPORTED_IMAGE_EXTENSIONS)}")
+
+    image_format = sniff_format(f.read(16))
+    expected = EXTENSION_FORMATS.get(extension)
+    if image_format is None:
+        raise IntakeError('unsupported', "content is no known image format")
+    if image_format != expected:
+        raise IntakeError('mislabelled', f"content is {image_format.upper()}, not {expected.upper()} "
+                                         f"as the extension {extension} says")
+
+    width, height = _dimensions(f, image_format)
+    if image_format == 'jpeg':
+        _check_jpeg_end(f, size)
+
+    if width is not None:
+        if min(width, height) < config.MIN_IMAGE_EDGE:
+            raise IntakeError('dimensions', f"{width}x{height} pixels, smaller than MIN_IMAGE_EDGE "
+                                            f"({config.MIN_IMAGE_EDGE})")
+        if width * height > config.MAX_IMAGE_PIXELS:
+            raise IntakeError('dimensions', f"{width}x{height} pixels, more than MAX_IMAGE_PIXELS "
+                                            f"({config.MAX_IMAGE_PIXELS})")
+
+    return {'format': image_format, 'mime_type': MIME_TYPES[image_format], 'width': width, 'height': height,
+            'size': size}
+
+
+def _dimensions(f: BinaryIO, image_format: str) -> Tuple[Optional[int], Optional[int]]:
+    """Read width and height from the header, (None, None) for formats without parser"""
+    if image_format == 'jpeg':
+        return _jpeg_dimensions(f)
+    if image_format == 'png':
+        f.seek(16)
+        data = f.read(8)
+        if len(data) < 8:
+            raise IntakeError('truncated', "PNG header is cut off")
+        return struct.unpack(">II", data)
+    return None, None
+
+
+def _jpeg_dimensions(f: BinaryIO) -> Tuple[int, int]:
+    """Walk the JPEG segment headers up to the frame header, skipping the segment data"""
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise IntakeError('truncated', "JPEG header is cut off or damaged")
+        code = marker[1]
+        while code == 0xFF:
+            # Fill bytes before the marker
+            fill = f.read(1)
+            if not fill:
+                raise IntakeError('truncated', "JPEG header is cut off")
+            code = fill[0]
+        if code == 0x01 or 0xD0 <= code <= 0xD8:
+            # Markers without segment
+            continue
+        if code in (0xD9, 0xDA):
+            raise IntakeError('truncated', "JPEG has no frame header before its image data")
+
+        data = f.read(2)
+        if len(data) < 2:
+            raise IntakeError('truncated', "JPEG header is cut off")
+        length = struct.unpack(">H", data)[0]
+        if length < 2:
+            raise IntakeError('truncated', "JPEG header is damaged")
+        if code in JPEG_SOF_MARKERS:
+            data = f.read(5)
+            if len(data) < 5:
+                raise IntakeError('truncated', "JPEG frame header is cut off")
+            _, height, width = struct.unpack(">BHH", data)
+            return width, height
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+def _check_jpeg_end(f: BinaryIO, size: int):
+    """A JPEG whose upload or copy broke off misses the end marker"""
+    f.seek(max(0, size - JPEG_TAIL_BYTES))
+    if b"\xff\xd9" not in f.read(JPEG_TAIL_BYTES):
+        raise IntakeError('truncated', "JPEG end marker is missing, the file is cut off")
@@ -0,0 +1,142 @@
+import os
+import re
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+
+from ..core.config import Config
+
+# Calendar week directories like 2025CW_30 (any year)
+WEEK_PATTERN = re.compile(r"^(\d{4})CW_(\d{1,2})$")
+
+# Directory mtimes younger than this may miss a change in the same clock tick, rescan those
+RACY_MTIME_SECONDS = 2.0
+
+
+def parse_calendar_week(calendar_week: str) -> Tuple[int, int]:
+    """
+    Split a calendar week like 2025CW_30 into (year, week_number)
+
+    Raises:
+        ValueError: If the calendar week is not in format YYYYCW_XX
+    """
+    match = WEEK_PATTERN.match(calendar_week or "")
+    if not match:
+        raise ValueError(f"invalid calendar week {calendar_week!r}, expected format 2025CW_XX")
+
+    year, week_number = int(match.group(1)), int(match.group(2))
+    if not 1 <= week_number <= 53:
+        raise ValueError(f"invalid calendar week number in {calendar_week!r}")
+    return year, week_number
+
+
+def is_calendar_week(calendar_week: str) -> bool:
+    """Check if a name is a calendar week in format YYYYCW_XX"""
+    try:
+        parse_calendar_week(calendar_week)
+        return True
+    except ValueError:
+        return False
+
+
+class WeekManifest:
+    """
+    Cached listing of week directories, their photos and result files
+
+    Every directory is listed once with os.scandir and the listing is reused
+    until the directory's mtime changes (files added, removed or renamed), so
+    unchanged directories cost a single stat per lookup.
+    """
+
+    def __init__(self, config: Config):
+        """Initialize the manifest with configuration"""
+        self.config = config
+        # directory path -> (mtime_ns, listing)
+        self._listings: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_weeks(self) -> List[str]:
+        """Get all calendar weeks with a photo directory, sorted by year and week number"""
+        weeks = self._cached_listing(str(self.config.PHOTOS_DIR), self._scan_weeks)
+        return list(weeks or [])
+
+    def get_photos(self, calendar_week: str) -> List[Dict[str, Any]]:
+        """
+        Get the supported photo files of a calendar week
+
+        Returns:
+            List of dictionaries with 'name', 'path', 'size' and 'mtime', sorted by name
+        """
+        if not is_calendar_week(calendar_week):
+            return []
+        photos = self._cached_listing(str(self.config.PHOTOS_DIR / calendar_week), self._scan_photos)
+        return list(photos or [])
+
+    def get_result_mtimes(self) -> Dict[str, float]:
+        """Get the modification time of the result file of every analyzed calendar week"""
+        results = self._cached_listing(str(self.config.COST_FILES_DIR), self._scan_results)
+        return dict(results or {})
+
+    def get_week_info(self, calendar_week: str) -> Dict[str, Any]:
+        """Get photo count and analysis state of a calendar week"""
+        year, week_number = parse_calendar_week(calendar_week)
+        last_analysis = self.get_result_mtimes().get(calendar_week)
+
+        return {
+            'week': calendar_week,
+            'year': year,
+            'week_number': week_number,
+            'file_count': len(self.get_photos(calendar_week)),
+            'analysis_status': 'analyzed' if last_analysis is not None else 'not_analyzed',
+            'last_analysis': last_analysis
+        }
+
+    def _cached_listing(self, directory: str, scan):
+        """Return the memoized listing of a directory, rescanning it when its mtime changed"""
+        try:
+            mtime_ns = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        cached = self._listings.get(directory)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        listing = scan(directory)
+        # A change within the same mtime tick would go unnoticed, so don't memoize fresh directories
+        if time.time() - mtime_ns / 1e9 > RACY_MTIME_SECONDS:
+            with self._lock:
+                self._listings[directory] = (mtime_ns, listing)
+        return listing
+
+    def _scan_weeks(self, directory: str) -> List[str]:
+        weeks = []
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir() and is_calendar_week(entry.name):
+                    weeks.append(entry.name)
+        return sorted(weeks, key=parse_calendar_week)
+
+    def _scan_photos(self, directory: str) -> List[Dict[str, Any]]:
+        photos = []
+        extensions = self.config.SUPPORTED_IMAGE_EXTENSIONS
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or os.path.splitext(entry.name)[1].lower() not in extensions:
+                    continue
+                stat = entry.stat()
+                photos.append({
+                    'name': entry.name,
+                    'path': entry.path,
+                    'size': stat.st_size,
+                    'mtime': stat.st_mtime
+                })
+        return sorted(photos, key=lambda photo: photo['name'])
+
+    def _scan_results(self, directory: str) -> Dict[str, float]:
+        results = {}
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.endswith("_costs.csv") and entry.is_file():
+                    results[entry.name[:-len("_costs.csv")]] = entry.stat().st_mtime
+        return results
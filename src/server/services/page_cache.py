@@ -0,0 +1,35 @@
+import threading
+from typing import Optional, Dict, Any, Hashable, Tuple
+
+
+class PageCache:
+    """
+    Rendered pages of the web UI, each stored with the version of the data it shows
+
+    A page is served from the cache as long as the caller passes the same version
+    (e.g. the week listing and the result file mtimes of the WeekManifest), so a
+    finished analysis, which rewrites a result file, invalidates the pages showing
+    it without any explicit call. Only the newest version of every page is kept.
+    """
+
+    def __init__(self, max_pages: int = 256):
+        """Initialize an empty cache holding at most max_pages pages"""
+        self.max_pages = max_pages
+        # page key -> (version, rendered page)
+        self._pages: Dict[Hashable, Tuple[Hashable, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        """Get a rendered page, None if it is not cached for this version"""
+        cached = self._pages.get(key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        return None
+
+    def put(self, key: Hashable, version: Hashable, page: Any):
+        """Store a rendered page for a version, replacing older versions of it"""
+        with self._lock:
+            if key not in self._pages and len(self._pages) >= self.max_pages:
+                # Pages of calendar weeks nobody opens any more, drop the oldest entry
+                self._pages.pop(next(iter(self._pages)))
+            self._pages[key] = (version, page)
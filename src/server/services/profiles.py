@@ -0,0 +1,104 @@
+import cProfile
+import io
+import marshal
+import pstats
+import re
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from ..core.config import Config
+from .storage import atomic_write
+
+# Profile files like 20250801T101500-GET-receipts_show-1234ms-1a2b3c.pstats
+PROFILE_NAME_PATTERN = re.compile(r"^(\d{8}T\d{6})-([A-Z]+)-([\w.-]*)-(\d+)ms-([0-9a-f]{6})\.pstats$")
+
+
+class ProfileStore:
+    """
+    Bounded directory of request profiles in pstats format
+
+    Profiles are written as PROFILE_DIR/<time>-<method>-<path>-<duration>-<id>.pstats
+    and readable with `python -m pstats` or snakeviz. Only the PROFILE_MAX_FILES
+    newest profiles are kept.
+    """
+
+    def __init__(self, config: Config):
+        """Initialize the profile store with configuration"""
+        self.config = config
+        self.profile_dir = Path(config.PROFILE_DIR)
+        self.max_files = config.PROFILE_MAX_FILES
+        self._lock = threading.Lock()
+
+    def save(self, profile: cProfile.Profile, method: str, path: str, duration_ms: float) -> str:
+        """
+        Store the profile of a request
+
+        Returns:
+            Name of the profile file
+        """
+        slug = re.sub(r"[^\w.-]+", "_", path.strip("/"))[:80]
+        name = (f"{datetime.utcnow():%Y%m%dT%H%M%S}-{method.upper()}-{slug}-"
+                f"{int(duration_ms)}ms-{uuid.uuid4().hex[:6]}.pstats")
+
+        profile.create_stats()
+        with atomic_write(self.profile_dir / name, "wb") as f:
+            # Same format as pstats.Stats.dump_stats
+            marshal.dump(profile.stats, f)
+
+        self._prune()
+        return name
+
+    def list_profiles(self) -> List[Dict[str, Any]]:
+        """Get the stored profiles with 'name', 'created', 'method', 'route', 'duration_ms' and 'size', newest first"""
+        if not self.profile_dir.exists():
+            return []
+
+        profiles = []
+        for profile_file in self.profile_dir.glob("*.pstats"):
+            match = PROFILE_NAME_PATTERN.match(profile_file.name)
+            if not match:
+                continue
+            try:
+                size = profile_file.stat().st_size
+            except FileNotFoundError:
+                continue
+            profiles.append({
+                'name': profile_file.name,
+                'created': datetime.strptime(match.group(1), "%Y%m%dT%H%M%S").isoformat(),
+                'method': match.group(2),
+                'route': match.group(3),
+                'duration_ms': int(match.group(4)),
+                'size': size
+            })
+        return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+    def profile_file(self, name: str) -> Optional[Path]:
+        """Get the file of a stored profile, None for an unknown or invalid name"""
+        if not PROFILE_NAME_PATTERN.match(name or ""):
+            return None
+        profile_file = self.profile_dir / name
+        return profile_file if profile_file.is_file() else None
+
+    def summary(self, name: str, limit: int = 40) -> Optional[str]:
+        """Get the functions of a profile with the highest cumulative time as text"""
+        profile_file = self.profile_file(name)
+        if profile_file is None:
+            return None
+
+        output = io.StringIO()
+        stats = pstats.Stats(str(profile_file), stream=output)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+        return output.getvalue()
+
+    def _prune(self):
+        """Remove the oldest profiles beyond PROFILE_MAX_FILES"""
+        with self._lock:
+            profiles = sorted(self.profile_dir.glob("*.pstats"), key=lambda profile_file: profile_file.name)
+            for profile_file in profiles[:max(0, len(profiles) - self.max_files)]:
+                try:
+                    profile_file.unlink()
+                except FileNotFoundError:
+                    pass
@@ -0,0 +1,86 @@
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+from ..core.config import Config
+from .storage import atomic_write, file_lock
+
+
+class QuarantineStore:
+    """Keeps unparseable AI responses per calendar week so they can be re-analyzed"""
+
+    def __init__(self, config: Config):
+        """Initialize the quarantine store with configuration"""
+        self.config = config
+        self.quarantine_dir = config.QUARANTINE_DIR
+
+    def _quarantine_file(self, calendar_week: str) -> Path:
+        """Get the quarantine file of a calendar week"""
+        return self.quarantine_dir / f"{calendar_week}_quarantine.json"
+
+    def load(self, calendar_week: str) -> Dict[str, Dict[str, Any]]:
+        """Get quarantined receipts of a calendar week keyed by photo file name"""
+        try:
+            with open(self._quarantine_file(calendar_week), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def add(self, calendar_week: str, file_name: str, image_hash: str, raw_response: str, error: str,
+            usage: Optional[Dict[str, Any]] = None):
+        """Quarantine the raw AI response of a receipt photo together with the usage of its AI call"""
+        with self._lock(calendar_week):
+            entries = self.load(calendar_week)
+            previous = entries.get(file_name, {})
+
+            entries[file_name] = {
+                "foto_datei": file_name,
+                "image_hash": image_hash,
+                "raw_response": raw_response,
+                "error": error,
+                "attempts": previous.get("attempts", 0) + 1,
+                "quarantined_at": datetime.utcnow().isoformat(),
+                "usage": usage
+            }
+            self._save(calendar_week, entries)
+
+    def remove(self, calendar_week: str, file_name: str):
+        """Release a receipt photo from quarantine"""
+        if file_name not in self.load(calendar_week):
+            return
+
+        with self._lock(calendar_week):
+            entries = self.load(calendar_week)
+            if entries.pop(file_name, None) is not None:
+                self._save(calendar_week, entries)
+
+    def get_weeks(self) -> List[str]:
+        """Get calendar weeks that have quarantined receipts"""
+        if not self.quarantine_dir.exists():
+            return []
+
+        weeks = []
+        for item in self.quarantine_dir.glob("*_quarantine.json"):
+            calendar_week = item.name[:-len("_quarantine.json")]
+            if self.load(calendar_week):
+                weeks.append(calendar_week)
+
+        return sorted(weeks)
+
+    def _lock(self, calendar_week: str):
+        """Lock the quarantine file of a calendar week for a read-modify-write"""
+        quarantine_file = self._quarantine_file(calendar_week)
+        return file_lock(quarantine_file.with_name(quarantine_file.name + ".lock"))
+
+    def _save(self, calendar_week: str, entries: Dict[str, Dict[str, Any]]):
+        """Write the quarantine file of a calendar week, removing it when empty"""
+        quarantine_file = self._quarantine_file(calendar_week)
+
+        if not entries:
+            if quarantine_file.exists():
+                quarantine_file.unlink()
+            return
+
+        with atomic_write(quarantine_file) as f:
+            json.dump(entries, f, ensure_ascii=False, indent=2)
@@ -1,112 +1,916 @@
 import os
-import google.generativeai as genai
+import asyncio
+import hashlib
+import threading
+import time
+import weakref
 import pandas as pd
 from pathlib import Path
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable
 
-from ..core.config import Config
+from ..core.config import Config, DevelopmentConfig
+from ..core.prompts import LEGACY_PROMPT_VERSION, LEGACY_MODEL
+from .ai_backend import GeminiBackend, USAGE_COLUMNS
+from .scheduler import default_scheduler, PRIORITY_CLASSES
+from .quarantine import QuarantineStore
+from .storage import ResultStore, atomic_write
+from .extraction_cache import ExtractionCache
+from .receipt_index import ReceiptIndexCache
+from .image_hash import PerceptualHashIndex, compute_dhash
+from .thumbnails import ThumbnailCache
+from .hashing import FileHashCache
+from .manifest import WeekManifest, is_calendar_week
+from .single_flight import week_runs, extraction_runs, async_week_runs, async_extraction_runs
+from .run_journal import RunJournal, JournalRun
+from .tracing import default_tracer
+from .intake import inspect_image, inspect_image_bytes, IntakeError
+from .response_parser import parse_receipt_response, ResponseParseError
+
+# Classification of photos by a dry run, see plan_week_analysis
+PLAN_CLASSES = ('new', 'changed', 'unchanged', 'cached', 'duplicate', 'rejected', 'unsupported')
+
+# Analyzer shared by the API, the web interface and the console tools of a process
+_shared_analyzer: Optional["ReceiptAnalyzer"] = None
+_shared_analyzer_guard = threading.Lock()
+
+
+def get_analyzer(config: Optional[Config] = None) -> "ReceiptAnalyzer":
+    """
+    Get the analyzer of this process, created on first use
+    
+    All entry points share its AI client, caches, indexes and call scheduler.
+    
+    Args:
+        config: Configuration of the analyzer if it doesn't exist yet (DevelopmentConfig if None)
+        
+    Raises:
+        ValueError: If no GEMINI_API_KEY is configured
+    """
+    global _shared_analyzer
+    with _shared_analyzer_guard:
+        if _shared_analyzer is None:
+            _shared_analyzer = ReceiptAnalyzer(config or DevelopmentConfig())
+        return _shared_analyzer
+
+
+def in_rollout(key: str, target: str, fraction: float) -> bool:
+    """
+    Check if an item is in the share of a rollout to a target version
+    
+    The choice is stable: an item in the rollout at some fraction stays in at every larger one.
+    """
+    if fraction >= 1:
+        return True
+    digest = hashlib.sha256(f"{target}\0{key}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") / 2 ** 64 < fraction
 
 
 class ReceiptAnalyzer:
     """Service class for AI-powered receipt analysis"""
     
     def __init__(self, config: Config):
-        """Initialize the receipt analyzer with configuration"""
+        """
+        Initialize the receipt analyzer with configuration
+        
+        Args:
+            config: Application configuration
+        """
         self.config = config
+        # AI call slots are scheduled by priority across all processes of the data directory
+        self.scheduler = default_scheduler(config)
+        self.quarantine = QuarantineStore(config)
+        self.results = ResultStore(config)
+        self.receipt_index = ReceiptIndexCache(self.results)
+        self.duplicates = PerceptualHashIndex(config)
+        self.manifest = WeekManifest(config)
+        self.file_hashes = FileHashCache()
+        self.thumbnails = ThumbnailCache(config, self.file_hashes)
+        self.extractions = ExtractionCache(config)
+        self.journal = RunJournal(config)
+        self.tracer = default_tracer(config)
+        # event loop -> semaphore of the receipts in progress on it (async path)
+        self._async_slots = weakref.WeakKeyDictionary()
         self._setup_gemini()
     
     def _setup_gemini(self):
-        """Configure Gemini AI with API key"""
-        if not self.config.GEMINI_API_KEY:
-            raise ValueError("GEMINI_API_KEY is required for receipt analysis")
-        
-        genai.configure(api_key=self.config.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel(self.config.GEMINI_MODEL)
+        """Configure the Gemini AI backend"""
+        self.backend = GeminiBackend(self.config, self.scheduler)
+        self.model = self.backend.model
     
-    def analyze_calendar_week(self, calendar_week: str) -> Optional[pd.DataFrame]:
+    def analyze_calendar_week(self, calendar_week: str,
+                              file_names: Optional[Iterable[str]] = None,
+                              incremental: bool = False,
+                              priority: str = 'api',
+                              use_cache: bool = True,
+                              deadline_seconds: Optional[float] = None) -> Optional[pd.DataFrame]:
         """
         Analyze all receipt photos in a calendar week directory
         
         Args:
             calendar_week: Calendar week in format 2025CW_XX
+            file_names: Only analyze these photo files of the week (all if None)
+            incremental: Skip photos whose unchanged content is already in the results
+            priority: Priority class of the AI calls (interactive, api or backfill)
+            use_cache: Reuse extractions of photos analyzed before with the same prompt and model
+            deadline_seconds: Stop analyzing after this many seconds (no time limit if None)
             
         Returns:
             DataFrame with analysis results or None if failed
         """
-        try:
-            photos_dir = self.config.PHOTOS_DIR / calendar_week
-            csv_file = self.config.COST_FILES_DIR / f"{calendar_week}_costs.csv"
-            
-            if not photos_dir.exists():
-                print(f"Error: Directory {photos_dir} does not exist!")
-                return None
+        return self.run_week_analysis(calendar_week, file_names, incremental, priority, use_cache,
+                                      deadline_seconds)['results']
+    
+    def run_week_analysis(self, calendar_week: str,
+                          file_names: Optional[Iterable[str]] = None,
+                          incremental: bool = False,
+                          priority: str = 'api',
+                          use_cache: bool = True,
+                          deadline_seconds: Optional[float] = None,
+                          journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """
+        Analyze the receipt photos of a calendar week and report the outcome per photo
+        
+        A call for the same photos with the same incremental, priority and use_cache
+        options while a run of them is in progress in this process joins that run and
+        reports its outcome instead of analyzing them again. The joined run keeps its own
+        deadline; the deadline of the joining call only bounds how long it waits.
+        
+        With a deadline every AI call times out at the latest when the deadline passes;
+        photos not analyzed by then are reported as unfinished and the status is partial.
+        
+        Every raw AI response and finished photo is journaled as the run goes, so an
+        interrupted run can be continued with resume_run.
+        
+        Args:
+            calendar_week: Calendar week in format 2025CW_XX
+            file_names: Only analyze these photo files of the week (all if None)
+            incremental: Skip photos whose unchanged content is already in the results
+            priority: Priority class of the AI calls (interactive, api or backfill)
+            use_cache: Reuse extractions of photos analyzed before with the same prompt and model
+            deadline_seconds: Stop analyzing after this many seconds (no time limit if None)
+            journal_run: Continue this journaled run instead of starting a new one (see resume_run)
             
-            # Ensure cost_files directory exists
-            self.config.COST_FILES_DIR.mkdir(parents=True, exist_ok=True)
+        Returns:
+            Dictionary with 'status' (completed/partial/failed), 'results' (DataFrame or None),
+            'files' (photo name -> analyzed/unchanged/duplicate/quarantined/rejected/failed/unfinished),
+            'unfinished_files' (to resume), 'rejected_files' (photo name -> reason it was not sent
+            to the AI), 'run_id' of the journal, 'error' and 'coalesced'
+            (True if this call joined a run of the same photos that was already in progress)
+        """
+        with self.tracer.span('analyze_week', week=calendar_week, priority=priority, incremental=incremental,
+                              use_cache=use_cache, deadline_seconds=deadline_seconds) as span:
+            report = self._analyze_week(calendar_week, file_names, incremental, priority, use_cache,
+                                        deadline_seconds, journal_run)
+            outcomes = list(report['files'].values())
+            span.set(status=report['status'], error=report['error'], run_id=report['run_id'],
+                     coalesced=report['coalesced'], files=len(outcomes),
+                     **{outcome: outcomes.count(outcome) for outcome in set(outcomes)})
+        return report
+    
+    def _analyze_week(self, calendar_week: str, file_names: Optional[Iterable[str]], incremental: bool,
+                      priority: str, use_cache: bool, deadline_seconds: Optional[float],
+                      journal_run: Optional[JournalRun]) -> Dict[str, Any]:
+        """Validate the arguments of run_week_analysis and run the week or join its run in progress"""
+        report = {'calendar_week': calendar_week, 'status': 'failed', 'results': None, 'files': {}, 'error': None,
+                  'unfinished_files': [], 'rejected_files': {}, 'run_id': None, 'coalesced': False}
+        try:
+            report['error'] = self._week_arguments_error(calendar_week, priority, deadline_seconds)
+            if report['error']:
+                print(f"Error: {report['error']}")
+                return report
             
-            # Process each image file
-            for image_file in photos_dir.iterdir():
-                if self._is_supported_image(image_file):
-                    self._process_single_receipt(image_file, csv_file)
+            deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+            selected = frozenset(file_names) if file_names is not None else None
             
-            # Read and return final results
-            if csv_file.exists():
-                df_total = pd.read_csv(csv_file, sep=";")
-                return self._process_results(df_total)
+            # Join a run of the same photos already in flight (web form and API at once) instead of repeating it
+            key = self._week_run_key(calendar_week, selected, incremental, priority, use_cache)
+            try:
+                outcome, report['coalesced'] = week_runs.do(
+                    key, lambda: self._run_week(calendar_week, selected, incremental, priority, use_cache,
+                                                deadline, journal_run),
+                    timeout=deadline_seconds)
+                if report['coalesced']:
+                    print(f"Joined the analysis of {calendar_week} already in progress")
+            except TimeoutError:
+                # The joined run is still going, none of its photos is finished for this call
+                print(f"Deadline reached while waiting for the analysis of {calendar_week} in progress")
+                report['coalesced'] = True
+                outcome = self._unfinished_week(calendar_week, selected)
             
-            return None
+            self._complete_week_report(report, outcome)
             
         except Exception as e:
+            report['error'] = str(e)
             print(f"Error during analysis: {e}")
-            return None
+        
+        return report
     
-    def _is_supported_image(self, file_path: Path) -> bool:
-        """Check if file is a supported image format"""
-        return file_path.is_file() and file_path.suffix.lower() in self.config.SUPPORTED_IMAGE_EXTENSIONS
+    def _week_arguments_error(self, calendar_week: str, priority: str,
+                              deadline_seconds: Optional[float]) -> Optional[str]:
+        """Check the arguments of a week analysis, returns the error or None"""
+        if not is_calendar_week(calendar_week):
+            return f"Invalid calendar week {calendar_week!r}, expected format 2025CW_XX"
+        if priority not in PRIORITY_CLASSES:
+            return f"Invalid priority {priority!r}, expected one of {', '.join(PRIORITY_CLASSES)}"
+        photos_dir = self.config.PHOTOS_DIR / calendar_week
+        if not photos_dir.exists():
+            return f"Directory {photos_dir} does not exist!"
+        if deadline_seconds is not None and deadline_seconds <= 0:
+            return f"Invalid deadline {deadline_seconds}, expected a positive number of seconds"
+        return None
+    
+    @staticmethod
+    def _complete_week_report(report: Dict[str, Any], outcome: Dict[str, Any]):
+        """Fill a week analysis report from the outcome of its run"""
+        report['files'] = dict(outcome['files'])
+        report['rejected_files'] = dict(outcome.get('rejected', {}))
+        report['run_id'] = outcome.get('run_id')
+        if outcome['results'] is not None:
+            report['results'] = outcome['results'].copy() if report['coalesced'] else outcome['results']
+        report['unfinished_files'] = [name for name, state in report['files'].items() if state == 'unfinished']
+        report['status'] = 'partial' if report['unfinished_files'] else 'completed'
+    
+    def _run_week(self, calendar_week: str, selected: Optional[frozenset], incremental: bool,
+                  priority: str, use_cache: bool, deadline: Optional[float] = None,
+                  journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """Analyze the photos of a calendar week, returns 'files' outcomes, 'rejected' reasons, final 'results' and 'run_id'"""
+        photos, journal_run, known_hashes = self._start_week_run(calendar_week, selected, incremental, use_cache,
+                                                                 journal_run)
+        files = {}
+        rejected = {}
+        
+        try:
+            # Process each image file
+            for photo in photos:
+                if deadline is not None and time.monotonic() >= deadline:
+                    files[photo['name']] = 'unfinished'
+                    continue
+                # Garbage never costs an AI call
+                reason = self._check_intake(Path(photo['path']))
+                if reason is not None:
+                    files[photo['name']] = 'rejected'
+                    rejected[photo['name']] = reason
+                    journal_run.record_done(photo['name'], 'rejected')
+                    continue
+                files[photo['name']] = self._process_single_receipt(
+                    Path(photo['path']), calendar_week, known_hashes.get(photo['name']), priority, use_cache,
+                    deadline, journal_run)
+                journal_run.record_done(photo['name'], files[photo['name']])
+            
+            journal_run.finish('partial' if journal_run.remaining_files() else 'completed')
+        finally:
+            # Without an end in the journal a crashed run shows up as interrupted
+            self.journal.release(journal_run)
+        
+        return self._week_outcome(calendar_week, files, rejected, journal_run)
     
-    def _process_single_receipt(self, image_path: Path, csv_file: Path):
-        """Process a single receipt image"""
+    def _start_week_run(self, calendar_week: str, selected: Optional[frozenset], incremental: bool,
+                        use_cache: bool, journal_run: Optional[JournalRun]):
+        """Get the photos of a week run, its journal and the known hashes for incremental runs"""
+        # Ensure cost_files directory exists
+        self.config.COST_FILES_DIR.mkdir(parents=True, exist_ok=True)
+        
+        photos = [photo for photo in self.manifest.get_photos(calendar_week)
+                  if selected is None or photo['name'] in selected]
+        if journal_run is None:
+            journal_run = self.journal.start(calendar_week, [photo['name'] for photo in photos],
+                                             {'incremental': incremental, 'use_cache': use_cache,
+                                              'prompt_version': self.config.PROMPT_VERSION,
+                                              'model': self.config.GEMINI_MODEL})
+        # The run id leads from the journal to the trace of the run
+        self.tracer.current().set(run_id=journal_run.run_id)
+        
+        known_hashes = self._get_known_hashes(calendar_week) if incremental else {}
+        return photos, journal_run, known_hashes
+    
+    def _week_outcome(self, calendar_week: str, files: Dict[str, str], rejected: Dict[str, str],
+                      journal_run: JournalRun) -> Dict[str, Any]:
+        """Read the final results of a week run, returns the outcome of _run_week"""
+        with self.tracer.span('read_results', week=calendar_week) as span:
+            df_total = self.results.read(calendar_week)
+            span.set(rows=len(df_total) if df_total is not None else 0)
+        return {'files': files, 'rejected': rejected,
+                'results': self._process_results(df_total) if df_total is not None else None,
+                'run_id': journal_run.run_id}
+    
+    def resume_run(self, run_id: str, priority: str = 'backfill',
+                   deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Continue an interrupted or partial week analysis run from its journal
+        
+        Finished photos are skipped, journaled AI responses are stored without calling
+        the AI again and only the remaining photos are sent to the AI.
+        
+        Args:
+            run_id: Id of the run (run_id of its report)
+            priority: Priority class of the AI calls (interactive, api or backfill)
+            deadline_seconds: Stop analyzing after this many seconds (no time limit if None)
+            
+        Returns:
+            Report like run_week_analysis, with the outcomes of all photos of the run
+        """
+        report = {'calendar_week': None, 'status': 'failed', 'results': None, 'files': {}, 'error': None,
+                  'unfinished_files': [], 'rejected_files': {}, 'run_id': run_id, 'coalesced': False}
+        try:
+            journal_run = self.journal.resume(run_id)
+        except (KeyError, ValueError) as e:
+            report['error'] = str(e.args[0])
+            print(f"Error: {report['error']}")
+            return report
+        
+        span, token = self.tracer.start_span('resume_run', run_id=run_id, week=journal_run.calendar_week,
+                                             journaled_responses=len(journal_run.responses))
         try:
-            print(f"Analyzing receipt: {image_path.name}")
+            # Photos deleted since the run started can't be analyzed anymore
+            existing = {photo['name'] for photo in self.manifest.get_photos(journal_run.calendar_week)}
+            for name in journal_run.remaining_files():
+                if name not in existing:
+                    journal_run.record_done(name, 'removed')
             
-            # Read image file
+            finished = dict(journal_run.done)
+            remaining = journal_run.remaining_files()
+            print(f"Resuming {run_id}: {len(remaining)} of {len(journal_run.files)} photos left, "
+                  f"{len(journal_run.responses)} AI responses journaled")
+            
+            report = self.run_week_analysis(journal_run.calendar_week, remaining,
+                                            journal_run.options.get('incremental', False), priority,
+                                            journal_run.options.get('use_cache', True), deadline_seconds,
+                                            journal_run=journal_run)
+            report['files'] = {**finished, **report['files']}
+            report['run_id'] = run_id
+            span.set(status=report['status'], remaining=len(remaining))
+        finally:
+            self.journal.release(journal_run)
+            self.tracer.end_span(span, token)
+        
+        return report
+    
+    def _week_run_key(self, calendar_week: str, selected: Optional[frozenset], incremental: bool,
+                      priority: str, use_cache: bool) -> tuple:
+        """
+        Key of a week run for coalescing, the options that change what the run does
+
+        The deadline is left out: a joining call waits at most until its own deadline
+        for a run that goes on until the deadline of the call that started it.
+        """
+        return (str(self.config.PHOTOS_DIR / calendar_week), selected, incremental, priority, use_cache)
+    
+    def _unfinished_week(self, calendar_week: str, selected: Optional[frozenset]) -> Dict[str, Any]:
+        """Outcome of a week whose photos are all unfinished, with the results stored so far"""
+        files = {photo['name']: 'unfinished' for photo in self.manifest.get_photos(calendar_week)
+                 if selected is None or photo['name'] in selected}
+        df_total = self.results.read(calendar_week)
+        return {'files': files, 'results': self._process_results(df_total) if df_total is not None else None}
+    
+    def _get_known_hashes(self, calendar_week: str) -> Dict[str, str]:
+        """Get image hashes of the photos already in the results of a calendar week"""
+        df = self.results.read(calendar_week)
+        if df is None or "Bild_Hash" not in df.columns:
+            return {}
+        
+        df = df.dropna(subset=["Bild_Hash"])
+        return dict(zip(df["Foto_Datei"], df["Bild_Hash"]))
+    
+    def _process_single_receipt(self, image_path: Path, calendar_week: str,
+                                known_hash: Optional[str] = None, priority: str = 'api',
+                                use_cache: bool = True, deadline: Optional[float] = None,
+                                journal_run: Optional[JournalRun] = None) -> str:
+        """
+        Process a single receipt image
+        
+        Returns:
+            Outcome of the photo: analyzed, unchanged, duplicate, quarantined, failed or
+            unfinished (deadline passed); photos are checked with _check_intake before
+        """
+        with self.tracer.span('process_photo', week=calendar_week, file=image_path.name) as span:
+            try:
+                # Unchanged photos are hashed in chunks (not at all if memoized) instead of read whole
+                if known_hash is not None and self.file_hashes.get(image_path) == known_hash:
+                    outcome = 'unchanged'
+                else:
+                    image_bytes, image_hash = self._read_photo(image_path)
+                    outcome = self._analyze_receipt(image_bytes, image_hash, image_path.name, calendar_week,
+                                                    priority, use_cache, deadline=deadline,
+                                                    journal_run=journal_run)['outcome']
+                
+            except TimeoutError:
+                print(f"Deadline reached before {image_path.name} was analyzed")
+                outcome = 'unfinished'
+            except Exception as e:
+                print(f"Error processing {image_path.name}: {e}")
+                span.fail(e)
+                outcome = 'failed'
+            
+            span.set(outcome=outcome)
+            return outcome
+    
+    def _read_photo(self, image_path: Path):
+        """Read a photo, once, for hashing, preprocessing and the AI call, returns its bytes and hash"""
+        with self.tracer.span('read_photo', file=image_path.name) as span:
             with open(image_path, "rb") as img_file:
                 image_bytes = img_file.read()
+            image_hash = hashlib.sha256(image_bytes).hexdigest()
+            span.set(bytes=len(image_bytes))
+        self.file_hashes.remember(image_path, image_hash)
+        return image_bytes, image_hash
+    
+    def analyze_image(self, image_bytes: bytes, file_name: str, calendar_week: Optional[str] = None,
+                      priority: str = 'interactive', use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Analyze one uploaded receipt photo, optionally filing it into a calendar week
+        
+        Args:
+            image_bytes: Content of the photo
+            file_name: File name of the photo
+            calendar_week: Store the photo and its result in this calendar week (only analyze if None)
+            priority: Priority class of the AI call (interactive, api or backfill)
+            use_cache: Answer from the extraction cache if the photo was analyzed before
             
-            # Analyze with Gemini AI
-            response = self.model.generate_content([
-                self.config.PROMPT_TEXT,
-                {"mime_type": "image/jpeg", "data": image_bytes}
-            ])
-            
-            # Process AI response
-            temp_answer = response.text
-            cw_dataset = temp_answer.replace(",", ".") + ";" + image_path.name
+        Returns:
+            Dictionary with 'outcome' (analyzed/duplicate/quarantined), 'record' (result row or None),
+            'cached', 'image_hash', 'duplicate_of' and 'error'
             
+        Raises:
+            IntakeError: If the photo is empty, too large, mislabelled, truncated or no supported image
+            FileExistsError: If the calendar week has a different photo with the same file name
+        """
+        image_hash, phash = self._ingest_image(image_bytes, file_name, calendar_week)
+        return self._analyze_receipt(image_bytes, image_hash, file_name, calendar_week, priority, use_cache, phash)
+    
+    def _ingest_image(self, image_bytes: bytes, file_name: str, calendar_week: Optional[str]):
+        """Check an uploaded photo and store it in its calendar week, returns its hash and perceptual hash"""
+        # Rejects garbage before anything is stored or sent to the AI
+        inspect_image_bytes(image_bytes, file_name, self.config)
+        image_hash = hashlib.sha256(image_bytes).hexdigest()
+        # Fails for data that is no image, before anything is stored
+        phash = compute_dhash(image_bytes)
+        
+        if calendar_week is not None:
+            image_path = self.config.PHOTOS_DIR / calendar_week / file_name
+            if image_path.exists() and self.file_hashes.get(image_path) != image_hash:
+                raise FileExistsError(f"{calendar_week} already has a different photo named {file_name}")
+            if not image_path.exists():
+                with atomic_write(image_path, "wb") as f:
+                    f.write(image_bytes)
+            self.file_hashes.remember(image_path, image_hash)
+        return image_hash, phash
+    
+    def _analyze_receipt(self, image_bytes: bytes, image_hash: str, file_name: str,
+                         calendar_week: Optional[str], priority: str, use_cache: bool,
+                         phash: Optional[int] = None, deadline: Optional[float] = None,
+                         journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """
+        Extract the result row of a receipt photo and file it into its calendar week
+        
+        Without a calendar week nothing is stored except the extraction cache entry.
+        """
+        with self.tracer.span('analyze_receipt', week=calendar_week, file=file_name, bytes=len(image_bytes)) as span:
+            result = self._file_receipt(image_bytes, image_hash, file_name, calendar_week, priority, use_cache,
+                                        phash, deadline, journal_run)
+            span.set(outcome=result['outcome'], cache_hit=result['cached'], duplicate_of=result['duplicate_of'],
+                     error=result['error'])
+        return result
+    
+    def _file_receipt(self, image_bytes: bytes, image_hash: str, file_name: str,
+                      calendar_week: Optional[str], priority: str, use_cache: bool,
+                      phash: Optional[int] = None, deadline: Optional[float] = None,
+                      journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """Steps of _analyze_receipt, returns its result"""
+        result, phash, extraction = self._prepare_receipt(image_bytes, image_hash, file_name, calendar_week,
+                                                          use_cache, phash)
+        if result['outcome'] == 'duplicate':
+            return result
+        
+        shared = False
+        if extraction is None:
+            # The same content may be in an AI call right now (same photo in two weeks or uploads)
+            extraction, shared = extraction_runs.do(
+                self.extractions.key(image_hash),
+                lambda: self._extract_receipt(image_bytes, image_hash, file_name, priority, use_cache,
+                                              deadline, journal_run),
+                timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+        return self._file_extraction(result, extraction, shared, file_name, calendar_week, phash)
+    
+    def _prepare_receipt(self, image_bytes: bytes, image_hash: str, file_name: str,
+                         calendar_week: Optional[str], use_cache: bool, phash: Optional[int]):
+        """
+        Steps of a receipt before its extraction: thumbnail, duplicate check and extraction cache
+        
+        Returns:
+            The result so far (outcome 'duplicate' if it is skipped), the perceptual hash and the
+            cached extraction (None if the AI has to be called)
+        """
+        result = {'outcome': 'analyzed', 'record': None, 'cached': False, 'image_hash': image_hash,
+                  'duplicate_of': None, 'error': None}
+        
+        if calendar_week is not None and self.config.THUMBNAILS_ON_INGEST:
+            self._create_thumbnail(file_name, image_bytes, image_hash)
+        
+        # Look for an already analyzed photo of the same receipt
+        with self.tracer.span('duplicate_check', file=file_name) as span:
+            if phash is None:
+                phash = compute_dhash(image_bytes)
+            near_duplicates = self.duplicates.find_near_duplicates(phash, calendar_week, file_name)
+            span.set(near_duplicates=len(near_duplicates))
+        if near_duplicates:
+            original = near_duplicates[0]
+            result['duplicate_of'] = f"{original['calendar_week']}/{original['foto_datei']}"
+            print(f"{file_name} looks like {result['duplicate_of']} (distance {original['distance']})")
+            if self.config.SKIP_NEAR_DUPLICATES:
+                result['outcome'] = 'duplicate'
+                return result, phash, None
+        
+        # The same photo content with the same prompt and model was analyzed before
+        return result, phash, self._lookup_extraction(image_hash, file_name, use_cache, None)
+    
+    def _file_extraction(self, result: Dict[str, Any], extraction: Dict[str, Any], shared: bool,
+                         file_name: str, calendar_week: Optional[str], phash: int) -> Dict[str, Any]:
+        """Steps of a receipt after its extraction: quarantine or store the result row, returns the result"""
+        image_hash = result['image_hash']
+        # Only the call that sent the photo accounts for its usage, like a cache hit
+        usage = {} if shared else extraction['usage']
+        result['cached'] = shared or extraction['cached']
+        
+        # Quarantine the AI response if it is not a single valid record
+        if extraction['error'] is not None:
+            print(f"Quarantined {file_name}: {extraction['error']}")
+            if calendar_week is not None:
+                self.quarantine.add(calendar_week, file_name, image_hash, extraction['raw_response'],
+                                    extraction['error'], usage)
+            result.update(outcome='quarantined', error=extraction['error'])
+            return result
+        record = dict(extraction['record'])
+        
+        record["Foto_Datei"] = file_name
+        record["Bild_Hash"] = image_hash
+        record["Duplikat_Von"] = result['duplicate_of']
+        # Cached extractions are keyed by prompt and model, so they match the configured versions too
+        record["Prompt_Version"] = self.config.PROMPT_VERSION
+        record["Analyse_Modell"] = self.config.GEMINI_MODEL
+        record.update(usage)
+        result['record'] = record
+        
+        if calendar_week is not None:
             # Save to CSV
-            self._save_to_csv(cw_dataset, csv_file)
-            
+            with self.tracer.span('store_result', week=calendar_week, file=file_name):
+                self.results.upsert(calendar_week, [record])
+                self.quarantine.remove(calendar_week, file_name)
+                self.duplicates.add(phash, calendar_week, file_name, image_hash)
+        return result
+    
+    def _extract_receipt(self, image_bytes: bytes, image_hash: str, file_name: str,
+                         priority: str, use_cache: bool, deadline: Optional[float] = None,
+                         journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """
+        Send a photo to the AI and validate the response
+        
+        Returns:
+            Dictionary with the parsed 'record' (None if invalid), 'raw_response', 'usage',
+            the validation 'error' and 'cached'
+        """
+        extraction = self._lookup_extraction(image_hash, file_name, use_cache, journal_run)
+        if extraction is not None:
+            return extraction
+        
+        print(f"Analyzing receipt: {file_name}")
+        
+        # Analyze with Gemini AI, limited to AI_MAX_CONCURRENCY parallel calls
+        with self.tracer.span('ai_call', file=file_name, bytes=len(image_bytes), priority=priority) as span:
+            raw_response, usage = self.backend.extract(image_bytes, priority=priority, deadline=deadline)
+            span.set(**self._usage_attributes(usage))
+        if journal_run is not None:
+            journal_run.record_response(file_name, image_hash, raw_response, usage)
+        return self._parse_extraction(image_hash, raw_response, usage)
+    
+    def _lookup_extraction(self, image_hash: str, file_name: str, use_cache: bool,
+                           journal_run: Optional[JournalRun]) -> Optional[Dict[str, Any]]:
+        """Get the extraction of a photo from the cache or the journal of a resumed run, None to call the AI"""
+        # An extraction of the same content may have finished since the caller looked
+        cached = self.extractions.get(image_hash) if use_cache else None
+        if cached is not None:
+            return {'record': cached['record'], 'raw_response': None, 'usage': {}, 'error': None, 'cached': True}
+        
+        # A resumed run got the answer before it was interrupted, unless the prompt or model changed since
+        journaled = None
+        if journal_run is not None and self._same_version(journal_run.options):
+            journaled = journal_run.response(image_hash)
+        if journaled is None:
+            return None
+        print(f"Replaying journaled AI response of {file_name}")
+        self.tracer.current().set(journal_replay=True)
+        return self._parse_extraction(image_hash, journaled['raw_response'], journaled['usage'])
+    
+    def _parse_extraction(self, image_hash: str, raw_response: str, usage: Dict[str, Any]) -> Dict[str, Any]:
+        """Validate an AI response and cache the extracted record, returns the extraction"""
+        try:
+            record = parse_receipt_response(raw_response)
+        except ResponseParseError as e:
+            return {'record': None, 'raw_response': raw_response, 'usage': usage, 'error': str(e), 'cached': False}
+        
+        self.extractions.put(image_hash, record, usage)
+        return {'record': record, 'raw_response': raw_response, 'usage': usage, 'error': None, 'cached': False}
+    
+    @staticmethod
+    def _usage_attributes(usage: Dict[str, Any]) -> Dict[str, Any]:
+        """Span attributes of the usage of an AI call"""
+        return {'model': usage.get("Modell"), 'latency_ms': usage.get("Latenz_ms"),
+                'wait_ms': usage.get("Wartezeit_ms"), 'retries': usage.get("Wiederholungen"),
+                'prompt_tokens': usage.get("Prompt_Tokens"), 'response_tokens': usage.get("Antwort_Tokens")}
+    
+    def _same_version(self, options: Dict[str, Any]) -> bool:
+        """Check if a journaled run used the configured prompt version and model (journals without them did)"""
+        return (options.get('prompt_version', self.config.PROMPT_VERSION) == self.config.PROMPT_VERSION
+                and options.get('model', self.config.GEMINI_MODEL) == self.config.GEMINI_MODEL)
+    
+    def _check_intake(self, image_path: Path) -> Optional[str]:
+        """Check a photo from its header before it is read for analysis, returns why it is rejected or None"""
+        with self.tracer.span('intake', file=image_path.name) as span:
+            try:
+                info = inspect_image(image_path, self.config)
+            except IntakeError as e:
+                print(f"Rejected {image_path.name}: {e}")
+                span.set(rejected=e.reason)
+                return str(e)
+            except OSError:
+                # Left to the analysis of the photo, which reports it as failed
+                return None
+            span.set(format=info['format'], bytes=info['size'], width=info['width'], height=info['height'])
+            return None
+    
+    def _create_thumbnail(self, file_name: str, image_bytes: bytes, image_hash: str):
+        """Create the web preview of a photo while its content is in memory anyway"""
+        try:
+            with self.tracer.span('thumbnail', file=file_name):
+                self.thumbnails.create_thumbnail(image_bytes, image_hash)
         except Exception as e:
-            print(f"Error processing {image_path.name}: {e}")
+            print(f"Could not create thumbnail of {file_name}: {e}")
+    
+    async def run_week_analysis_async(self, calendar_week: str,
+                                      file_names: Optional[Iterable[str]] = None,
+                                      incremental: bool = False,
+                                      priority: str = 'api',
+                                      use_cache: bool = True,
+                                      deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Analyze the receipt photos of a calendar week on the event loop, like run_week_analysis
+        
+        All photos of the week are in progress at once, up to ASYNC_MAX_IN_FLIGHT per event loop;
+        AI calls still take turns for the AI_MAX_CONCURRENCY slots by priority. Waiting for a
+        slot or an AI response holds no thread, file and CSV work runs in the default executor.
+        Coalesces with async runs of the same photos on the same event loop only.
+        
+        Returns:
+            Report like run_week_analysis
+        """
+        with self.tracer.span('analyze_week', week=calendar_week, priority=priority, incremental=incremental,
+                              use_cache=use_cache, deadline_seconds=deadline_seconds, mode='async') as span:
+            report = {'calendar_week': calendar_week, 'status': 'failed', 'results': None, 'files': {},
+                      'error': None, 'unfinished_files': [], 'rejected_files': {}, 'run_id': None,
+                      'coalesced': False}
+            try:
+                report['error'] = await asyncio.to_thread(self._week_arguments_error, calendar_week, priority,
+                                                          deadline_seconds)
+                if report['error']:
+                    print(f"Error: {report['error']}")
+                else:
+                    deadline = time.monotonic() + deadline_seconds if deadline_seconds is not None else None
+                    selected = frozenset(file_names) if file_names is not None else None
+                    key = self._week_run_key(calendar_week, selected, incremental, priority, use_cache)
+                    try:
+                        outcome, report['coalesced'] = await async_week_runs.do(
+                            key, lambda: self._run_week_async(calendar_week, selected, incremental, priority,
+                                                              use_cache, deadline),
+                            timeout=deadline_seconds)
+                    except TimeoutError:
+                        print(f"Deadline reached while waiting for the analysis of {calendar_week} in progress")
+                        report['coalesced'] = True
+                        outcome = await asyncio.to_thread(self._unfinished_week, calendar_week, selected)
+                    self._complete_week_report(report, outcome)
+            except Exception as e:
+                report['error'] = str(e)
+                print(f"Error during analysis: {e}")
+            
+            outcomes = list(report['files'].values())
+            span.set(status=report['status'], error=report['error'], run_id=report['run_id'],
+                     coalesced=report['coalesced'], files=len(outcomes),
+                     **{outcome: outcomes.count(outcome) for outcome in set(outcomes)})
+        return report
+    
+    async def _run_week_async(self, calendar_week: str, selected: Optional[frozenset], incremental: bool,
+                              priority: str, use_cache: bool, deadline: Optional[float]) -> Dict[str, Any]:
+        """Analyze the photos of a calendar week concurrently, returns the outcome like _run_week"""
+        photos, journal_run, known_hashes = await asyncio.to_thread(
+            self._start_week_run, calendar_week, selected, incremental, use_cache, None)
+        
+        try:
+            outcomes = await asyncio.gather(*(
+                self._process_photo_async(photo, calendar_week, known_hashes.get(photo['name']), priority,
+                                          use_cache, deadline, journal_run)
+                for photo in photos))
+            await asyncio.to_thread(journal_run.finish, 'partial' if journal_run.remaining_files() else 'completed')
+        finally:
+            self.journal.release(journal_run)
+        
+        # Outcomes in the order of the photos, as the sync run reports them
+        files = {photo['name']: outcome for photo, (outcome, _) in zip(photos, outcomes)}
+        rejected = {photo['name']: reason for photo, (_, reason) in zip(photos, outcomes) if reason is not None}
+        return await asyncio.to_thread(self._week_outcome, calendar_week, files, rejected, journal_run)
+    
+    async def _process_photo_async(self, photo: Dict[str, Any], calendar_week: str, known_hash: Optional[str],
+                                   priority: str, use_cache: bool, deadline: Optional[float],
+                                   journal_run: JournalRun):
+        """Check and analyze one photo of a week run, returns its outcome and the reason it was rejected"""
+        image_path = Path(photo['path'])
+        reason = None
+        async with self._async_slot():
+            if deadline is not None and time.monotonic() >= deadline:
+                return 'unfinished', None
+            # Garbage never costs an AI call
+            reason = await asyncio.to_thread(self._check_intake, image_path)
+            if reason is not None:
+                outcome = 'rejected'
+            else:
+                outcome = await self._process_single_receipt_async(image_path, calendar_week, known_hash,
+                                                                   priority, use_cache, deadline, journal_run)
+        await asyncio.to_thread(journal_run.record_done, photo['name'], outcome)
+        return outcome, reason
+    
+    async def _process_single_receipt_async(self, image_path: Path, calendar_week: str,
+                                            known_hash: Optional[str], priority: str, use_cache: bool,
+                                            deadline: Optional[float], journal_run: JournalRun) -> str:
+        """Process a single receipt image on the event loop, returns its outcome like _process_single_receipt"""
+        with self.tracer.span('process_photo', week=calendar_week, file=image_path.name) as span:
+            try:
+                if known_hash is not None and await asyncio.to_thread(self.file_hashes.get, image_path) == known_hash:
+                    outcome = 'unchanged'
+                else:
+                    image_bytes, image_hash = await asyncio.to_thread(self._read_photo, image_path)
+                    outcome = (await self._analyze_receipt_async(image_bytes, image_hash, image_path.name,
+                                                                 calendar_week, priority, use_cache,
+                                                                 deadline=deadline,
+                                                                 journal_run=journal_run))['outcome']
+            except TimeoutError:
+                print(f"Deadline reached before {image_path.name} was analyzed")
+                outcome = 'unfinished'
+            except Exception as e:
+                print(f"Error processing {image_path.name}: {e}")
+                span.fail(e)
+                outcome = 'failed'
+            
+            span.set(outcome=outcome)
+            return outcome
+    
+    async def analyze_image_async(self, image_bytes: bytes, file_name: str, calendar_week: Optional[str] = None,
+                                  priority: str = 'interactive', use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Analyze one uploaded receipt photo on the event loop, like analyze_image
+        
+        Raises:
+            IntakeError: If the photo is empty, too large, mislabelled, truncated or no supported image
+            FileExistsError: If the calendar week has a different photo with the same file name
+        """
+        async with self._async_slot():
+            image_hash, phash = await asyncio.to_thread(self._ingest_image, image_bytes, file_name, calendar_week)
+            return await self._analyze_receipt_async(image_bytes, image_hash, file_name, calendar_week, priority,
+                                                     use_cache, phash)
+    
+    async def _analyze_receipt_async(self, image_bytes: bytes, image_hash: str, file_name: str,
+                                     calendar_week: Optional[str], priority: str, use_cache: bool,
+                                     phash: Optional[int] = None, deadline: Optional[float] = None,
+                                     journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """Extract and file a receipt photo like _analyze_receipt, awaiting the AI call"""
+        with self.tracer.span('analyze_receipt', week=calendar_week, file=file_name, bytes=len(image_bytes)) as span:
+            result, phash, extraction = await asyncio.to_thread(
+                self._prepare_receipt, image_bytes, image_hash, file_name, calendar_week, use_cache, phash)
+            if result['outcome'] != 'duplicate':
+                shared = False
+                if extraction is None:
+                    # Coalesces with extractions of the same content on this event loop
+                    extraction, shared = await async_extraction_runs.do(
+                        self.extractions.key(image_hash),
+                        lambda: self._extract_receipt_async(image_bytes, image_hash, file_name, priority,
+                                                            use_cache, deadline, journal_run),
+                        timeout=max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+                result = await asyncio.to_thread(self._file_extraction, result, extraction, shared, file_name,
+                                                 calendar_week, phash)
+            span.set(outcome=result['outcome'], cache_hit=result['cached'], duplicate_of=result['duplicate_of'],
+                     error=result['error'])
+        return result
+    
+    async def _extract_receipt_async(self, image_bytes: bytes, image_hash: str, file_name: str,
+                                     priority: str, use_cache: bool, deadline: Optional[float] = None,
+                                     journal_run: Optional[JournalRun] = None) -> Dict[str, Any]:
+        """Send a photo to the AI with the async client and validate the response, like _extract_receipt"""
+        extraction = await asyncio.to_thread(self._lookup_extraction, image_hash, file_name, use_cache, journal_run)
+        if extraction is not None:
+            return extraction
+        
+        print(f"Analyzing receipt: {file_name}")
+        
+        with self.tracer.span('ai_call', file=file_name, bytes=len(image_bytes), priority=priority) as span:
+            raw_response, usage = await self.backend.extract_async(image_bytes, priority=priority, deadline=deadline)
+            span.set(**self._usage_attributes(usage))
+        if journal_run is not None:
+            await asyncio.to_thread(journal_run.record_response, file_name, image_hash, raw_response, usage)
+        return await asyncio.to_thread(self._parse_extraction, image_hash, raw_response, usage)
+    
+    def _async_slot(self) -> asyncio.Semaphore:
+        """Semaphore limiting the receipts in progress on the running event loop to ASYNC_MAX_IN_FLIGHT"""
+        loop = asyncio.get_running_loop()
+        slots = self._async_slots.get(loop)
+        if slots is None:
+            slots = self._async_slots[loop] = asyncio.Semaphore(self.config.ASYNC_MAX_IN_FLIGHT)
+        return slots
     
-    def _save_to_csv(self, cw_dataset: str, csv_file: Path):
-        """Save analysis result to CSV file"""
-        columns = ["Datum", "Uhrzeit", "Summe_Food", "Summe_NonFood", "Foto_Datei"]
+    def reanalyze_quarantined(self, calendar_week: str, priority: str = 'api') -> Optional[pd.DataFrame]:
+        """
+        Re-run the AI analysis only for the quarantined receipts of a calendar week
         
-        # Create new row DataFrame
-        new_row_data = cw_dataset.split(";")
-        df_new = pd.DataFrame([new_row_data], columns=columns)
+        Args:
+            calendar_week: Calendar week in format 2025CW_XX
+            priority: Priority class of the AI calls (interactive, api or backfill)
+            
+        Returns:
+            DataFrame with all analysis results of the week or None if failed
+        """
+        entries = self.quarantine.load(calendar_week)
+        if not entries:
+            print(f"No quarantined receipts for {calendar_week}")
+            return None
         
-        if csv_file.exists():
-            # Append to existing file
-            df_old = pd.read_csv(csv_file, sep=";")
-            df_all = pd.concat([df_old, df_new], ignore_index=True)
-        else:
-            # Create new file
-            df_all = df_new
+        photos_dir = self.config.PHOTOS_DIR / calendar_week
+        for file_name in list(entries):
+            if not (photos_dir / file_name).is_file():
+                print(f"Photo {file_name} no longer exists, releasing it from quarantine")
+                self.quarantine.remove(calendar_week, file_name)
+                del entries[file_name]
         
-        # Save to CSV
-        df_all.to_csv(csv_file, sep=";", index=False)
+        print(f"Re-analyzing {len(entries)} quarantined receipts of {calendar_week}")
+        return self.analyze_calendar_week(calendar_week, file_names=entries.keys(), priority=priority)
+    
+    def find_outdated(self, calendar_week: str) -> List[Dict[str, Any]]:
+        """
+        Get the result rows of a calendar week produced by another prompt version or model than configured
+        
+        Rows written before the versions were recorded count as LEGACY_PROMPT_VERSION and
+        the model of their AI call (LEGACY_MODEL if they came from the extraction cache).
+        
+        Returns:
+            List of dictionaries with 'foto_datei', 'bild_hash', 'prompt_version' and 'model'
+        """
+        df = self.results.read(calendar_week)
+        if df is None or df.empty:
+            return []
+        
+        def column(name):
+            return df[name] if name in df.columns else pd.Series(None, index=df.index, dtype=object)
+        
+        versions = column("Prompt_Version").fillna(LEGACY_PROMPT_VERSION).astype(str)
+        models = column("Analyse_Modell").fillna(column("Modell")).fillna(LEGACY_MODEL).astype(str)
+        outdated = (versions != self.config.PROMPT_VERSION) | (models != self.config.GEMINI_MODEL)
+        
+        hashes = column("Bild_Hash")
+        return [{'foto_datei': df.at[index, "Foto_Datei"],
+                 'bild_hash': hashes[index] if pd.notna(hashes[index]) else None,
+                 'prompt_version': versions[index], 'model': models[index]}
+                for index in df.index[outdated]]
+    
+    def reanalyze_outdated(self, calendar_week: str, fraction: float = 1.0, priority: str = 'backfill',
+                           deadline_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Re-analyze the rows of a calendar week produced by an outdated prompt version or model
+        
+        Only a stable share of the outdated rows is re-analyzed, chosen by photo content
+        and target version, so a rollout can grow from a small fraction to all rows
+        while the rows already moved stay on the new version.
+        
+        Args:
+            calendar_week: Calendar week in format 2025CW_XX
+            fraction: Share of the outdated rows to re-analyze (0 to 1)
+            priority: Priority class of the AI calls (interactive, api or backfill)
+            deadline_seconds: Stop analyzing after this many seconds (no time limit if None)
+            
+        Returns:
+            Report like run_week_analysis with 'outdated' (outdated rows), 'selected' (photos
+            re-analyzed) and 'missing' (outdated rows whose photo no longer exists)
+        """
+        report = {'calendar_week': calendar_week, 'status': 'completed', 'results': None, 'files': {},
+                  'error': None, 'unfinished_files': [], 'rejected_files': {}, 'run_id': None, 'coalesced': False}
+        target = f"{self.config.PROMPT_VERSION}/{self.config.GEMINI_MODEL}"
+        
+        outdated = self.find_outdated(calendar_week)
+        existing = {photo['name'] for photo in self.manifest.get_photos(calendar_week)}
+        missing = [row['foto_datei'] for row in outdated if row['foto_datei'] not in existing]
+        selected = [row['foto_datei'] for row in outdated if row['foto_datei'] in existing
+                    and in_rollout(row['bild_hash'] or f"{calendar_week}/{row['foto_datei']}", target, fraction)]
+        
+        print(f"{calendar_week}: {len(outdated)} rows not from {target}, re-analyzing {len(selected)}"
+              f"{f', {len(missing)} without photo' if missing else ''}")
+        if selected:
+            report = self.run_week_analysis(calendar_week, selected, priority=priority,
+                                            deadline_seconds=deadline_seconds)
+        report.update(outdated=len(outdated), selected=len(selected), missing=len(missing))
+        return report
     
     def _process_results(self, df: pd.DataFrame) -> pd.DataFrame:
         """Process and clean the results DataFrame"""
@@ -124,23 +928,201 @@ class ReceiptAnalyzer:
     def get_week_summary(self, df: pd.DataFrame) -> Dict[str, Any]:
         """Get summary statistics for a week's analysis"""
         if df is None or df.empty:
-            return {"total_food": 0.0, "total_nonfood": 0.0, "total_receipts": 0}
+            return {"total_food": 0.0, "total_nonfood": 0.0, "total_receipts": 0, "flagged_duplicates": 0}
         
         return {
             "total_food": round(df["Summe_Food"].sum(), 2),
             "total_nonfood": round(df["Summe_NonFood"].sum(), 2),
             "total_receipts": len(df),
+            "flagged_duplicates": int(df["Duplikat_Von"].notna().sum()) if "Duplikat_Von" in df.columns else 0,
             "receipts": df.to_dict('records')
         }
     
-    def get_available_weeks(self) -> List[str]:
-        """Get list of available calendar weeks"""
-        if not self.config.PHOTOS_DIR.exists():
-            return []
+    def plan_week_analysis(self, calendar_week: str,
+                           file_names: Optional[Iterable[str]] = None,
+                           incremental: bool = False,
+                           use_cache: bool = True) -> Dict[str, Any]:
+        """
+        Predict what analyze_calendar_week would do, without contacting the AI
         
-        weeks = []
-        for item in self.config.PHOTOS_DIR.iterdir():
-            if item.is_dir() and item.name.startswith('2025CW_'):
-                weeks.append(item.name)
+        Every photo is classified like _process_single_receipt would treat it:
+        unchanged (already in the results with the same content), duplicate (skipped
+        near-duplicate), cached (extraction cache hit), new, changed (different content
+        than in the results), rejected (fails the intake check) or unsupported (file type
+        that is not analyzed).
         
-        return sorted(weeks)
\ No newline at end of file
+        Args:
+            calendar_week: Calendar week in format 2025CW_XX
+            file_names: Only plan these photo files of the week (all if None)
+            incremental: Skip photos whose unchanged content is already in the results
+            use_cache: Reuse extractions of photos analyzed before with the same prompt and model
+            
+        Returns:
+            Dictionary with 'files' (list of 'foto_datei', 'classification', 'size', 'ai_call'),
+            'counts' per classification, 'planned_calls', 'upload_bytes', 'latencies_ms' of
+            earlier calls of the week and 'error'
+        """
+        plan = {'calendar_week': calendar_week, 'files': [], 'counts': {name: 0 for name in PLAN_CLASSES},
+                'planned_calls': 0, 'upload_bytes': 0, 'latencies_ms': [], 'error': None}
+        
+        photos_dir = self.config.PHOTOS_DIR / calendar_week
+        if not is_calendar_week(calendar_week):
+            plan['error'] = f"Invalid calendar week {calendar_week!r}, expected format 2025CW_XX"
+            return plan
+        if not photos_dir.is_dir():
+            plan['error'] = f"Directory {photos_dir} does not exist!"
+            return plan
+        
+        df = self.results.read(calendar_week)
+        known_hashes = {}
+        if df is not None and "Bild_Hash" in df.columns:
+            known = df.dropna(subset=["Bild_Hash"])
+            known_hashes = dict(zip(known["Foto_Datei"], known["Bild_Hash"]))
+        if df is not None and "Latenz_ms" in df.columns:
+            plan['latencies_ms'] = pd.to_numeric(df["Latenz_ms"], errors='coerce').dropna().tolist()
+        
+        selected = set(file_names) if file_names is not None else None
+        photos = {photo['name']: photo for photo in self.manifest.get_photos(calendar_week)}
+        with os.scandir(photos_dir) as entries:
+            other_files = sorted(entry.name for entry in entries
+                                 if entry.is_file() and not entry.name.startswith(".") and entry.name not in photos)
+        
+        for name in sorted(list(photos) + other_files):
+            if selected is not None and name not in selected:
+                continue
+            photo = photos.get(name)
+            size = photo['size'] if photo else os.path.getsize(photos_dir / name)
+            
+            if photo is None:
+                classification = 'unsupported'
+            elif self._check_intake(Path(photo['path'])) is not None:
+                classification = 'rejected'
+            else:
+                image_path = Path(photo['path'])
+                image_hash = self.file_hashes.get(image_path)
+                known_hash = known_hashes.get(name)
+                if incremental and known_hash == image_hash:
+                    classification = 'unchanged'
+                elif self.config.SKIP_NEAR_DUPLICATES and self._has_near_duplicate(image_path, calendar_week):
+                    classification = 'duplicate'
+                elif use_cache and self.extractions.get(image_hash) is not None:
+                    classification = 'cached'
+                elif known_hash is None:
+                    classification = 'new'
+                elif known_hash != image_hash:
+                    classification = 'changed'
+                else:
+                    # Same content as in the results, analyzed again unless incremental
+                    classification = 'unchanged'
+            
+            ai_call = classification in ('new', 'changed') or (classification == 'unchanged' and not incremental)
+            plan['files'].append({'foto_datei': name, 'classification': classification,
+                                  'size': size, 'ai_call': ai_call})
+            plan['counts'][classification] += 1
+            if ai_call:
+                plan['planned_calls'] += 1
+                plan['upload_bytes'] += size
+        
+        return plan
+    
+    def _has_near_duplicate(self, image_path: Path, calendar_week: str) -> bool:
+        """Check if a photo looks like an already analyzed one, False for unreadable images"""
+        try:
+            phash = compute_dhash(image_path.read_bytes())
+        except Exception:
+            return False
+        return bool(self.duplicates.find_near_duplicates(phash, calendar_week, image_path.name))
+    
+    def plan_analysis(self, calendar_weeks: List[str], incremental: bool = False,
+                      use_cache: bool = True, parallel_calls: int = 1) -> Dict[str, Any]:
+        """
+        Dry run of the analysis of several calendar weeks with a duration estimate
+        
+        The duration assumes the median time of earlier AI calls of these weeks
+        (AI_ESTIMATED_CALL_SECONDS without history), parallel_calls calls at a time
+        (at most AI_MAX_CONCURRENCY) and the AI_MAX_CALLS_PER_MINUTE budget.
+        
+        Args:
+            calendar_weeks: Calendar weeks to plan
+            incremental: Skip photos whose unchanged content is already in the results
+            use_cache: Reuse extractions of photos analyzed before with the same prompt and model
+            parallel_calls: AI calls running at the same time (weeks analyzed in parallel)
+            
+        Returns:
+            Dictionary with the week plans in 'weeks', totals in 'counts', 'planned_calls' and
+            'upload_bytes', and 'call_seconds', 'parallel_calls' and 'estimated_seconds'
+        """
+        weeks = [self.plan_week_analysis(week, incremental=incremental, use_cache=use_cache)
+                 for week in calendar_weeks]
+        
+        counts = {name: sum(week['counts'][name] for week in weeks) for name in PLAN_CLASSES}
+        planned_calls = sum(week['planned_calls'] for week in weeks)
+        latencies = [latency for week in weeks for latency in week.pop('latencies_ms')]
+        call_seconds = (float(pd.Series(latencies).median()) / 1000 if latencies
+                        else self.config.AI_ESTIMATED_CALL_SECONDS)
+        parallel_calls = max(1, min(parallel_calls, self.config.AI_MAX_CONCURRENCY))
+        
+        estimated_seconds = planned_calls * call_seconds / parallel_calls
+        if self.config.AI_MAX_CALLS_PER_MINUTE > 0:
+            estimated_seconds = max(estimated_seconds, planned_calls * 60 / self.config.AI_MAX_CALLS_PER_MINUTE)
+        
+        return {
+            'weeks': weeks,
+            'counts': counts,
+            'planned_calls': planned_calls,
+            'upload_bytes': sum(week['upload_bytes'] for week in weeks),
+            'call_seconds': round(call_seconds, 2),
+            'parallel_calls': parallel_calls,
+            'estimated_seconds': round(estimated_seconds, 1)
+        }
+    
+    def get_week_usage(self, calendar_week: str) -> Optional[Dict[str, Any]]:
+        """
+        Aggregate the AI call accounting of a calendar week
+        
+        Calls of analyzed receipts come from the result rows, calls whose response ended
+        in quarantine from the quarantine entries. Rows answered from the extraction
+        cache or analyzed before the accounting existed have no call of their own.
+        
+        Returns:
+            Dictionary with call, byte, token, latency and retry totals, None if the
+            week has neither results nor quarantined receipts
+        """
+        df = self.results.read(calendar_week)
+        quarantined = [entry['usage'] for entry in self.quarantine.load(calendar_week).values()
+                       if entry.get('usage')]
+        if df is None and not quarantined:
+            return None
+        
+        calls = pd.DataFrame(columns=USAGE_COLUMNS)
+        if df is not None and "Modell" in df.columns:
+            calls = df.loc[df["Modell"].notna(), [column for column in USAGE_COLUMNS if column in df.columns]]
+        if quarantined:
+            calls = pd.concat([calls, pd.DataFrame(quarantined)], ignore_index=True)
+        
+        for column in USAGE_COLUMNS[:-1]:
+            calls[column] = pd.to_numeric(calls.get(column), errors='coerce')
+        latencies = calls["Latenz_ms"].dropna()
+        prompt_tokens = int(calls["Prompt_Tokens"].sum())
+        response_tokens = int(calls["Antwort_Tokens"].sum())
+        
+        return {
+            "calendar_week": calendar_week,
+            "calls": len(calls),
+            "quarantined_calls": len(quarantined),
+            "unaccounted_receipts": 0 if df is None else len(df) - (len(calls) - len(quarantined)),
+            "image_bytes": int(calls["Bild_Bytes"].sum()),
+            "prompt_tokens": prompt_tokens,
+            "response_tokens": response_tokens,
+            "total_tokens": prompt_tokens + response_tokens,
+            "retries": int(calls["Wiederholungen"].sum()),
+            "latency_ms_total": round(float(latencies.sum()), 1),
+            "latency_ms_avg": round(float(latencies.mean()), 1) if len(latencies) else 0.0,
+            "latency_ms_p95": round(float(latencies.quantile(0.95)), 1) if len(latencies) else 0.0,
+            "wait_ms_total": round(float(calls["Wartezeit_ms"].sum()), 1),
+            "models": sorted(calls["Modell"].dropna().astype(str).unique().tolist())
+        }
+    
+    def get_available_weeks(self) -> List[str]:
+        """Get list of available calendar weeks, sorted by year and week number"""
+        return self.manifest.get_weeks()
\ No newline at end of file
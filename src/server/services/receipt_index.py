@@ -0,0 +1,209 @@
+import base64
+import json
+import threading
+from datetime import datetime
+from typing import Optional, List, Dict, Any, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .storage import ResultStore
+
+# Receipt fields as returned by the API, in output order
+RECEIPT_FIELDS = ['datum', 'uhrzeit', 'summe_food', 'summe_nonfood', 'foto_datei', 'duplicate_of',
+                  'prompt_version', 'model']
+
+CATEGORIES = ('food', 'nonfood')
+
+
+def parse_date_key(value: str) -> int:
+    """
+    Convert a date (DD.MM.YYYY or YYYY-MM-DD) into a sortable integer YYYYMMDD
+
+    Raises:
+        ValueError: If the date is not in one of the supported formats
+    """
+    for date_format in ("%d.%m.%Y", "%Y-%m-%d"):
+        try:
+            parsed = datetime.strptime(value.strip(), date_format)
+            return parsed.year * 10000 + parsed.month * 100 + parsed.day
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date {value!r}, expected DD.MM.YYYY or YYYY-MM-DD")
+
+
+def encode_cursor(version: str, position: int) -> str:
+    """Build an opaque cursor pointing after a row position of an index version"""
+    raw = json.dumps({"v": version, "p": int(position)}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Read the index version and row position of a cursor
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return str(data["v"]), int(data["p"])
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+class ReceiptIndex:
+    """
+    Columnar, date-sorted index of the receipts of one calendar week
+
+    Amounts and dates are kept as NumPy arrays sorted by date and time, so date
+    ranges are found by binary search and amount filters are vectorized masks.
+    API records are built once per result file version.
+    """
+
+    def __init__(self, df: pd.DataFrame, version: str, mtime: float):
+        """
+        Build the index from a processed results DataFrame
+
+        Args:
+            df: Results with numeric amount columns
+            version: Version of the result file the results were read from
+            mtime: Modification time of the result file
+        """
+        self.version = version
+        self.mtime = mtime
+
+        dates = np.array([self._safe_date_key(value) for value in df.get("Datum", pd.Series(dtype=str))],
+                         dtype=np.int64)
+        times = df["Uhrzeit"].astype(str).to_numpy() if "Uhrzeit" in df.columns else np.array([""] * len(df))
+        names = df["Foto_Datei"].astype(str).to_numpy() if "Foto_Datei" in df.columns else np.array([""] * len(df))
+        order = np.lexsort((names, times, dates))
+
+        self.date_keys = dates[order]
+        self.food = df["Summe_Food"].to_numpy(dtype=np.float64)[order]
+        self.nonfood = df["Summe_NonFood"].to_numpy(dtype=np.float64)[order]
+        self.total = self.food + self.nonfood
+        self.records = [self._to_record(row) for row in df.iloc[order].to_dict("records")]
+
+        self.total_food = round(float(self.food.sum()), 2)
+        self.total_nonfood = round(float(self.nonfood.sum()), 2)
+        self.flagged_duplicates = sum(1 for record in self.records if record['duplicate_of'])
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def query(self, date_from: Optional[int] = None, date_to: Optional[int] = None,
+              category: Optional[str] = None, min_amount: Optional[float] = None,
+              max_amount: Optional[float] = None) -> np.ndarray:
+        """
+        Find the row positions matching the filters, in date order
+
+        Args:
+            date_from: First date (YYYYMMDD) to include
+            date_to: Last date (YYYYMMDD) to include
+            category: 'food' or 'nonfood' to only include receipts with costs in that category
+            min_amount: Minimum amount (of the category, otherwise of the receipt total)
+            max_amount: Maximum amount (of the category, otherwise of the receipt total)
+        """
+        lo = int(np.searchsorted(self.date_keys, date_from, side="left")) if date_from is not None else 0
+        hi = int(np.searchsorted(self.date_keys, date_to, side="right")) if date_to is not None else len(self)
+
+        amounts = {'food': self.food, 'nonfood': self.nonfood}.get(category, self.total)[lo:hi]
+        mask = np.ones(hi - lo, dtype=bool)
+        if category is not None:
+            mask &= amounts > 0
+        if min_amount is not None:
+            mask &= amounts >= min_amount
+        if max_amount is not None:
+            mask &= amounts <= max_amount
+
+        return np.flatnonzero(mask) + lo
+
+    def page(self, positions: np.ndarray, limit: Optional[int] = None, offset: int = 0,
+             after: Optional[int] = None) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Get one page of matching records
+
+        Args:
+            positions: Matching row positions from query()
+            limit: Maximum number of records (all if None)
+            offset: Number of matching records to skip
+            after: Row position of the last record of the previous page (cursor)
+
+        Returns:
+            Records of the page and the cursor of the next page (None on the last page)
+        """
+        start = int(np.searchsorted(positions, after, side="right")) if after is not None else 0
+        start += offset
+        end = len(positions) if limit is None else min(start + limit, len(positions))
+
+        records = [self.records[position] for position in positions[start:end]]
+        next_cursor = encode_cursor(self.version, positions[end - 1]) if end < len(positions) and end > start else None
+        return records, next_cursor
+
+    @staticmethod
+    def _safe_date_key(value) -> int:
+        try:
+            return parse_date_key(str(value))
+        except ValueError:
+            return 0
+
+    @staticmethod
+    def _to_record(row: Dict[str, Any]) -> Dict[str, Any]:
+        duplicate_of = row.get('Duplikat_Von')
+        prompt_version = row.get('Prompt_Version')
+        model = row.get('Analyse_Modell')
+        return {
+            'datum': str(row.get('Datum', '')),
+            'uhrzeit': str(row.get('Uhrzeit', '')),
+            'summe_food': float(row.get('Summe_Food', 0.0)),
+            'summe_nonfood': float(row.get('Summe_NonFood', 0.0)),
+            'foto_datei': str(row.get('Foto_Datei', '')),
+            'duplicate_of': duplicate_of if pd.notna(duplicate_of) else None,
+            'prompt_version': prompt_version if pd.notna(prompt_version) else None,
+            'model': model if pd.notna(model) else None
+        }
+
+
+class ReceiptIndexCache:
+    """Keeps one ReceiptIndex per calendar week, rebuilt when the result file changes"""
+
+    def __init__(self, results: ResultStore):
+        """Initialize the cache on top of the result store"""
+        self.results = results
+        self._indexes: Dict[str, ReceiptIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, calendar_week: str) -> Optional[ReceiptIndex]:
+        """Get the index of a calendar week, None if it has no results"""
+        csv_file = self.results.csv_file(calendar_week)
+        try:
+            stat = csv_file.stat()
+        except FileNotFoundError:
+            return None
+
+        index = self._indexes.get(calendar_week)
+        if index is not None and index.version == self._version(stat):
+            return index
+
+        df = self.results.read(calendar_week)
+        if df is None:
+            return None
+        df["Summe_Food"] = pd.to_numeric(df["Summe_Food"], errors='coerce').fillna(0.0)
+        df["Summe_NonFood"] = pd.to_numeric(df["Summe_NonFood"], errors='coerce').fillna(0.0)
+
+        # The file may have been replaced between stat and read, only cache a consistent version
+        try:
+            read_stat = csv_file.stat()
+        except FileNotFoundError:
+            read_stat = stat
+        index = ReceiptIndex(df, self._version(read_stat), read_stat.st_mtime)
+        if self._version(read_stat) == self._version(stat):
+            with self._lock:
+                self._indexes[calendar_week] = index
+        return index
+
+    @staticmethod
+    def _version(stat) -> str:
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
@@ -0,0 +1,114 @@
+"""
+Strict parser for the CSV record returned by the AI for one receipt
+"""
+
+import re
+from datetime import datetime
+from typing import Dict, Any, List
+
+# Columns produced by the parser, in CSV order
+RECORD_COLUMNS = ["Datum", "Uhrzeit", "Summe_Food", "Summe_NonFood"]
+
+_DATE_PATTERN = re.compile(r"^(\d{1,2})\.(\d{1,2})\.(\d{2}|\d{4})$")
+_TIME_PATTERN = re.compile(r"^(\d{1,2}):(\d{2})(?::(\d{2}))?$")
+_AMOUNT_PATTERN = re.compile(r"^-?\d+(?:[.,]\d{1,2})?$")
+
+
+class ResponseParseError(ValueError):
+    """Raised when an AI response is not exactly one valid receipt record"""
+
+
+def parse_receipt_response(text: str) -> Dict[str, Any]:
+    """
+    Parse the AI answer for a single receipt
+
+    The answer must contain exactly one record ``Datum;Uhrzeit;Summe_Food;Summe_NonFood``.
+    Blank lines, markdown code fences and a header line naming the columns are
+    tolerated; any other content makes the response invalid.
+
+    Args:
+        text: Raw response text of the AI model
+
+    Returns:
+        Dictionary with normalized Datum (DD.MM.YYYY), Uhrzeit (HH:MM) and float amounts
+
+    Raises:
+        ResponseParseError: If the response does not contain exactly one valid record
+    """
+    if not text or not text.strip():
+        raise ResponseParseError("empty response")
+
+    records: List[Dict[str, Any]] = []
+    for line in text.strip().splitlines():
+        line = line.strip()
+        if not line or line.startswith("```"):
+            continue
+        fields = [field.strip() for field in line.split(";")]
+        if _is_header(fields):
+            continue
+        records.append(_parse_record(fields, line))
+
+    if not records:
+        raise ResponseParseError("no receipt record found")
+    if len(records) > 1:
+        raise ResponseParseError(f"expected one receipt record, found {len(records)}")
+
+    return records[0]
+
+
+def _is_header(fields: List[str]) -> bool:
+    """Check if a line is the CSV header the prompt asked to omit"""
+    return [field.lower() for field in fields] == [column.lower() for column in RECORD_COLUMNS]
+
+
+def _parse_record(fields: List[str], line: str) -> Dict[str, Any]:
+    """Validate and normalize the four fields of one record"""
+    if len(fields) != len(RECORD_COLUMNS):
+        raise ResponseParseError(f"expected {len(RECORD_COLUMNS)} fields, got {len(fields)}: {line!r}")
+
+    datum, uhrzeit, food, nonfood = fields
+    return {
+        "Datum": _parse_date(datum),
+        "Uhrzeit": _parse_time(uhrzeit),
+        "Summe_Food": _parse_amount(food, "Summe_Food"),
+        "Summe_NonFood": _parse_amount(nonfood, "Summe_NonFood"),
+    }
+
+
+def _parse_date(value: str) -> str:
+    """Validate a German date and return it as DD.MM.YYYY"""
+    match = _DATE_PATTERN.match(value)
+    if not match:
+        raise ResponseParseError(f"invalid date: {value!r}")
+
+    day, month, year = match.groups()
+    if len(year) == 2:
+        year = "20" + year
+    try:
+        parsed = datetime(int(year), int(month), int(day))
+    except ValueError:
+        raise ResponseParseError(f"invalid date: {value!r}")
+
+    return parsed.strftime("%d.%m.%Y")
+
+
+def _parse_time(value: str) -> str:
+    """Validate a time of day and return it as HH:MM"""
+    match = _TIME_PATTERN.match(value)
+    if not match:
+        raise ResponseParseError(f"invalid time: {value!r}")
+
+    hour, minute, second = (int(part) if part else 0 for part in match.groups())
+    if hour > 23 or minute > 59 or second > 59:
+        raise ResponseParseError(f"invalid time: {value!r}")
+
+    return f"{hour:02d}:{minute:02d}"
+
+
+def _parse_amount(value: str, column: str) -> float:
+    """Validate a euro amount with comma or point as decimal separator"""
+    cleaned = value.replace("€", "").replace("EUR", "").strip()
+    if not _AMOUNT_PATTERN.match(cleaned):
+        raise ResponseParseError(f"invalid amount for {column}: {value!r}")
+
+    return float(cleaned.replace(",", "."))
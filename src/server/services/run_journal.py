@@ -0,0 +1,299 @@
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Iterable, IO
+
+from ..core.config import Config
+from .storage import hold_lock, is_locked
+
+# Run ids like 2025CW_31-20250801T101500-1a2b3c
+RUN_ID_PATTERN = re.compile(r"^\d{4}CW_\d{1,2}-\d{8}T\d{6}-[0-9a-f]{6}$")
+
+# Photo outcomes that need no further work when a run is resumed
+DONE_OUTCOMES = ('analyzed', 'unchanged', 'duplicate', 'quarantined', 'rejected', 'removed')
+
+# Starting runs prunes the journals at most this often per process
+PRUNE_INTERVAL_SECONDS = 3600
+
+# Bytes read from the end of a journal to find its last event
+TAIL_BYTES = 4096
+
+
+class JournalRun:
+    """
+    Write-ahead journal of one week analysis run
+
+    Every raw AI response is appended and flushed to disk as soon as it arrives,
+    before it is parsed or stored, followed by the outcome of each finished
+    photo. A resumed run replays the journaled responses instead of calling the
+    AI again and skips the finished photos.
+    """
+
+    def __init__(self, journal_file: Path, events: List[Dict[str, Any]], live_lock: Optional[IO] = None):
+        """Initialize the run from its journal file, the events read from it and the lock held while it runs"""
+        self.journal_file = journal_file
+        self.live_lock = live_lock
+        self.run_id = journal_file.stem
+        start = events[0]
+        self.calendar_week = start['calendar_week']
+        self.files: List[str] = start['files']
+        self.options: Dict[str, Any] = start['options']
+        self.responses: Dict[str, Dict[str, Any]] = {}
+        self.done: Dict[str, str] = {}
+        for event in events:
+            if event['type'] == 'response':
+                self.responses[event['image_hash']] = event
+            elif event['type'] == 'done':
+                self.done[event['foto_datei']] = event['outcome']
+        self._lock = threading.Lock()
+
+    def remaining_files(self) -> List[str]:
+        """Get the photos of the run that are not finished yet"""
+        return [name for name in self.files if name not in self.done]
+
+    def response(self, image_hash: str) -> Optional[Dict[str, Any]]:
+        """Get the journaled AI response of an image with 'raw_response' and 'usage', None if not journaled"""
+        return self.responses.get(image_hash)
+
+    def record_response(self, file_name: str, image_hash: str, raw_response: str, usage: Dict[str, Any]):
+        """Journal a raw AI response as soon as it arrived"""
+        event = {'type': 'response', 'foto_datei': file_name, 'image_hash': image_hash,
+                 'raw_response': raw_response, 'usage': usage}
+        self.responses[image_hash] = event
+        self._append(event)
+
+    def record_done(self, file_name: str, outcome: str):
+        """Journal a photo as finished if its outcome needs no further work"""
+        if outcome in DONE_OUTCOMES:
+            self.done[file_name] = outcome
+            self._append({'type': 'done', 'foto_datei': file_name, 'outcome': outcome})
+
+    def record_resume(self):
+        """Journal that the run continues"""
+        self._append({'type': 'resume', 'at': datetime.utcnow().isoformat()})
+
+    def finish(self, status: str):
+        """Journal the end of the run with its status (completed, partial or failed)"""
+        self._append({'type': 'end', 'status': status, 'at': datetime.utcnow().isoformat()})
+
+    def _append(self, event: Dict[str, Any]):
+        """Append an event and force it to disk, so it survives a crash right after"""
+        line = json.dumps(event, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.journal_file, "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+
+class RunJournal:
+    """
+    Journals of week analysis runs in JOURNAL_DIR/<run_id>.jsonl
+
+    A running run holds a lock on JOURNAL_DIR/<run_id>.lock in whichever process
+    it runs, so every process sees it as running and can't resume it twice; a
+    run without end whose lock is free died and is interrupted. Journals of
+    interrupted or partial runs are kept until they are resumed or older than
+    JOURNAL_KEEP_DAYS; only the JOURNAL_KEEP_RUNS newest completed runs are kept.
+    """
+
+    def __init__(self, config: Config):
+        """Initialize the journal store with configuration"""
+        self.config = config
+        self.journal_dir = Path(config.JOURNAL_DIR)
+        self._pruned_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def start(self, calendar_week: str, files: Iterable[str], options: Dict[str, Any]) -> JournalRun:
+        """
+        Start the journal of a new run
+
+        Args:
+            calendar_week: Calendar week of the run
+            files: Photo file names the run analyzes
+            options: Options needed to resume the run (incremental, use_cache)
+        """
+        with self._lock:
+            prune_due = self._pruned_at is None or time.monotonic() - self._pruned_at >= PRUNE_INTERVAL_SECONDS
+            if prune_due:
+                self._pruned_at = time.monotonic()
+        if prune_due:
+            self.prune()
+
+        self.journal_dir.mkdir(parents=True, exist_ok=True)
+        run_id = f"{calendar_week}-{datetime.utcnow():%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:6]}"
+        start = {'type': 'start', 'run_id': run_id, 'calendar_week': calendar_week, 'files': list(files),
+                 'options': options, 'at': datetime.utcnow().isoformat()}
+
+        # Locked before the journal exists, so the new run never shows up as interrupted
+        run = JournalRun(self._journal_file(run_id), [start], hold_lock(self._lock_file(run_id)))
+        run._append(start)
+        return run
+
+    def resume(self, run_id: str) -> JournalRun:
+        """
+        Open the journal of a run to continue it
+
+        Raises:
+            KeyError: If there is no journal of the run
+            ValueError: If the run is in progress (in any process) or already completed
+        """
+        journal_file = self._journal_file(run_id)
+        if not RUN_ID_PATTERN.match(run_id or "") or not journal_file.exists():
+            raise KeyError(f"no journal of run {run_id!r}")
+
+        # Taking the lock claims the run, two processes can't both resume it
+        live_lock = hold_lock(self._lock_file(run_id), blocking=False)
+        if live_lock is None:
+            raise ValueError(f"run {run_id} is still in progress")
+        try:
+            events = self._read_events(journal_file)
+            if not events:
+                raise KeyError(f"no journal of run {run_id!r}")
+            if events[-1]['type'] == 'end' and events[-1]['status'] == 'completed':
+                raise ValueError(f"run {run_id} is already completed")
+
+            run = JournalRun(journal_file, events, live_lock)
+            run.record_resume()
+        except BaseException:
+            live_lock.close()
+            raise
+        return run
+
+    def release(self, run: JournalRun):
+        """Mark a run as no longer in progress"""
+        if run.live_lock is not None:
+            run.live_lock.close()
+            run.live_lock = None
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get the state of a run
+
+        Returns:
+            Dictionary with 'run_id', 'calendar_week', 'status' (running, completed, partial,
+            failed or interrupted), 'started_at', 'updated_at', 'total_files', 'done' (outcome
+            counts), 'journaled_responses' and 'remaining_files'; None if there is no such run
+        """
+        if not RUN_ID_PATTERN.match(run_id or ""):
+            return None
+        journal_file = self._journal_file(run_id)
+        try:
+            events = self._read_events(journal_file)
+            updated_at = datetime.utcfromtimestamp(journal_file.stat().st_mtime).isoformat()
+        except FileNotFoundError:
+            return None
+        if not events:
+            return None
+
+        run = JournalRun(journal_file, events)
+        status = self._status(run_id, events[-1])
+
+        done = {}
+        for outcome in run.done.values():
+            done[outcome] = done.get(outcome, 0) + 1
+        return {
+            'run_id': run_id,
+            'calendar_week': run.calendar_week,
+            'status': status,
+            'started_at': events[0]['at'],
+            'updated_at': updated_at,
+            'total_files': len(run.files),
+            'done': done,
+            'journaled_responses': len(run.responses),
+            'remaining_files': run.remaining_files()
+        }
+
+    def list_runs(self, calendar_week: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get the states of all journaled runs, newest first, optionally of one calendar week"""
+        if not self.journal_dir.exists():
+            return []
+
+        runs = []
+        for journal_file in self.journal_dir.glob("*.jsonl"):
+            run_id = journal_file.stem
+            if calendar_week is not None and not run_id.startswith(f"{calendar_week}-"):
+                continue
+            state = self.get_run(run_id)
+            if state is not None:
+                runs.append(state)
+        return sorted(runs, key=lambda state: state['started_at'], reverse=True)
+
+    def prune(self):
+        """
+        Remove the journals of runs not running that are older than JOURNAL_KEEP_DAYS,
+        and of completed runs except the JOURNAL_KEEP_RUNS newest
+
+        Only the last event of each journal is read.
+        """
+        if not self.journal_dir.exists():
+            return
+
+        journals = []
+        for journal_file in self.journal_dir.glob("*.jsonl"):
+            try:
+                journals.append((journal_file.stat().st_mtime, journal_file))
+            except FileNotFoundError:
+                continue
+
+        expired_at = time.time() - self.config.JOURNAL_KEEP_DAYS * 86400
+        completed = 0
+        for mtime, journal_file in sorted(journals, key=lambda journal: journal[0], reverse=True):
+            status = self._status(journal_file.stem, self._last_event(journal_file))
+            if status == 'running':
+                continue
+            if status == 'completed':
+                completed += 1
+            if mtime < expired_at or (status == 'completed' and completed > self.config.JOURNAL_KEEP_RUNS):
+                journal_file.unlink(missing_ok=True)
+                self._lock_file(journal_file.stem).unlink(missing_ok=True)
+
+    def _status(self, run_id: str, last_event: Optional[Dict[str, Any]]) -> str:
+        """Status of a run from the last event of its journal and its lock"""
+        if is_locked(self._lock_file(run_id)):
+            return 'running'
+        if last_event is not None and last_event['type'] == 'end':
+            return last_event['status']
+        # Died before its end
+        return 'interrupted'
+
+    def _journal_file(self, run_id: str) -> Path:
+        return self.journal_dir / f"{run_id}.jsonl"
+
+    def _lock_file(self, run_id: str) -> Path:
+        return self.journal_dir / f"{run_id}.lock"
+
+    @staticmethod
+    def _last_event(journal_file: Path) -> Optional[Dict[str, Any]]:
+        """Read the last complete event of a journal from its end, None if there is none"""
+        try:
+            with open(journal_file, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                f.seek(max(0, f.tell() - TAIL_BYTES))
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+        for line in reversed(lines):
+            try:
+                return json.loads(line)
+            except ValueError:
+                # A line cut off by a crash, or by the start of the tail
+                continue
+        return None
+
+    @staticmethod
+    def _read_events(journal_file: Path) -> List[Dict[str, Any]]:
+        """Read the events of a journal, skipping a line cut off by a crash"""
+        events = []
+        with open(journal_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return events
@@ -0,0 +1,462 @@
+import asyncio
+import atexit
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from pathlib import Path
+from typing import Optional, Dict, Any, Iterator, AsyncIterator
+
+from ..core.config import Config
+from .storage import atomic_write, file_lock, hold_lock, is_locked
+
+# Priority classes of analysis work, most urgent first
+PRIORITY_CLASSES = ('interactive', 'api', 'backfill')
+
+# Scheduler of this process, taking part in the AI call budget shared by all processes
+_default_scheduler: Optional["PriorityScheduler"] = None
+_default_scheduler_guard = threading.Lock()
+
+
+def parse_priority_weights(value: str) -> Dict[str, float]:
+    """
+    Parse priority weights like 'interactive=8,api=4,backfill=1'
+
+    Raises:
+        ValueError: If a class is unknown or a weight is not positive
+    """
+    weights = {'interactive': 8.0, 'api': 4.0, 'backfill': 1.0}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in PRIORITY_CLASSES:
+            raise ValueError(f"unknown priority class {name!r}, expected one of {', '.join(PRIORITY_CLASSES)}")
+        weights[name] = float(weight)
+        if weights[name] <= 0:
+            raise ValueError(f"priority weight of {name!r} must be positive")
+    return weights
+
+
+def default_scheduler(config: Config) -> "PriorityScheduler":
+    """Get the scheduler shared by all analyzers of this process"""
+    global _default_scheduler
+    with _default_scheduler_guard:
+        if _default_scheduler is None or _default_scheduler.pid != os.getpid():
+            # A forked process (batch worker) takes part with a scheduler of its own
+            _default_scheduler = PriorityScheduler(config)
+        return _default_scheduler
+
+
+def _close_inherited_scheduler():
+    """Drop the liveness lock a forked process inherited, so it ends with its parent"""
+    if _default_scheduler is not None:
+        _default_scheduler.close()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_close_inherited_scheduler)
+
+
+class PriorityScheduler:
+    """
+    Hands out the limited AI call slots to waiting work by priority class
+
+    Slots, the optional AI_MAX_CALLS_PER_MINUTE budget and the priority order
+    are shared by all processes using the same data directory (web server,
+    ASGI workers, batch workers, console tools): they are kept in a small state
+    file in SCHEDULER_DIR, changed under a file lock. Every process publishes
+    its calls in use and waiting there and holds a lock file while it lives,
+    so the calls of a crashed process are given back.
+
+    A free slot goes to the priority class (interactive, api, backfill) with the
+    lowest virtual time, which advances by 1/weight per granted call (stride
+    scheduling), so with the default weights 8:4:1 backfills still get one of
+    every 13 calls while others are waiting, in whichever process they wait.
+    A call that waited longer than AI_PRIORITY_AGING_SECONDS is served next
+    regardless of its class.
+
+    Threads wait for a slot with acquire, coroutines with acquire_async; both
+    queue in the same order and share the same slots.
+    """
+
+    def __init__(self, config: Config):
+        """Initialize the scheduler with configuration"""
+        self.slots = config.AI_MAX_CONCURRENCY
+        self.weights = parse_priority_weights(config.AI_PRIORITY_WEIGHTS)
+        self.aging_seconds = config.AI_PRIORITY_AGING_SECONDS
+        self.rate_per_second = config.AI_MAX_CALLS_PER_MINUTE / 60.0
+        self.poll_seconds = config.AI_SCHEDULER_POLL_SECONDS
+        self.state_file = config.SCHEDULER_DIR / 'state.json'
+        self.state_lock_file = config.SCHEDULER_DIR / 'state.lock'
+        self.pid = os.getpid()
+
+        self._condition = threading.Condition()
+        self._waiting = {priority: deque() for priority in PRIORITY_CLASSES}
+        self._in_use = 0
+        self._granted = {priority: 0 for priority in PRIORITY_CLASSES}
+        self._sequence = itertools.count()
+        # (event loop, event) of every coroutine waiting in acquire_async
+        self._async_waiters = set()
+        # Time until the shared state may allow a grant that was refused, None to wait for a release
+        self._retry_after: Optional[float] = None
+
+        # Held while this process lives, other processes drop its entry once it is free
+        self.process_id = f"{self.pid}-{uuid.uuid4().hex[:8]}"
+        with file_lock(self.state_lock_file):
+            # Created under the state lock, so no process removes it as stale before it is locked
+            self._alive = hold_lock(self._process_lock_file(self.process_id))
+        atexit.register(self.close)
+
+        # Token bucket of the call rate budget, bursts up to one call per slot
+        self._burst = float(max(1, self.slots))
+
+    @contextmanager
+    def slot(self, priority: str = 'api', timeout: Optional[float] = None) -> Iterator[None]:
+        """Hold an AI call slot for the duration of the block"""
+        self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self, priority: str = 'api', timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold an AI call slot for the duration of the async block"""
+        await self.acquire_async(priority, timeout)
+        try:
+            yield
+        finally:
+            await self.release_async()
+
+    def acquire(self, priority: str = 'api', timeout: Optional[float] = None):
+        """
+        Wait until this call is granted a slot
+
+        Args:
+            priority: Priority class of the call
+            timeout: Give up after this many seconds (wait as long as needed if None)
+
+        Raises:
+            ValueError: If the priority class is unknown
+            TimeoutError: If no slot was granted within the timeout
+        """
+        ticket, give_up_at = self._enqueue(priority, timeout)
+        with self._condition:
+            try:
+                while not self._grant(priority, ticket):
+                    self._condition.wait(self._wait_timeout_until(priority, ticket, give_up_at, timeout))
+            except BaseException:
+                self._dequeue(priority, ticket)
+                raise
+
+    async def acquire_async(self, priority: str = 'api', timeout: Optional[float] = None):
+        """
+        Wait on the event loop until this call is granted a slot, like acquire
+
+        The waiting coroutine holds no thread, so any number of calls can wait. The
+        locks and the shared state file are only touched in the default executor,
+        never on the event loop.
+
+        Raises:
+            ValueError: If the priority class is unknown
+            TimeoutError: If no slot was granted within the timeout
+        """
+        loop = asyncio.get_running_loop()
+        waiter = (loop, asyncio.Event())
+        step = loop.run_in_executor(None, self._enqueue_waiter, priority, timeout, waiter)
+        ticket = None
+        try:
+            ticket, give_up_at = await asyncio.shield(step)
+            queue = self._waiting[priority]
+            while True:
+                # Cleared before looking, so a release after this point always wakes us
+                waiter[1].clear()
+                if queue[0] is not ticket and (give_up_at is None or time.monotonic() < give_up_at):
+                    # Not the oldest call of its class, woken when the calls ahead are served
+                    wait_timeout = give_up_at - time.monotonic() if give_up_at is not None else None
+                else:
+                    step = loop.run_in_executor(None, self._grant_or_wait_timeout, priority, ticket,
+                                                give_up_at, timeout, waiter)
+                    granted, wait_timeout = await asyncio.shield(step)
+                    if granted:
+                        return
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), wait_timeout)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            # The step in the executor goes on and may still queue or grant, undo it once it is done
+            step.add_done_callback(
+                lambda done: loop.run_in_executor(None, self._abandon_waiter, priority, ticket, done, waiter))
+            raise
+
+    async def release_async(self):
+        """Give the slot back from a coroutine, off the event loop"""
+        # Shielded, a cancelled caller must still give the slot back
+        await asyncio.shield(asyncio.get_running_loop().run_in_executor(None, self.release))
+
+    def release(self):
+        """Give the slot back"""
+        with self._condition:
+            self._in_use -= 1
+            self._update_shared_state()
+            self._notify_all()
+
+    def close(self):
+        """Stop taking part in the shared budget, other processes give back what this one held"""
+        if self._alive is None:
+            return
+        if os.getpid() == self.pid:
+            with file_lock(self.state_lock_file):
+                self._process_lock_file(self.process_id).unlink(missing_ok=True)
+                self._alive.close()
+        else:
+            # A forked process only drops its copy, the lock file belongs to the parent
+            self._alive.close()
+        self._alive = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Get slots in use, waiting and granted calls per priority class"""
+        with self._condition:
+            state = self._update_shared_state()
+            return {
+                'slots': self.slots,
+                'in_use': self._in_use,
+                'in_use_all_processes': sum(process['in_use'] for process in state['processes'].values()),
+                'processes': len(state['processes']),
+                'waiting': {priority: len(queue) for priority, queue in self._waiting.items()},
+                'granted': dict(self._granted)
+            }
+
+    def _enqueue(self, priority: str, timeout: Optional[float]):
+        """Queue a new ticket of a call, returns the ticket and when to give up waiting"""
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"unknown priority class {priority!r}, expected one of {', '.join(PRIORITY_CLASSES)}")
+
+        ticket = (time.monotonic(), next(self._sequence))
+        with self._condition:
+            self._waiting[priority].append(ticket)
+        return ticket, ticket[0] + timeout if timeout is not None else None
+
+    def _enqueue_waiter(self, priority: str, timeout: Optional[float], waiter):
+        """Queue a ticket of a coroutine and register it to be woken (in the executor)"""
+        ticket, give_up_at = self._enqueue(priority, timeout)
+        with self._condition:
+            self._async_waiters.add(waiter)
+        return ticket, give_up_at
+
+    def _grant_or_wait_timeout(self, priority: str, ticket, give_up_at: Optional[float],
+                               timeout: Optional[float], waiter):
+        """
+        Grant a slot to a coroutine if it is its turn (in the executor)
+
+        Returns:
+            Whether the slot was granted and otherwise the time to wait for the next chance
+
+        Raises:
+            TimeoutError: If the timeout of the call has passed, its ticket is removed
+        """
+        with self._condition:
+            try:
+                if self._grant(priority, ticket):
+                    self._async_waiters.discard(waiter)
+                    return True, None
+                return False, self._wait_timeout_until(priority, ticket, give_up_at, timeout)
+            except BaseException:
+                self._async_waiters.discard(waiter)
+                self._dequeue(priority, ticket)
+                raise
+
+    def _abandon_waiter(self, priority: str, ticket, step, waiter):
+        """Undo what a cancelled coroutine queued or was granted, once its last step is done (in the executor)"""
+        if step.cancelled() or step.exception() is not None:
+            # Failed steps clean up themselves
+            return
+        result = step.result()
+        if ticket is None:
+            # Cancelled while queueing, the step returned the ticket
+            ticket = result[0]
+        elif result[0] is True:
+            # Granted after all
+            self.release()
+        with self._condition:
+            self._async_waiters.discard(waiter)
+            if ticket in self._waiting[priority]:
+                self._dequeue(priority, ticket)
+
+    def _dequeue(self, priority: str, ticket):
+        """Remove the ticket of a call that gave up, called with the condition held"""
+        self._waiting[priority].remove(ticket)
+        # Other processes must not keep yielding to a call that no longer waits
+        self._update_shared_state()
+        self._notify_all()
+
+    def _grant(self, priority: str, ticket) -> bool:
+        """Grant a slot if it is the ticket's turn, called with the condition held"""
+        if self._waiting[priority][0] is not ticket:
+            # Only the oldest call of a class competes, the next one is woken when it is served
+            return False
+
+        in_use = self._in_use
+        self._update_shared_state(grant_to=priority)
+        if self._in_use == in_use:
+            return False
+
+        self._granted[priority] += 1
+        self._notify_all()
+        return True
+
+    def _update_shared_state(self, grant_to: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Publish the calls of this process to the shared state, called with the condition held
+
+        Args:
+            grant_to: Also grant a slot to the oldest call of this class if it is its turn
+
+        Returns:
+            The shared state
+        """
+        with file_lock(self.state_lock_file):
+            state = self._read_state()
+            processes = state['processes']
+            alive = {self.process_id}
+            for lock_file in self.state_file.parent.glob("process-*.lock"):
+                process_id = lock_file.stem[len("process-"):]
+                if process_id == self.process_id or is_locked(lock_file):
+                    alive.add(process_id)
+                else:
+                    # Its process ended (maybe crashed, or before it ever took a slot)
+                    lock_file.unlink(missing_ok=True)
+            for process_id in set(processes) - alive:
+                # Give back the slots of ended processes
+                del processes[process_id]
+
+            was_waiting = {priority: any(process['waiting'].get(priority) for process in processes.values())
+                           for priority in PRIORITY_CLASSES}
+            processes[self.process_id] = self._process_entry()
+            for priority in PRIORITY_CLASSES:
+                if self._waiting[priority] and not was_waiting[priority]:
+                    # A class that was idle must not bank credit for the time it didn't compete
+                    state['virtual_time'][priority] = max(state['virtual_time'][priority], state['now_serving'])
+
+            now = time.time()
+            if self.rate_per_second > 0:
+                state['tokens'] = min(self._burst, state['tokens'] + (now - state['refilled_at']) * self.rate_per_second)
+            state['refilled_at'] = now
+
+            if grant_to is not None:
+                if self._can_grant(state) and self._select(state, now) == grant_to:
+                    self._waiting[grant_to].popleft()
+                    self._in_use += 1
+                    if self.rate_per_second > 0:
+                        state['tokens'] -= 1
+                    state['now_serving'] = state['virtual_time'][grant_to]
+                    state['virtual_time'][grant_to] += 1.0 / self.weights[grant_to]
+                    processes[self.process_id] = self._process_entry()
+                self._retry_after = self._shared_wait_timeout(state, now)
+
+            self._write_state(state)
+            return state
+
+    def _process_entry(self) -> Dict[str, Any]:
+        """Calls in use and waiting of this process as stored in the shared state"""
+        now_wall, now = time.time(), time.monotonic()
+        return {
+            'in_use': self._in_use,
+            # Number of waiting calls and wall clock time the oldest one started waiting per class
+            'waiting': {priority: [len(queue), now_wall - (now - queue[0][0])]
+                        for priority, queue in self._waiting.items() if queue}
+        }
+
+    def _read_state(self) -> Dict[str, Any]:
+        """Read the shared state, a fresh one if it is missing or unreadable"""
+        try:
+            with open(self.state_file, encoding="utf-8") as f:
+                state = json.load(f)
+            state['virtual_time'] = {priority: state['virtual_time'].get(priority, 0.0)
+                                     for priority in PRIORITY_CLASSES}
+            return state
+        except (OSError, ValueError, KeyError, AttributeError):
+            return {'tokens': self._burst, 'refilled_at': time.time(), 'now_serving': 0.0,
+                    'virtual_time': {priority: 0.0 for priority in PRIORITY_CLASSES}, 'processes': {}}
+
+    def _write_state(self, state: Dict[str, Any]):
+        """Write the shared state, called with its file lock held"""
+        # Replaced atomically, a crash mid-write must not reset the budget of the other processes
+        with atomic_write(self.state_file) as f:
+            json.dump(state, f)
+
+    def _process_lock_file(self, process_id: str) -> Path:
+        """Lock file held by the process with this id while it lives"""
+        return self.state_file.parent / f"process-{process_id}.lock"
+
+    def _notify_all(self):
+        """Wake all waiting threads and coroutines, called with the condition held"""
+        self._condition.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop of a cancelled waiter was closed
+                pass
+
+    def _wait_timeout_until(self, priority: str, ticket, give_up_at: Optional[float],
+                            timeout: Optional[float]) -> Optional[float]:
+        """
+        Time to wait for the next chance of a slot, called with the condition held
+
+        Raises:
+            TimeoutError: If the timeout of the call has passed
+        """
+        # Calls behind the oldest of their class are woken when it is served
+        wait_timeout = self._retry_after if self._waiting[priority][0] is ticket else None
+        if give_up_at is not None:
+            remaining = give_up_at - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"no AI call slot free within {timeout:.1f}s")
+            wait_timeout = min(wait_timeout, remaining) if wait_timeout is not None else remaining
+        return wait_timeout
+
+    def _can_grant(self, state: Dict[str, Any]) -> bool:
+        """Check if a slot and, with a rate budget, a token are free in all processes"""
+        if sum(process['in_use'] for process in state['processes'].values()) >= self.slots:
+            return False
+        return self.rate_per_second <= 0 or state['tokens'] >= 1
+
+    def _select(self, state: Dict[str, Any], now: float) -> Optional[str]:
+        """Get the priority class whose oldest waiting call, in any process, goes next"""
+        oldest = self._oldest_waiting(state)
+        if not oldest:
+            return None
+
+        aged = [(waiting_since, priority) for priority, waiting_since in oldest.items()
+                if now - waiting_since >= self.aging_seconds]
+        if aged:
+            return min(aged)[1]
+        return min(oldest, key=lambda priority: (state['virtual_time'][priority], PRIORITY_CLASSES.index(priority)))
+
+    def _shared_wait_timeout(self, state: Dict[str, Any], now: float) -> Optional[float]:
+        """Time until the next aging deadline or budget token, None to wait for a release"""
+        timeouts = [waiting_since + self.aging_seconds - now for waiting_since in self._oldest_waiting(state).values()]
+        if self.rate_per_second > 0 and state['tokens'] < 1:
+            timeouts.append((1 - state['tokens']) / self.rate_per_second)
+        if len(state['processes']) > 1:
+            # Releases of other processes wake nobody here, look again in a moment
+            timeouts.append(self.poll_seconds)
+
+        timeouts = [timeout for timeout in timeouts if timeout > 0]
+        return min(timeouts) if timeouts else None
+
+    @staticmethod
+    def _oldest_waiting(state: Dict[str, Any]) -> Dict[str, float]:
+        """Wall clock time the oldest call of every waiting class started waiting, over all processes"""
+        oldest = {}
+        for process in state['processes'].values():
+            for priority, (count, waiting_since) in process['waiting'].items():
+                if count:
+                    oldest[priority] = min(oldest.get(priority, waiting_since), waiting_since)
+        return oldest
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import weakref
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Flight:
+    """One in-flight call and its outcome"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Runs work once per key at a time and shares the outcome
+
+    The first caller of a key runs the work; callers with the same key that
+    arrive while it runs wait for it and receive its result (or its exception)
+    instead of doing the same work again. The key is released when the work
+    finishes, so a later call runs again.
+    """
+
+    def __init__(self):
+        """Initialize without work in flight"""
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, work: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run work for a key, or wait for the run of the same key in flight
+
+        Args:
+            key: Identity of the work
+            work: Function doing the work
+            timeout: Longest time to wait for a run in flight (as long as needed if None)
+
+        Returns:
+            Result of the work and whether it was shared from another caller's run
+
+        Raises:
+            TimeoutError: If the run in flight didn't finish within the timeout
+            Exception: The exception of the work, also for callers that waited for it
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if not flight.done.wait(timeout):
+                raise TimeoutError(f"work in flight didn't finish within {timeout:.1f}s")
+            if flight.error is not None:
+                raise flight.error
+            return flight.result, True
+
+        try:
+            flight.result = work()
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines: runs async work once per key and event loop at a time
+
+    Waiting callers hold no thread. A caller that gives up (timeout or cancellation)
+    doesn't cancel the work for the others.
+    """
+
+    def __init__(self):
+        """Initialize without work in flight"""
+        # event loop -> key -> task of the work
+        self._flights = weakref.WeakKeyDictionary()
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[Any]],
+                 timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        Run async work for a key, or wait for the run of the same key in flight
+
+        Returns:
+            Result of the work and whether it was shared from another caller's run
+
+        Raises:
+            TimeoutError: If the run in flight didn't finish within the timeout
+            Exception: The exception of the work, also for callers that waited for it
+        """
+        flights = self._flights.setdefault(asyncio.get_running_loop(), {})
+        task = flights.get(key)
+        if task is None:
+            task = flights[key] = asyncio.ensure_future(work())
+            task.add_done_callback(lambda _: flights.pop(key, None))
+            return await asyncio.shield(task), False
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout), True
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"work in flight didn't finish within {timeout:.1f}s") from None
+
+
+# Work in flight in this process, shared by all analyzers (web form and API)
+week_runs = SingleFlight()
+extraction_runs = SingleFlight()
+async_week_runs = AsyncSingleFlight()
+async_extraction_runs = AsyncSingleFlight()
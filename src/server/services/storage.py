@@ -0,0 +1,203 @@
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, List, Dict, Any, Iterator, IO
+
+import pandas as pd
+
+from ..core.config import Config
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+# Columns of the weekly cost files, new columns are appended at the end
+RESULT_COLUMNS = ["Datum", "Uhrzeit", "Summe_Food", "Summe_NonFood", "Foto_Datei", "Bild_Hash", "Duplikat_Von",
+                  "Prompt_Version", "Analyse_Modell"]
+
+# Serializes lock acquisition of threads within this process (msvcrt locks are per process)
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(lock_file: Path) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock on a lock file
+
+    The lock is shared by all threads and processes using the same lock file,
+    so it serializes read-modify-write cycles across workers.
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(str(lock_file), threading.Lock())
+
+    with thread_lock:
+        lock_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_file, "a+b") as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def hold_lock(lock_file: Path, blocking: bool = True) -> Optional[IO]:
+    """
+    Take an exclusive advisory lock that stays held until the returned file is closed
+
+    Unlike file_lock the lock outlives a block, so it can mark something as alive
+    for as long as a process uses it (e.g. a running analysis or a scheduler).
+    The lock is released when the process dies, however it ends.
+
+    Args:
+        lock_file: Lock file, created if missing
+        blocking: Wait for the lock instead of giving up when it is held elsewhere
+
+    Returns:
+        The open lock file, None if blocking is False and the lock is held elsewhere
+    """
+    lock_file.parent.mkdir(parents=True, exist_ok=True)
+    f = open(lock_file, "a+b")
+    try:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+    except OSError:
+        f.close()
+        if blocking:
+            raise
+        return None
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def is_locked(lock_file: Path) -> bool:
+    """Check without waiting if a lock file is held by hold_lock or file_lock, also of this process"""
+    if not lock_file.exists():
+        return False
+    probe = hold_lock(lock_file, blocking=False)
+    if probe is None:
+        return True
+    probe.close()
+    return False
+
+
+@contextmanager
+def atomic_write(target: Path, mode: str = "w", encoding: Optional[str] = "utf-8",
+                 newline: Optional[str] = None) -> Iterator[Any]:
+    """
+    Write a file via a temporary file that atomically replaces the target
+
+    Readers either see the old or the new file, never a truncated one.
+    """
+    target.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=target.parent, prefix=f".{target.name}.", suffix=".tmp")
+    try:
+        binary = "b" in mode
+        with os.fdopen(fd, mode, encoding=None if binary else encoding,
+                       newline=None if binary else newline) as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_name, target)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+
+    _fsync_directory(target.parent)
+
+
+def _fsync_directory(directory: Path):
+    """Persist a rename in a directory (no-op where directories can't be opened)"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ResultStore:
+    """Crash-safe and multi-process-safe storage of the weekly cost files"""
+
+    def __init__(self, config: Config):
+        """Initialize the result store with configuration"""
+        self.config = config
+        self.cost_files_dir = config.COST_FILES_DIR
+
+    def csv_file(self, calendar_week: str) -> Path:
+        """Get the cost file of a calendar week"""
+        return self.cost_files_dir / f"{calendar_week}_costs.csv"
+
+    def exists(self, calendar_week: str) -> bool:
+        """Check if results exist for a calendar week"""
+        return self.csv_file(calendar_week).exists()
+
+    def read(self, calendar_week: str) -> Optional[pd.DataFrame]:
+        """
+        Read the results of a calendar week without taking the lock
+
+        Writers replace the file atomically, so this always returns a consistent snapshot.
+        """
+        csv_file = self.csv_file(calendar_week)
+        try:
+            return pd.read_csv(csv_file, sep=";")
+        except FileNotFoundError:
+            return None
+
+    def upsert(self, calendar_week: str, records: List[Dict[str, Any]]) -> pd.DataFrame:
+        """
+        Add result rows to a calendar week, replacing older rows of the same photo
+
+        Args:
+            calendar_week: Calendar week in format 2025CW_XX
+            records: Result rows keyed by column name
+
+        Returns:
+            DataFrame with all results of the week after the write
+        """
+        csv_file = self.csv_file(calendar_week)
+
+        with file_lock(csv_file.with_name(csv_file.name + ".lock")):
+            df_new = pd.DataFrame(records, columns=self._columns_for(records))
+            df_old = self.read(calendar_week)
+
+            if df_old is not None and not df_old.empty:
+                # Drop rows of re-analyzed photos so every photo appears once
+                df_old = df_old[~df_old["Foto_Datei"].isin(df_new["Foto_Datei"])]
+                df_all = pd.concat([df_old, df_new], ignore_index=True)
+            else:
+                df_all = df_new
+
+            with atomic_write(csv_file, newline="") as f:
+                df_all.to_csv(f, sep=";", index=False)
+
+        return df_all
+
+    def _columns_for(self, records: List[Dict[str, Any]]) -> List[str]:
+        """Get result columns in stable order, keeping unknown extra columns"""
+        columns = list(RESULT_COLUMNS)
+        for record in records:
+            for key in record:
+                if key not in columns:
+                    columns.append(key)
+        return columns
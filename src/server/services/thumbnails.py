@@ -0,0 +1,137 @@
+import io
+import os
+import threading
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ImageOps, features
+
+from ..core.config import Config
+from .hashing import FileHashCache
+from .storage import atomic_write
+
+
+class ThumbnailCache:
+    """
+    Content-addressed cache of small receipt previews for the web interface
+
+    Thumbnails are stored as <image hash>_<size>.<ext>, so the same photo in
+    several weeks shares one thumbnail and a changed photo gets a new one.
+    The cache directory is kept below THUMBNAIL_CACHE_MAX_BYTES by evicting
+    the least recently used thumbnails.
+    """
+
+    def __init__(self, config: Config, file_hashes: Optional[FileHashCache] = None):
+        """
+        Initialize the thumbnail cache with configuration
+
+        Args:
+            config: Application configuration
+            file_hashes: Memo of photo content hashes, shared with the analyzer
+        """
+        self.config = config
+        self.file_hashes = file_hashes or FileHashCache()
+        self.cache_dir = config.THUMBNAIL_DIR
+        self.size = config.THUMBNAIL_SIZE
+        self.max_bytes = config.THUMBNAIL_CACHE_MAX_BYTES
+        self.image_format, self.extension, self.mimetype = (
+            ("WEBP", "webp", "image/webp") if features.check("webp") else ("JPEG", "jpg", "image/jpeg"))
+
+        self._cache_bytes: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def thumbnail_file(self, image_hash: str) -> Path:
+        """Get the cache file of the thumbnail of an image"""
+        return self.cache_dir / image_hash[:2] / f"{image_hash}_{self.size}.{self.extension}"
+
+    def get_thumbnail(self, image_path: Path) -> Path:
+        """
+        Get the thumbnail of a photo, generating it on first request
+
+        Args:
+            image_path: Original receipt photo
+
+        Returns:
+            Path of the cached thumbnail
+        """
+        image_hash = self.file_hashes.get(image_path)
+        thumbnail_file = self.thumbnail_file(image_hash)
+        if thumbnail_file.exists():
+            self._touch(thumbnail_file)
+            return thumbnail_file
+
+        return self.create_thumbnail(image_path.read_bytes(), image_hash)
+
+    def create_thumbnail(self, image_bytes: bytes, image_hash: str) -> Path:
+        """
+        Store the thumbnail of image data unless it is already cached
+
+        Args:
+            image_bytes: Content of the original photo
+            image_hash: SHA-256 hash of the content
+
+        Returns:
+            Path of the cached thumbnail
+        """
+        thumbnail_file = self.thumbnail_file(image_hash)
+        if thumbnail_file.exists():
+            self._touch(thumbnail_file)
+            return thumbnail_file
+
+        with Image.open(io.BytesIO(image_bytes)) as image:
+            # Decode JPEGs at reduced scale, a thumbnail never needs full resolution
+            image.draft("RGB", (self.size, self.size))
+            image = ImageOps.exif_transpose(image).convert("RGB")
+            image.thumbnail((self.size, self.size))
+
+            buffer = io.BytesIO()
+            image.save(buffer, self.image_format, quality=75)
+
+        with atomic_write(thumbnail_file, "wb") as f:
+            f.write(buffer.getvalue())
+
+        self._account(buffer.tell())
+        return thumbnail_file
+
+    def _touch(self, thumbnail_file: Path):
+        """Mark a thumbnail as recently used"""
+        try:
+            os.utime(thumbnail_file)
+        except FileNotFoundError:
+            pass
+
+    def _account(self, added_bytes: int):
+        """Track the cache size and evict least recently used thumbnails when it is too big"""
+        with self._lock:
+            if self._cache_bytes is None:
+                self._cache_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                self._cache_bytes += added_bytes
+
+            if self._cache_bytes <= self.max_bytes:
+                return
+
+            # Evict down to 90% so not every new thumbnail triggers a scan
+            entries = sorted(self._scan(), key=lambda entry: entry[2])
+            self._cache_bytes = sum(size for _, size, _ in entries)
+            target = self.max_bytes * 0.9
+            for path, size, _ in entries:
+                if self._cache_bytes <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                self._cache_bytes -= size
+
+    def _scan(self):
+        """Yield (path, size, mtime) of all cached thumbnails"""
+        if not self.cache_dir.exists():
+            return
+        for fan_out in os.scandir(self.cache_dir):
+            if not fan_out.is_dir():
+                continue
+            for entry in os.scandir(fan_out.path):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat = entry.stat()
+                    yield entry.path, stat.st_size, stat.st_mtime
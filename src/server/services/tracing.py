@@ -0,0 +1,214 @@
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional, Dict, Any, List, Tuple
+
+from ..core.config import Config
+
+# Span of the current request, analysis or batch week in this thread
+_current_span: ContextVar[Optional["Span"]] = ContextVar('current_span', default=None)
+
+# Tracer shared by all analyzers and the web app of this process
+_default_tracer: Optional["Tracer"] = None
+_default_tracer_guard = threading.Lock()
+
+
+def default_tracer(config: Config) -> "Tracer":
+    """Get the tracer shared by all analyzers of this process"""
+    global _default_tracer
+    with _default_tracer_guard:
+        if _default_tracer is None:
+            _default_tracer = Tracer(config)
+        return _default_tracer
+
+
+class Span:
+    """One timed step of a trace with its attributes"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.status = 'ok'
+        self.start = datetime.utcnow()
+        self._start = time.perf_counter()
+        self.duration_ms = None
+
+    def set(self, **attributes):
+        """Add or update attributes of the span"""
+        self.attributes.update(attributes)
+
+    def fail(self, error: BaseException):
+        """Mark the span as failed with an error"""
+        self.status = 'error'
+        self.attributes['error'] = f"{error.__class__.__name__}: {error}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start.isoformat(),
+            'duration_ms': self.duration_ms,
+            'status': self.status,
+            'attributes': self.attributes,
+            'pid': os.getpid(),
+            'thread': threading.current_thread().name
+        }
+
+
+class _NoSpan:
+    """Span handed out while tracing is disabled, ignores everything"""
+    trace_id = None
+    span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def fail(self, error: BaseException):
+        pass
+
+
+NO_SPAN = _NoSpan()
+
+
+class Tracer:
+    """
+    Lightweight tracing of the analysis pipeline into local JSONL files
+
+    Spans nest per thread: a span started while another is open becomes its child
+    and shares its trace id. Finished spans are appended to
+    TRACE_DIR/spans-<date>.jsonl, one JSON object per line, so a slow request or
+    run can be reconstructed afterwards without a collector. Files older than
+    TRACE_KEEP_DAYS are removed. Without TRACING_ENABLED spans cost nothing.
+    """
+
+    def __init__(self, config: Config):
+        """Initialize the tracer with configuration"""
+        self.config = config
+        self.enabled = config.TRACING_ENABLED
+        self.trace_dir = Path(config.TRACE_DIR)
+        self.keep_days = config.TRACE_KEEP_DAYS
+        self._lock = threading.Lock()
+        self._pruned_day = None
+
+    @contextmanager
+    def span(self, name: str, **attributes):
+        """
+        Trace a block as a span, failed if it raises
+
+        Args:
+            name: Name of the step (e.g. analyze_week, ai_call)
+            attributes: Attributes like week, file, bytes or cache_hit; more can be added with span.set
+        """
+        span, token = self.start_span(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.fail(e)
+            raise
+        finally:
+            self.end_span(span, token)
+
+    def start_span(self, name: str, **attributes) -> Tuple[Any, Any]:
+        """Start a span as child of the current one, returns the span and the token to end it with"""
+        if not self.enabled:
+            return NO_SPAN, None
+        parent = _current_span.get()
+        span = Span(name, parent.trace_id if parent is not None else uuid.uuid4().hex,
+                    parent.span_id if parent is not None else None, attributes)
+        return span, _current_span.set(span)
+
+    def end_span(self, span, token):
+        """End a span started with start_span and export it"""
+        if token is None:
+            return
+        span.duration_ms = round((time.perf_counter() - span._start) * 1000, 1)
+        _current_span.reset(token)
+        self._export(span)
+
+    def current(self):
+        """Get the open span of this thread, to add attributes to it (a span that ignores them if none)"""
+        span = _current_span.get() if self.enabled else None
+        return span if span is not None else NO_SPAN
+
+    def context(self) -> Optional[Dict[str, str]]:
+        """Get trace and span id of the current span, to continue the trace in a worker process"""
+        span = _current_span.get()
+        if span is None:
+            return None
+        return {'trace_id': span.trace_id, 'span_id': span.span_id}
+
+    @contextmanager
+    def attach(self, context: Optional[Dict[str, str]]):
+        """Continue a trace from context() of another process, spans started inside become children"""
+        if not self.enabled or not context:
+            yield
+            return
+        remote = Span('remote', context['trace_id'], None, {})
+        remote.span_id = context['span_id']
+        token = _current_span.set(remote)
+        try:
+            yield
+        finally:
+            _current_span.reset(token)
+
+    def read_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Get all exported spans of a trace, in order of their start"""
+        return sorted((span for span in self._read_spans() if span['trace_id'] == trace_id),
+                      key=lambda span: span['start'])
+
+    def find_traces(self, **attributes) -> List[str]:
+        """Get the ids of the traces with a span having all these attributes (e.g. run_id=...), newest first"""
+        found = {}
+        for span in self._read_spans():
+            if all(span['attributes'].get(name) == value for name, value in attributes.items()):
+                found[span['trace_id']] = max(found.get(span['trace_id'], ''), span['start'])
+        return sorted(found, key=found.get, reverse=True)
+
+    def _read_spans(self):
+        if not self.trace_dir.exists():
+            return
+        for trace_file in sorted(self.trace_dir.glob("spans-*.jsonl")):
+            with open(trace_file, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError:
+                        # Cut off by a crash while written
+                        continue
+
+    def _export(self, span: Span):
+        """Append a finished span to the file of its day"""
+        day = span.start.strftime("%Y%m%d")
+        line = json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n"
+        try:
+            with self._lock:
+                if self._pruned_day != day:
+                    self.trace_dir.mkdir(parents=True, exist_ok=True)
+                    self._prune(span.start)
+                    self._pruned_day = day
+                # Single appended lines, batch worker processes write to the same file
+                with open(self.trace_dir / f"spans-{day}.jsonl", "a", encoding="utf-8") as f:
+                    f.write(line)
+        except OSError as e:
+            print(f"Could not export trace span {span.name}: {e}")
+
+    def _prune(self, now: datetime):
+        """Remove span files older than TRACE_KEEP_DAYS"""
+        oldest = f"spans-{now - timedelta(days=self.keep_days):%Y%m%d}.jsonl"
+        for trace_file in self.trace_dir.glob("spans-*.jsonl"):
+            if trace_file.name < oldest:
+                try:
+                    trace_file.unlink()
+                except FileNotFoundError:
+                    pass
@@ -1,59 +1,254 @@
-from flask import render_template, request
+from flask import render_template, request, redirect, url_for, flash, send_file, abort, session, g
+from pathlib import Path
+import pandas as pd
+from werkzeug.security import safe_join
 
-receipts = []
-current_id = 1
+from ..core.config import DevelopmentConfig
+from ..services.receipt_analyzer import get_analyzer
+from ..services.manifest import is_calendar_week
+from ..services.page_cache import PageCache
+
+# Initialize analyzer
+config = DevelopmentConfig()
+try:
+    analyzer = get_analyzer(config)
+except Exception:
+    analyzer = None
+
+# Rendered pages, keyed on the week listing and the result file mtimes they show
+page_cache = PageCache() if config.PAGE_CACHE else None
+
+# Thumbnails never change for a given URL until the photo changes, let browsers keep them a day
+THUMBNAIL_MAX_AGE = 24 * 60 * 60
+
+# Photo URLs with a matching ?v=<content hash> never change, let browsers keep them a year
+PHOTO_MAX_AGE = 365 * 24 * 60 * 60
+PHOTO_VERSION_LENGTH = 16
+
+def get_photo_path(week, filename):
+    """Resolve a receipt photo inside its week directory, None if invalid or missing"""
+    if not is_calendar_week(week):
+        return None
+    week_dir = safe_join(str(config.PHOTOS_DIR), week)
+    if week_dir is None:
+        return None
+    photo_path = safe_join(week_dir, filename)
+    if photo_path is None:
+        return None
+
+    photo_path = Path(photo_path)
+    if not photo_path.is_file() or photo_path.suffix.lower() not in config.SUPPORTED_IMAGE_EXTENSIONS:
+        return None
+    return photo_path
+
+def weeks_version():
+    """Version of the week listing, changes when a week directory is added or removed"""
+    return tuple(analyzer.get_available_weeks()) if analyzer else ()
+
+def results_version():
+    """Version of all results, changes when a week is added or a result file is written"""
+    if not analyzer:
+        return ()
+    return weeks_version(), tuple(sorted(analyzer.manifest.get_result_mtimes().items()))
+
+def cached_page(key, version, render):
+    """
+    Serve a page from the page cache, rendering it when the version changed
+
+    Pages are rendered directly while flashed messages are pending, they are shown
+    once only. A render that flashes an error sets g.skip_page_cache.
+    """
+    if page_cache is None or session.get('_flashes'):
+        return render()
+
+    page = page_cache.get(key, version)
+    if page is None:
+        page = render()
+        if not g.get('skip_page_cache'):
+            page_cache.put(key, version, page)
+    return page
 
 def register_routes(app):
+
+    @app.route('/')
+    def index():
+        """Redirect root to receipts home"""
+        return redirect(url_for('list_info'))
+
     @app.route('/receipts/home', methods=['GET'])
     def list_info():
-        return render_template('index.html', receipts=receipts)
+        """Show project information and available weeks"""
+        version = weeks_version()
+        return cached_page('home', version, lambda: render_template('index.html', available_weeks=list(version)))
 
     @app.route('/receipts/about', methods=['GET'])
     def list_about_info():
-        return render_template('about.html', receipts=receipts)
+        """Show about page"""
+        return render_template('about.html')
 
     @app.route('/receipts/show', methods=['GET'])
     def list_receipts():
-        return render_template('show.html', receipts=receipts)
+        """Show analysis results for all weeks"""
+        return cached_page('show', results_version(), render_receipts)
+
+    def render_receipts():
+        results = []
+        if analyzer:
+            try:
+                for week in analyzer.get_available_weeks():
+                    df = analyzer.results.read(week)
+                    if df is not None:
+                        summary = analyzer.get_week_summary(analyzer._process_results(df))
+                        results.append({
+                            'week': week,
+                            'total_food': summary['total_food'],
+                            'total_nonfood': summary['total_nonfood'],
+                            'total_receipts': summary['total_receipts'],
+                            'grand_total': round(summary['total_food'] + summary['total_nonfood'], 2)
+                        })
+            except Exception as e:
+                flash(f'Error loading results: {e}', 'error')
+                g.skip_page_cache = True
+
+        return render_template('show.html', results=results)
 
     @app.route('/receipts/upload', methods=['GET', 'POST'])
     def create_receipt_data():
-        global current_id
+        """Handle file upload (placeholder for now)"""
         if request.method == 'POST':
-            title = request.form.get('title')
-            author = request.form.get('author')
-            if not title or not author:
-                return 'Missing Data', 400
-            receipt = {'id': current_id, 'title': title, 'author': author}
-            receipts.append(receipt)
-            current_id += 1
-            return render_template('index.html', receipts=receipts)
+            # This would handle actual file uploads
+            flash('File upload functionality not yet implemented', 'info')
+            return redirect(url_for('list_info'))
         return render_template('upload.html')
 
     @app.route('/receipts/analyse', methods=['GET', 'POST'])
     def create_analysis_data():
-        global current_id
-        if request.method == 'POST':
-            title = request.form.get('title')
-            author = request.form.get('author')
-            if not title or not author:
-                return 'Missing Data', 400
-            receipt = {'id': current_id, 'title': title, 'author': author}
-            receipts.append(receipt)
-            current_id += 1
-            return render_template('index.html', receipts=receipts)
-        return render_template('analyse.html')
-
-    @app.route('/receipts/result_out', methods=['GET', 'POST'])
-    def create_result_data():
-        global current_id
+        """Handle analysis request"""
+        available_weeks = analyzer.get_available_weeks() if analyzer else []
+
+        if request.method == 'GET':
+            return cached_page('analyse', tuple(available_weeks),
+                               lambda: render_template('analyse.html', available_weeks=available_weeks))
+
         if request.method == 'POST':
-            title = request.form.get('title')
-            author = request.form.get('author')
-            if not title or not author:
-                return 'Missing Data', 400
-            receipt = {'id': current_id, 'title': title, 'author': author}
-            receipts.append(receipt)
-            current_id += 1
-            return render_template('index.html', receipts=receipts)
-        return render_template('result_output.html')
\ No newline at end of file
+            calendar_week = request.form.get('calendar_week')
+            if not calendar_week:
+                flash('Please select a calendar week', 'error')
+                return render_template('analyse.html', available_weeks=available_weeks)
+
+            if not analyzer:
+                flash('Analysis service not available', 'error')
+                return render_template('analyse.html', available_weeks=available_weeks)
+
+            try:
+                # Perform analysis, someone is waiting for it in the browser
+                report = analyzer.run_week_analysis(calendar_week, priority='interactive',
+                                                    deadline_seconds=config.ANALYSIS_DEADLINE_SECONDS or None)
+                df_result = report['results']
+                if df_result is not None:
+                    summary = analyzer.get_week_summary(df_result)
+                    flash(f'Analysis completed for {calendar_week}! Total: €{summary["total_food"] + summary["total_nonfood"]:.2f}', 'success')
+                    if report['rejected_files']:
+                        flash(f'{len(report["rejected_files"])} photos rejected without analysis: '
+                              + '; '.join(f'{name}: {reason}' for name, reason in report['rejected_files'].items()),
+                              'warning')
+                    if report['unfinished_files']:
+                        flash(f'Time limit reached, {len(report["unfinished_files"])} photos not analyzed yet. '
+                              f'Start the analysis again to continue.', 'warning')
+                    return redirect(url_for('show_results', week=calendar_week))
+                else:
+                    flash('Analysis failed. Check your API key and photo files.', 'error')
+            except Exception as e:
+                flash(f'Analysis error: {e}', 'error')
+
+        return render_template('analyse.html', available_weeks=available_weeks)
+
+    @app.route('/receipts/result_out', methods=['GET'])
+    @app.route('/receipts/result_out/<week>', methods=['GET'])
+    def show_results(week=None):
+        """Show detailed results for a specific week"""
+        if not week:
+            return redirect(url_for('list_receipts'))
+
+        version = analyzer.manifest.get_result_mtimes().get(week) if analyzer and is_calendar_week(week) else None
+        if version is None:
+            # Unknown weeks flash an error, nothing to cache
+            return render_results(week)
+        return cached_page(('result_out', week), version, lambda: render_results(week))
+
+    def render_results(week):
+        result_data = None
+        if analyzer:
+            try:
+                df = analyzer.results.read(week)
+                if df is not None:
+                    df = analyzer._process_results(df)
+                    summary = analyzer.get_week_summary(df)
+
+                    # Convert DataFrame to list of dictionaries
+                    receipts_data = []
+                    for _, row in df.iterrows():
+                        receipts_data.append({
+                            'datum': str(row.get('Datum', '')),
+                            'uhrzeit': str(row.get('Uhrzeit', '')),
+                            'summe_food': float(row.get('Summe_Food', 0.0)),
+                            'summe_nonfood': float(row.get('Summe_NonFood', 0.0)),
+                            'foto_datei': str(row.get('Foto_Datei', '')),
+                            'photo_version': (str(row['Bild_Hash'])[:PHOTO_VERSION_LENGTH]
+                                              if pd.notna(row.get('Bild_Hash')) else None)
+                        })
+
+                    result_data = {
+                        'week': week,
+                        'summary': summary,
+                        'receipts': receipts_data
+                    }
+                else:
+                    flash(f'No results found for {week}. Run analysis first.', 'error')
+            except Exception as e:
+                flash(f'Error loading results: {e}', 'error')
+                g.skip_page_cache = True
+
+        return render_template('result_output.html', result=result_data)
+
+    @app.route('/receipts/thumbnail/<week>/<filename>', methods=['GET'])
+    def show_thumbnail(week, filename):
+        """Serve a small preview of a receipt photo from the thumbnail cache"""
+        if not analyzer:
+            abort(503)
+
+        photo_path = get_photo_path(week, filename)
+        if photo_path is None:
+            abort(404)
+
+        thumbnail_file = analyzer.thumbnails.get_thumbnail(photo_path)
+        return send_file(thumbnail_file, mimetype=analyzer.thumbnails.mimetype,
+                         max_age=THUMBNAIL_MAX_AGE, conditional=True)
+
+    @app.route('/receipts/photos/<week>/<filename>', methods=['GET'])
+    def show_photo(week, filename):
+        """
+        Serve an original receipt photo
+
+        The file is streamed by the WSGI server (sendfile where supported), never read into
+        Python memory. The ETag is the content hash, range requests are supported and URLs
+        carrying the current content version (?v=) are cacheable forever.
+        """
+        if not analyzer:
+            abort(503)
+
+        photo_path = get_photo_path(week, filename)
+        if photo_path is None:
+            abort(404)
+
+        image_hash = analyzer.file_hashes.get(photo_path)
+        versioned = request.args.get('v') == image_hash[:PHOTO_VERSION_LENGTH]
+
+        response = send_file(photo_path, conditional=True, etag=image_hash,
+                             max_age=PHOTO_MAX_AGE if versioned else 0)
+        if versioned:
+            response.cache_control.immutable = True
+        else:
+            # Unversioned URLs may show a replaced photo, revalidate with the ETag
+            response.cache_control.no_cache = True
+        return response
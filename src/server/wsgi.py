@@ -0,0 +1,11 @@
+"""
+WSGI entry point for external servers, e.g.:
+
+    gunicorn --preload --workers 4 --threads 4 src.server.wsgi:app
+"""
+
+import os
+
+from .api import create_app
+
+app = create_app(os.getenv('FLASK_CONFIG', 'production'))